@@ -15,13 +15,13 @@ if PROJECT_ROOT not in sys.path:
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import PromptTemplate
-from langchain_community.chat_models import ChatOllama
 from pydantic import BaseModel, Field
 from langchain_core.output_parsers import JsonOutputParser
 
 # 导入您的核心模块
 from rag_system.graph_state import GraphState, Step
 from rag_system.config import settings
+from rag_system.resources import format_resource_report, get_shared_llm
 from rag_system.planner.planner import Planner, plan_node
 from rag_system.executor.executor import Executor, execute_node
 from rag_system.reflector.reflector import Reflector, reflect_node
@@ -37,7 +37,7 @@ try:
     print("--- 正在初始化所有Agent组件 ---")
 
     tools = [paper_finder_tool, semantic_search_tool, prediction_tool]
-    general_llm = ChatOllama(model=settings.PREDICTION_MODEL_NAME, temperature=0)
+    general_llm = get_shared_llm(settings.PREDICTION_MODEL_NAME, temperature=0)
 
     # [最终修复] 根据您的确认，精确地为每个组件提供其所需的参数
     planner_instance = Planner(tools=tools)  # Planner 需要 tools
@@ -45,6 +45,7 @@ try:
     reflector_instance = Reflector()  # Reflector 不需要参数
 
     print("✅ 所有Agent组件初始化成功。")
+    print(format_resource_report())
 except Exception as e:
     print(f"❌ 初始化核心组件时发生致命错误: {e}")
     st.error(f"应用启动失败：无法初始化核心组件。错误信息: {e}")
@@ -10,9 +10,9 @@ PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
-from langchain_community.vectorstores import Chroma
 from rag_system.config import settings
-from rag_system.ingestion.embedding import get_embedding_function
+from rag_system.ingestion.paper_store import get_paper_store
+from rag_system.resources import get_shared_vector_store
 
 
 def check_vector_db_metadata():
@@ -20,15 +20,11 @@ def check_vector_db_metadata():
     print("--- 正在连接到向量数据库... ---")
     if not os.path.exists(settings.VECTOR_DB_PATH):
         print(f"❌ 错误: 在路径 '{settings.VECTOR_DB_PATH}' 下找不到向量数据库。")
-        print("   请先运行 'create_database/build_vectordb.py' 来构建数据库。")
+        print("   请先运行 'python -m rag_system.ingestion build' 来构建数据库。")
         return
 
     try:
-        embedding_function = get_embedding_function()
-        vector_db = Chroma(
-            persist_directory=str(settings.VECTOR_DB_PATH),
-            embedding_function=embedding_function
-        )
+        vector_db = get_shared_vector_store(settings.VECTOR_DB_PATH)
 
         print("✅ 连接成功！正在获取所有元数据...")
 
@@ -44,10 +40,17 @@ def check_vector_db_metadata():
             return
 
         # 我们只关心标题，所以提取所有不重复的标题
+        # 新版索引的文本块只保存 paper_key，标题在 literature_materials.db 的论文侧表中
         unique_titles = set()
+        paper_keys = set()
         for meta in metadata_list:
             if 'title' in meta:
                 unique_titles.add(meta['title'])
+            elif 'paper_key' in meta:
+                paper_keys.add(meta['paper_key'])
+        if paper_keys:
+            papers = get_paper_store().get_papers(paper_keys)
+            unique_titles.update(paper['title'] for paper in papers.values() if paper.get('title'))
 
         print("\n" + "=" * 80)
         print("🔍 以下是您知识库中存储的所有唯一论文标题（已去除重复项）:")
@@ -15,11 +15,11 @@ if PROJECT_ROOT not in sys.path:
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import PromptTemplate
-from langchain_community.chat_models import ChatOllama
 
 # 导入您的核心模块
 from rag_system.graph_state import GraphState, Step
 from rag_system.config import settings
+from rag_system.resources import get_shared_llm
 from rag_system.planner.planner import Planner, plan_node
 from rag_system.executor.executor import Executor, execute_node
 from rag_system.reflector.reflector import Reflector, reflect_node
@@ -41,7 +41,7 @@ try:
     reflector_instance = Reflector()
 
     # 创建一个单独的LLM实例，用于最终答案生成
-    answer_llm = ChatOllama(model=settings.PREDICTION_MODEL_NAME, temperature=0)
+    answer_llm = get_shared_llm(settings.PREDICTION_MODEL_NAME, temperature=0)
 
     print("✅ 所有Agent组件初始化成功。")
 except Exception as e:
@@ -1,11 +1,11 @@
 from langchain.agents import AgentExecutor, create_react_agent
-from langchain_ollama import ChatOllama
 
 # 导入我们最终版本的Prompt和工具
 from rag_system.agent.prompt import react_prompt
 from rag_system.agent.tools.semantic_search import semantic_search_tool
 from rag_system.agent.tools.structured_query import structured_data_query_tool
 from rag_system.config import settings
+from rag_system.resources import get_shared_llm
 
 
 class MaterialScienceAgent:
@@ -14,7 +14,7 @@ class MaterialScienceAgent:
     """
 
     def __init__(self):
-        self.llm = ChatOllama(model=settings.LOCAL_LLM_MODEL_NAME)
+        self.llm = get_shared_llm(settings.LOCAL_LLM_MODEL_NAME)
         self.tools = [semantic_search_tool, structured_data_query_tool]
 
         # 将LLM、工具、和Prompt绑定在一起，创建Agent的核心逻辑
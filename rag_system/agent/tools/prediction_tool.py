@@ -3,10 +3,10 @@
 from typing import Any, Optional
 from langchain_core.tools import tool
 from langchain_core.prompts import PromptTemplate
-from langchain_community.chat_models import ChatOllama
 from pydantic import BaseModel, Field
 
 from rag_system.config import settings
+from rag_system.resources import get_shared_llm
 
 # --- 全局组件初始化 ---
 # [核心] 这里我们将调用一个专门为预测任务微调的新模型
@@ -16,11 +16,11 @@ try:
     # 假设您在settings.py中定义了一个新变量 PREDICTION_MODEL_NAME
     # 如果没有定义，它会回退到使用默认的LLM模型
     prediction_model_name = getattr(settings, 'PREDICTION_MODEL_NAME', settings.LOCAL_LLM_MODEL_NAME)
-    prediction_llm = ChatOllama(model=prediction_model_name, temperature=0.1)
+    prediction_llm = get_shared_llm(prediction_model_name, temperature=0.1)
     print(f"✅ Prediction tool will use model: {prediction_model_name}")
 except AttributeError:
     print("⚠️ Warning: PREDICTION_MODEL_NAME not found in settings. Using default LLM.")
-    prediction_llm = ChatOllama(model=settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
+    prediction_llm = get_shared_llm(settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
 
 
 # --- 为预测任务设计的专属Prompt ---
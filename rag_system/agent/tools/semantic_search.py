@@ -3,25 +3,23 @@
 from typing import Optional, List, Any
 from langchain_core.tools import tool
 # ... 其他导入保持不变 ...
-from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import PromptTemplate
-from langchain_community.chat_models import ChatOllama
 from pydantic import BaseModel, Field
 from rag_system.config import settings
-from rag_system.ingestion.embedding import get_embedding_function
+from rag_system.ingestion.paper_store import get_paper_store
+from rag_system.ingestion.shards import year_filter
+from rag_system.resources import get_shared_llm, get_shared_vector_store
+from rag_system.retrieval.section_rerank import section_weighted_search
 
 
-# --- 全局组件初始化 (保持不变) ---
+# --- 全局组件初始化 ---
 def get_tool_components():
-    # ... 此函数内容完全不变 ...
+    # 嵌入模型、向量数据库句柄和LLM都从进程共享的资源注册表中获取，与检索引擎等其他组件共用同一份；
+    # 组件在第一次调用工具时才创建，导入本模块不再加载模型
     try:
-        print("--- Initializing components for semantic_search_tool ---")
-        embedding_function = get_embedding_function()
-        vector_db = Chroma(
-            persist_directory=str(settings.VECTOR_DB_PATH),
-            embedding_function=embedding_function
-        )
-        llm = ChatOllama(model=settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
+        # 跟随 CURRENT 指针打开当前发布的版本，重建向量数据库后无需重启
+        vector_db = get_shared_vector_store(settings.VECTOR_DB_PATH)
+        llm = get_shared_llm(settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
         reasoning_prompt = PromptTemplate.from_template(
             """# 角色
             你是一位顶尖的材料科学家，你的任务是基于下面提供的单篇【相关文献摘要】，对用户的【核心问题】进行一次深入的、有逻辑的分析和推理。
@@ -41,30 +39,29 @@ def get_tool_components():
             你对这篇论文的分析与推理:
             """
         )
-        reasoning_chain = reasoning_prompt | llm
-        print("✅ semantic_search_tool components initialized successfully.")
-        return vector_db, reasoning_chain
+        return vector_db, reasoning_prompt | llm
     except Exception as e:
         print(f"❌ Error initializing components for semantic_search_tool: {e}")
         return None, None
 
 
-vector_db, reasoning_chain = get_tool_components()
-
-
 class SemanticSearchInput(BaseModel):
     query: str = Field(description="一个需要进行深度分析和总结的核心问题。")
     context: Optional[Any] = Field(None,
                                    description="可选的上下文，通常是一个包含论文标题的列表 (List[str])，由前一个工具提供。")
+    min_year: Optional[int] = Field(None, description="开放式搜索时，只检索该年份及之后发表的论文（包含）。")
+    max_year: Optional[int] = Field(None, description="开放式搜索时，只检索该年份及之前发表的论文（包含）。")
 
 
 @tool(args_schema=SemanticSearchInput)
-def semantic_search_tool(query: str, context: Optional[Any] = None) -> str:
+def semantic_search_tool(query: str, context: Optional[Any] = None,
+                         min_year: Optional[int] = None, max_year: Optional[int] = None) -> str:
     """
     一个强大的分析与推理工具。它首先根据上下文（如论文标题列表）从知识库中检索详细信息，
     然后基于这些信息对用户的核心问题进行深入的分析和总结。
-    如果未提供上下文，它会先进行开放式搜索，然后进行分析。
+    如果未提供上下文，它会先进行开放式搜索，然后进行分析；开放式搜索可以用 min_year/max_year 限定发表年份。
     """
+    vector_db, reasoning_chain = get_tool_components()
     if not vector_db or not reasoning_chain:
         return "出现错误: semantic_search_tool 的核心组件未能成功初始化，无法执行任务。"
 
@@ -79,8 +76,11 @@ def semantic_search_tool(query: str, context: Optional[Any] = None) -> str:
             else:
                 for i, title in enumerate(paper_titles, 1):
                     print(f"\n--- 正在分析第 {i}/{len(paper_titles)} 篇论文: '{title[:50]}...' ---")
+                    # 文本块元数据中只有 paper_key，先在论文侧表中按标题查出对应的论文
+                    paper_keys = get_paper_store().find_paper_keys_by_title(title)
+                    where = {"paper_key": {"$in": paper_keys}} if paper_keys else {"title": title}
                     docs_for_title = vector_db.get(
-                        where={"title": title}, include=["documents"]
+                        where=where, include=["documents"]
                     ).get('documents', [])
 
                     if not docs_for_title:
@@ -116,7 +116,10 @@ def semantic_search_tool(query: str, context: Optional[Any] = None) -> str:
     # ... 开放式搜索部分的代码保持不变 ...
     print("--- [Tool Log] semantic_search_tool: Activating 'Open Search' mode.")
     try:
-        results = vector_db.similarity_search(query, k=settings.RETRIEVER_K)
+        # 带年份条件时，按年份分片的索引只会查询年份范围相交的分片
+        where = year_filter(min_year, max_year)
+        search_kwargs = {"filter": where} if where else {}
+        results = section_weighted_search(vector_db, query, k=settings.RETRIEVER_K, **search_kwargs)
         if not results:
             return "在整个知识库中未能找到与您问题相关的任何信息，无法进行分析。"
         open_search_context = "\n\n---\n\n".join([doc.page_content for doc in results])
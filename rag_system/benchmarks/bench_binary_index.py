@@ -0,0 +1,84 @@
+"""
+二值索引基准：在当前发布的向量数据库上比较Chroma自带检索与二值粗筛+精确重排的延迟、召回率和内存。
+
+以Chroma的检索结果为参照计算 recall@k（两者的前k个结果的重合比例），
+并对不同的重排候选倍数分别测量。查询取自库中随机文本块的开头，模拟真实问题。
+
+用法（在项目根目录下，需先构建向量数据库）:
+    python -m rag_system.benchmarks.bench_binary_index --queries 200 --k 10 --multipliers 2 5 10 20
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from rag_system.config import settings
+from rag_system.ingestion.binary_index import BinaryIndex, build_binary_index
+from rag_system.ingestion.dim_reduction import wrap_for_index
+from rag_system.ingestion.embedding import get_embedding_function
+from rag_system.ingestion.index_versions import resolve_active_path
+from rag_system.ingestion.shards import open_vector_store
+
+
+def sample_queries(db, count: int, seed: int):
+    total = db._collection.count()
+    offsets = random.Random(seed).sample(range(total), min(count, total))
+    return [db._collection.get(limit=1, offset=offset, include=["documents"])["documents"][0][:120]
+            for offset in offsets]
+
+
+def percentiles(latencies):
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the binary prefilter index against plain Chroma search.")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    parser.add_argument("--k", type=int, default=settings.RETRIEVER_K, help="recall@k 中的 k")
+    parser.add_argument("--multipliers", type=int, nargs="+", default=[2, 5, 10, 20], help="要测试的重排候选倍数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    path = resolve_active_path(settings.VECTOR_DB_PATH)
+    db = open_vector_store(path, wrap_for_index(get_embedding_function(use_cache=False), path))
+    binary = BinaryIndex.load(path)
+    if binary is None:
+        print("⚠️ 当前版本没有二值索引，现在生成...")
+        build_binary_index(db, path)
+        binary = BinaryIndex.load(path)
+
+    queries = sample_queries(db, args.queries, args.seed)
+    query_vectors = [db.embeddings.embed_query(text) for text in queries]
+    dims = len(query_vectors[0])
+    print(f"Index {path.name}: {len(binary.ids)} chunks, {dims} dims, {len(queries)} queries, k={args.k}")
+
+    reference, latencies = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        result = db._collection.query(query_embeddings=[vector], n_results=args.k,
+                                      include=["documents", "metadatas", "distances"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        reference.append(set(result["ids"][0]))
+
+    float_mb = len(binary.ids) * dims * 4 / 1024 / 1024
+    p50, p95 = percentiles(latencies)
+    print(f"\n{'search':>14} {'index MB':>9} {'recall@k':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    print(f"{'chroma':>14} {float_mb:>9.1f} {1.0:>10.3f} {p50:>9.2f} {p95:>9.2f}")
+
+    for multiplier in args.multipliers:
+        latencies, recalls = [], []
+        for vector, expected in zip(query_vectors, reference):
+            start = time.perf_counter()
+            results = binary.search(db, vector, args.k, rescore_multiplier=multiplier)
+            latencies.append((time.perf_counter() - start) * 1000)
+            # 文本块元数据中的 chunk_id 就是它在Chroma中的ID
+            found = {doc.metadata.get("chunk_id") for doc, _ in results}
+            recalls.append(len(found & expected) / args.k)
+        p50, p95 = percentiles(latencies)
+        print(f"{f'binary x{multiplier}':>14} {binary.nbytes / 1024 / 1024:>9.1f} {np.mean(recalls):>10.3f} "
+              f"{p50:>9.2f} {p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+切分性能基准：比较单进程切分与多进程切分的吞吐量，并校验两者输出完全一致。
+
+用法（在项目根目录下）:
+    python -m rag_system.benchmarks.bench_chunking --limit 2000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+from itertools import islice
+from pathlib import Path
+
+from rag_system.config import settings
+from rag_system.ingestion.build_vectordb import prepare_document
+from rag_system.ingestion.document_loader import iter_json_records
+from rag_system.ingestion.text_chunker import assign_chunk_ids, iter_split_documents
+
+
+def run_once(documents, workers: int):
+    start = time.perf_counter()
+    chunk_ids = []
+    for chunks in iter_split_documents(documents, workers=workers):
+        chunk_ids.extend(assign_chunk_ids(chunks))
+    return time.perf_counter() - start, chunk_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial vs. process-pool chunking.")
+    parser.add_argument("--source", default=str(settings.SOURCE_DATA_PATH), help="processed_papers.json 路径")
+    parser.add_argument("--limit", type=int, default=1000, help="参与测试的论文数量上限")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1],
+                        help="要测试的工作进程数列表，1 表示当前的串行路径")
+    args = parser.parse_args()
+
+    papers = islice(iter_json_records(Path(args.source)), args.limit)
+    documents = [doc for doc in map(prepare_document, papers) if doc is not None]
+    total_chars = sum(len(doc.page_content) for doc in documents)
+    print(f"Loaded {len(documents)} papers ({total_chars / 1e6:.1f} M chars), CPU count: {os.cpu_count()}")
+
+    baseline_seconds, baseline_ids = run_once(documents, workers=1)
+    print(f"\n{'workers':>8} {'seconds':>9} {'papers/s':>9} {'chunks/s':>10} {'speedup':>8}  identical")
+    print(f"{1:>8} {baseline_seconds:>9.2f} {len(documents) / baseline_seconds:>9.1f} "
+          f"{len(baseline_ids) / baseline_seconds:>10.1f} {1.0:>7.2f}x  -")
+    for workers in sorted(set(args.workers) - {1}):
+        seconds, chunk_ids = run_once(documents, workers=workers)
+        print(f"{workers:>8} {seconds:>9.2f} {len(documents) / seconds:>9.1f} "
+              f"{len(chunk_ids) / seconds:>10.1f} {baseline_seconds / seconds:>7.2f}x  {chunk_ids == baseline_ids}")
+
+
+if __name__ == "__main__":
+    main()
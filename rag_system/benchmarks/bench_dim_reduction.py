@@ -0,0 +1,91 @@
+"""
+降维索引基准：比较全维索引与PCA/前缀截断降维索引的 recall@k、查询延迟和向量内存。
+
+以全维向量上的精确（暴力）最近邻为标准答案，对每种配置在内存中建立一个Chroma集合，
+用同样的查询测量召回率和检索延迟。查询取自未入库论文的文本块开头，模拟真实问题。
+
+用法（在项目根目录下）:
+    python -m rag_system.benchmarks.bench_dim_reduction --limit 300 --dims 128 256 512 --k 10
+"""
+import argparse
+import time
+import uuid
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+
+from rag_system.config import settings
+from rag_system.ingestion.build_vectordb import prepare_document
+from rag_system.ingestion.dim_reduction import fit_projection
+from rag_system.ingestion.document_loader import iter_json_records
+from rag_system.ingestion.embedding import get_embedding_function
+from rag_system.ingestion.text_chunker import iter_split_documents
+
+# Chroma 单次 add 的条目数上限
+_ADD_BATCH = 5000
+
+
+def load_chunks(source: Path, limit: int):
+    papers = islice(iter_json_records(source), limit)
+    documents = [doc for doc in map(prepare_document, papers) if doc is not None]
+    return [[chunk.page_content for chunk in chunks] for chunks in iter_split_documents(documents, workers=1)]
+
+
+def evaluate(name: str, index_vectors: np.ndarray, query_vectors: np.ndarray, truth: np.ndarray, k: int):
+    db = Chroma(collection_name=f"bench-{uuid.uuid4().hex[:8]}")
+    ids = [str(i) for i in range(len(index_vectors))]
+    for start in range(0, len(ids), _ADD_BATCH):
+        db._collection.add(ids=ids[start:start + _ADD_BATCH],
+                           embeddings=index_vectors[start:start + _ADD_BATCH].tolist())
+
+    latencies, recalls = [], []
+    for query, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        result = db._collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(i) for i in result["ids"][0]}
+        recalls.append(len(found & set(expected.tolist())) / k)
+    db.delete_collection()
+
+    megabytes = index_vectors.shape[0] * index_vectors.shape[1] * 4 / 1024 / 1024
+    print(f"{name:>12} {index_vectors.shape[1]:>6} {megabytes:>9.1f} {np.mean(recalls):>10.3f} "
+          f"{np.percentile(latencies, 50):>9.2f} {np.percentile(latencies, 95):>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall@k and latency of reduced-dimension indexes.")
+    parser.add_argument("--source", default=str(settings.SOURCE_DATA_PATH), help="processed_papers.json 路径")
+    parser.add_argument("--limit", type=int, default=300, help="参与测试的论文数量上限")
+    parser.add_argument("--query-papers", type=int, default=20, help="不入库、只用来生成查询的论文数")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    parser.add_argument("--dims", type=int, nargs="+", default=[128, 256, 512], help="要测试的降维维度")
+    parser.add_argument("--k", type=int, default=settings.RETRIEVER_K, help="recall@k 中的 k")
+    args = parser.parse_args()
+
+    per_paper = load_chunks(Path(args.source), args.limit)
+    index_texts = [text for chunks in per_paper[:-args.query_papers] for text in chunks]
+    query_texts = [text[:120] for chunks in per_paper[-args.query_papers:] for text in chunks][:args.queries]
+    print(f"Indexing {len(index_texts)} chunks, {len(query_texts)} held-out queries, k={args.k}")
+
+    embeddings = get_embedding_function()
+    index_vectors = np.asarray(embeddings.embed_documents(index_texts), dtype=np.float32)
+    query_vectors = np.asarray([embeddings.embed_query(text) for text in query_texts], dtype=np.float32)
+    # 标准答案：全维向量上的精确最近邻（向量已归一化，点积即余弦相似度）
+    truth = np.argsort(-(query_vectors @ index_vectors.T), axis=1)[:, :args.k]
+
+    print(f"\n{'index':>12} {'dims':>6} {'vectors MB':>9} {'recall@k':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    evaluate("full", index_vectors, query_vectors, truth, args.k)
+    sample = index_vectors[:settings.EMBEDDING_PCA_FIT_SAMPLE]
+    for dim in args.dims:
+        for method in ("pca", "prefix"):
+            if method == "pca" and len(sample) < dim:
+                print(f"{'pca':>12} {dim:>6}  skipped: need at least {dim} chunks to fit")
+                continue
+            projection = fit_projection(sample, dim, method)
+            evaluate(method, projection.apply(index_vectors), projection.apply(query_vectors), truth, args.k)
+
+
+if __name__ == "__main__":
+    main()
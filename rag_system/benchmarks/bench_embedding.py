@@ -0,0 +1,79 @@
+"""
+嵌入后端基准：比较 PyTorch、ONNX 和 ONNX int8 三种后端的批量嵌入吞吐量与单条查询延迟，
+并以第一个后端（默认 torch）的向量为基准，报告其余后端向量的余弦一致性。
+
+用法（在项目根目录下，纯CPU机器上）:
+    EMBEDDING_DEVICE=cpu python -m rag_system.benchmarks.bench_embedding --limit 50 --threads 8
+"""
+import argparse
+import time
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from rag_system.config import settings
+from rag_system.ingestion.build_vectordb import prepare_document
+from rag_system.ingestion.document_loader import iter_json_records
+from rag_system.ingestion.embedding import get_embedding_function
+from rag_system.ingestion.text_chunker import iter_split_documents
+
+
+def load_texts(source: Path, limit: int, max_chunks: int):
+    papers = islice(iter_json_records(source), limit)
+    documents = [doc for doc in map(prepare_document, papers) if doc is not None]
+    texts = []
+    for chunks in iter_split_documents(documents, workers=1):
+        texts.extend(chunk.page_content for chunk in chunks)
+    return texts[:max_chunks]
+
+
+def run_backend(backend: str, texts, queries):
+    embeddings = get_embedding_function(use_cache=False, backend=backend)
+    embeddings.embed_documents(texts[:8])  # 预热，排除首次推理的初始化开销
+
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    bulk_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return vectors, bulk_seconds, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark torch vs. ONNX Runtime embedding backends.")
+    parser.add_argument("--source", default=str(settings.SOURCE_DATA_PATH), help="processed_papers.json 路径")
+    parser.add_argument("--limit", type=int, default=50, help="参与测试的论文数量上限")
+    parser.add_argument("--chunks", type=int, default=2000, help="参与批量嵌入测试的文本块数量上限")
+    parser.add_argument("--queries", type=int, default=50, help="单条查询延迟测试的查询数")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"],
+                        help="要测试的后端，第一个作为一致性比较的基准")
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime 线程数，默认使用 settings 中的配置")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        settings.EMBEDDING_ONNX_THREADS = args.threads
+    texts = load_texts(Path(args.source), args.limit, args.chunks)
+    # 用文本块的开头模拟简短的用户查询
+    queries = [text[:80] for text in texts[:args.queries]]
+    print(f"Loaded {len(texts)} chunks, {len(queries)} queries, device for torch: {settings.EMBEDDING_DEVICE}")
+
+    results = {backend: run_backend(backend, texts, queries) for backend in args.backends}
+
+    reference = args.backends[0]
+    reference_vectors, reference_seconds = results[reference][0], results[reference][1]
+    print(f"\n{'backend':>10} {'bulk s':>8} {'chunks/s':>9} {'speedup':>8} {'query p50 ms':>13} {'p95 ms':>8} "
+          f"{'cos mean':>9} {'cos min':>8}")
+    for backend, (vectors, seconds, p50, p95) in results.items():
+        # 各后端输出的都是归一化向量，点积即余弦相似度
+        cosines = np.sum(vectors * reference_vectors, axis=1)
+        print(f"{backend:>10} {seconds:>8.2f} {len(texts) / seconds:>9.1f} {reference_seconds / seconds:>7.2f}x "
+              f"{p50:>13.1f} {p95:>8.1f} {cosines.mean():>9.5f} {cosines.min():>8.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+嵌入模型基准：对 settings.EMBEDDING_MODELS 中登记的候选模型，比较批量嵌入吞吐量、索引向量大小和检索质量。
+
+查询取自未入库论文的文本块开头（与 bench_dim_reduction 相同）。检索质量报告两项：
+  - recall@k：以参考模型（默认 settings.EMBEDDING_MODEL_NAME）上的精确最近邻为标准答案的召回率；
+  - self@k：用已入库文本块的开头作为查询，其所在文本块出现在前k个结果中的比例，不依赖参考模型。
+
+用法（在项目根目录下，纯CPU机器上）:
+    EMBEDDING_DEVICE=cpu python -m rag_system.benchmarks.bench_embedding_models --limit 200 --k 10 \\
+        --models BAAI/bge-large-zh-v1.5 BAAI/bge-small-en-v1.5
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from rag_system.benchmarks.bench_dim_reduction import load_chunks
+from rag_system.config import settings
+from rag_system.ingestion.embedding import get_embedding_function
+
+# 用作查询的文本块开头的字符数
+_QUERY_CHARS = 120
+
+
+def embed_with_model(model_name: str, backend: str, index_texts, query_texts, self_query_texts):
+    embeddings = get_embedding_function(use_cache=False, backend=backend, model_name=model_name)
+    embeddings.embed_documents(index_texts[:8])  # 预热，排除首次推理的初始化开销
+
+    start = time.perf_counter()
+    index_vectors = np.asarray(embeddings.embed_documents(index_texts), dtype=np.float32)
+    seconds = time.perf_counter() - start
+    query_vectors = np.asarray([embeddings.embed_query(text) for text in query_texts], dtype=np.float32)
+    self_vectors = np.asarray([embeddings.embed_query(text) for text in self_query_texts], dtype=np.float32)
+    return index_vectors, query_vectors, self_vectors, seconds
+
+
+def top_k(query_vectors: np.ndarray, index_vectors: np.ndarray, k: int) -> np.ndarray:
+    # 登记的模型都输出归一化向量，点积即余弦相似度
+    return np.argsort(-(query_vectors @ index_vectors.T), axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput, index size and recall@k of embedding models.")
+    parser.add_argument("--source", default=str(settings.SOURCE_DATA_PATH), help="processed_papers.json 路径")
+    parser.add_argument("--limit", type=int, default=200, help="参与测试的论文数量上限")
+    parser.add_argument("--query-papers", type=int, default=20, help="不入库、只用来生成查询的论文数")
+    parser.add_argument("--queries", type=int, default=200, help="每种查询的数量")
+    parser.add_argument("--models", nargs="+", default=list(settings.EMBEDDING_MODELS), help="候选模型")
+    parser.add_argument("--reference", default=settings.EMBEDDING_MODEL_NAME, help="作为标准答案的参考模型")
+    parser.add_argument("--backend", default=settings.EMBEDDING_BACKEND, help="推理后端 torch / onnx / onnx-int8")
+    parser.add_argument("--k", type=int, default=settings.RETRIEVER_K, help="recall@k 中的 k")
+    args = parser.parse_args()
+
+    per_paper = load_chunks(Path(args.source), args.limit)
+    index_texts = [text for chunks in per_paper[:-args.query_papers] for text in chunks]
+    query_texts = [text[:_QUERY_CHARS] for chunks in per_paper[-args.query_papers:] for text in chunks][:args.queries]
+    rng = np.random.default_rng(0)
+    self_ids = rng.choice(len(index_texts), size=min(args.queries, len(index_texts)), replace=False)
+    self_query_texts = [index_texts[i][:_QUERY_CHARS] for i in self_ids]
+    print(f"Indexing {len(index_texts)} chunks, {len(query_texts)} held-out queries, "
+          f"{len(self_query_texts)} self queries, k={args.k}, backend={args.backend}")
+
+    models = [args.reference] + [model for model in args.models if model != args.reference]
+    truth = None
+    rows = []
+    for model_name in models:
+        index_vectors, query_vectors, self_vectors, seconds = embed_with_model(
+            model_name, args.backend, index_texts, query_texts, self_query_texts)
+        found = top_k(query_vectors, index_vectors, args.k)
+        if truth is None:
+            truth = found
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, truth)])
+        self_hits = np.mean([i in row for i, row in zip(self_ids, top_k(self_vectors, index_vectors, args.k))])
+        megabytes = index_vectors.nbytes / 1024 / 1024
+        rows.append((model_name, index_vectors.shape[1], len(index_texts) / seconds, megabytes, recall, self_hits))
+
+    print(f"\n{'model':<42} {'dims':>5} {'chunks/s':>9} {'index MB':>9} {'recall@k':>9} {'self@k':>7}")
+    for model_name, dims, rate, megabytes, recall, self_hits in rows:
+        marker = " (reference)" if model_name == args.reference else ""
+        print(f"{model_name + marker:<42} {dims:>5} {rate:>9.1f} {megabytes:>9.1f} {recall:>9.3f} {self_hits:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
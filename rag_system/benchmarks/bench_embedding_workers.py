@@ -0,0 +1,60 @@
+"""
+多进程嵌入基准：测量不同工作进程数下的批量嵌入吞吐量，检查其是否随进程数近似线性增长。
+
+与构建流水线相同，用与进程数相同的线程同时提交 BATCH_SIZE 大小的批次。
+单进程基准直接在当前进程中运行模型，并使用全部CPU核心。
+
+用法（在项目根目录下，纯CPU机器上）:
+    EMBEDDING_DEVICE=cpu python -m rag_system.benchmarks.bench_embedding_workers --chunks 4000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from rag_system.benchmarks.bench_embedding import load_texts
+from rag_system.config import settings
+from rag_system.ingestion.build_vectordb import BATCH_SIZE
+from rag_system.ingestion.embedding import get_embedding_function
+
+
+def run(workers: int, texts, batch_size: int) -> float:
+    embeddings = get_embedding_function(use_cache=False, workers=workers)
+    embeddings.embed_documents(texts[:batch_size])  # 预热：等待所有进程加载完模型
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        list(executor.map(embeddings.embed_documents, batches))
+    seconds = time.perf_counter() - start
+    if hasattr(embeddings, "close"):
+        print(f"  {embeddings.format_stats()}")
+        embeddings.close()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-process embedding throughput scaling.")
+    parser.add_argument("--source", default=str(settings.SOURCE_DATA_PATH), help="processed_papers.json 路径")
+    parser.add_argument("--limit", type=int, default=100, help="参与测试的论文数量上限")
+    parser.add_argument("--chunks", type=int, default=4000, help="参与测试的文本块数量上限")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="要测试的工作进程数")
+    args = parser.parse_args()
+
+    texts = load_texts(Path(args.source), args.limit, args.chunks)
+    print(f"Loaded {len(texts)} chunks, {os.cpu_count()} CPU cores, backend: {settings.EMBEDDING_BACKEND}")
+
+    results = {}
+    for workers in args.workers:
+        results[workers] = run(workers, texts, BATCH_SIZE)
+
+    baseline = results[args.workers[0]]
+    print(f"\n{'workers':>8} {'seconds':>9} {'chunks/s':>9} {'speedup':>8} {'efficiency':>11}")
+    for workers, seconds in results.items():
+        speedup = baseline / seconds
+        print(f"{workers:>8} {seconds:>9.2f} {len(texts) / seconds:>9.1f} {speedup:>7.2f}x "
+              f"{speedup / (workers / args.workers[0]):>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
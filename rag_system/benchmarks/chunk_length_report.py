@@ -0,0 +1,52 @@
+"""
+文本块长度报告：用嵌入模型自己的分词器统计按字符切分和按token切分得到的文本块长度，
+报告有多少文本块超出模型窗口（嵌入时会被静默截断）、截断丢失了多少token，以及窗口的平均利用率。
+
+用法（在项目根目录下）:
+    python -m rag_system.benchmarks.chunk_length_report --limit 500
+"""
+import argparse
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from rag_system.config import settings
+from rag_system.ingestion.build_vectordb import prepare_document
+from rag_system.ingestion.document_loader import iter_json_records
+from rag_system.ingestion.text_chunker import get_embedding_tokenizer, iter_split_documents
+
+
+def report(name: str, texts, tokenizer, window: int):
+    lengths = np.array([len(ids) for ids in tokenizer(texts, truncation=False)["input_ids"]])
+    truncated = lengths > window
+    lost = np.clip(lengths - window, 0, None).sum()
+    utilization = np.minimum(lengths, window).mean() / window
+    print(f"{name:>7} {len(texts):>8} {lengths.mean():>7.0f} {np.percentile(lengths, 50):>6.0f} "
+          f"{np.percentile(lengths, 95):>6.0f} {lengths.max():>6} {truncated.sum():>10} {truncated.mean():>7.1%} "
+          f"{lost / lengths.sum():>9.1%} {utilization:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report chunk token lengths against the embedding model window.")
+    parser.add_argument("--source", default=str(settings.SOURCE_DATA_PATH), help="processed_papers.json 路径")
+    parser.add_argument("--limit", type=int, default=500, help="参与统计的论文数量上限")
+    parser.add_argument("--window", type=int, default=512, help="嵌入模型的最大输入长度（token数，含特殊token）")
+    args = parser.parse_args()
+
+    papers = islice(iter_json_records(Path(args.source)), args.limit)
+    documents = [doc for doc in map(prepare_document, papers) if doc is not None]
+    tokenizer = get_embedding_tokenizer()
+    print(f"Loaded {len(documents)} papers, tokenizer: {settings.EMBEDDING_MODEL_NAME}, window: {args.window} tokens")
+
+    print(f"\n{'unit':>7} {'chunks':>8} {'mean':>7} {'p50':>6} {'p95':>6} {'max':>6} "
+          f"{'truncated':>10} {'share':>7} {'lost tok':>9} {'window':>8}")
+    for unit in ("chars", "tokens"):
+        texts = [chunk.page_content
+                 for chunks in iter_split_documents(documents, workers=1, length_unit=unit)
+                 for chunk in chunks]
+        report(unit, texts, tokenizer, args.window)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,11 @@ SOURCE_DATA_PATH = PROJECT_ROOT / "data" / "processed_text" / "processed_papers.
 # VECTOR_DB_PATH 指向持久化向量数据库的存储位置
 VECTOR_DB_PATH = PROJECT_ROOT / "data" / "vector_db" / "chroma_db"
 SQLITE_DB_PATH = PROJECT_ROOT / "data" / "database" / "literature_materials.db"
+# 构建向量数据库时，用 SQLITE_DB_PATH 中 Papers 表的权威标题替换JSON中抓取到的标题（按DOI关联）
+TITLE_JOIN_ENABLED = True
+# 向量数据库按版本构建：新版本先写入暂存目录，校验通过后原子地切换为当前版本
+VECTOR_DB_KEEP_VERSIONS = 2  # 保留的已发布版本数（包括当前版本），便于回滚
+INDEX_VALIDATION_QUERY = "membrane separation performance"  # 发布前用于校验新索引的示例查询
 
 
 # --- 模型设置 (Models) ---
@@ -30,19 +35,119 @@ LOCAL_LLM_MODEL_NAME = "qwen3-tuned:latest"
 PREDICTION_MODEL_NAME = "qwen3-8b-lora-quantized:latest"
 # 用于将文本转换为向量的嵌入模型 (Embedding Model)
 # 注意：这里是包含了组织名称的、正确的Hugging Face模型ID
-EMBEDDING_MODEL_NAME = "BAAI/bge-large-zh-v1.5"
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-large-zh-v1.5")
+# 已登记的嵌入模型：输出维度和是否归一化。构建时把所用模型的信息写入索引的 index_meta.json，
+# 检索和增量更新时若当前配置的模型与索引不一致则拒绝执行，避免用不兼容的查询向量检索
+EMBEDDING_MODELS = {
+    "BAAI/bge-large-zh-v1.5": {"dim": 1024, "normalize": True},
+    "BAAI/bge-base-en-v1.5": {"dim": 768, "normalize": True},
+    "BAAI/bge-small-en-v1.5": {"dim": 384, "normalize": True},
+    "sentence-transformers/all-MiniLM-L6-v2": {"dim": 384, "normalize": True},
+}
 # 针对您的macOS系统，使用 "mps" 进行硬件加速。如果是Nvidia显卡用 "cuda"，纯CPU用 "cpu"
-EMBEDDING_DEVICE = "mps"
+# 可通过环境变量 EMBEDDING_DEVICE 覆盖，便于在只有CPU的服务器/CI上运行
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "mps")
+# 嵌入模型的推理后端："torch" 使用 sentence-transformers (PyTorch)；
+# "onnx" 使用导出的ONNX模型在 ONNX Runtime 上推理；"onnx-int8" 额外做动态int8量化，适合纯CPU机器
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_DIR = PROJECT_ROOT / "data" / "onnx_models"  # 导出的ONNX模型存放目录，首次使用时自动导出
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # ONNX Runtime 线程数，0 表示由其自动决定
+# 多进程批量嵌入（只用于构建和更新）：大于1时启动多个工作进程，每个进程加载自己的模型并只使用固定数量的线程，
+# 在多核CPU服务器上比单进程多线程推理的扩展性好得多
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+EMBEDDING_WORKER_THREADS = int(os.getenv("EMBEDDING_WORKER_THREADS", "0"))  # 每个工作进程的推理线程数，0 表示平均分配CPU核心
+EMBEDDING_WORKER_DEVICE = "cpu"  # 工作进程使用的设备
+EMBEDDING_WORKER_SHARD_SIZE = 32  # 每个分片（工作进程一次处理）的文本块数
+# 持久化嵌入缓存：以 (模型名称, 是否归一化, 文本哈希) 为键复用已计算的向量，由构建和增量更新共享
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = PROJECT_ROOT / "data" / "embedding_cache" / "embeddings.sqlite3"
+EMBEDDING_CACHE_MAX_BYTES = 4 * 1024 ** 3  # 超过该大小后按最近最少使用淘汰；None 表示不限制
+# 查询向量的内存LRU缓存：规范化后的查询文本 -> 向量，Agent重新规划或重试时重复的查询不再运行模型。0 表示不缓存
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+# 按token长度分桶的批量嵌入：长度相近的文本块放进同一批次，减少填充(padding)带来的无效计算
+EMBEDDING_BUCKETING_ENABLED = True
+EMBEDDING_TOKEN_BUDGET = 16384  # 每批 “批大小 × 批内最大token数” 的上限，用于控制单批次内存
+EMBEDDING_MAX_BATCH_SIZE = 128
+# 降维索引：把1024维向量投影到更低维度后再写入向量数据库，查询向量也做同样的投影。None 表示不降维
+EMBEDDING_REDUCED_DIM = None  # 例如 256
+EMBEDDING_REDUCTION_METHOD = "pca"  # "pca": 在样本上拟合PCA投影并随索引保存；"prefix": 直接截取前若干维
+EMBEDDING_PCA_FIT_SAMPLE = 20000  # 拟合PCA使用的文本块数量
 
 
 # --- RAG系统参数 (RAG Parameters) ---
 # 1. 数据注入/切分 (Ingestion / Chunking)
 CHUNK_SIZE = 750  # 每个文本块的目标大小（字符数）
 CHUNK_OVERLAP = 75 # 相邻文本块之间的重叠大小（字符数）
+# 文本块长度的计量单位："chars" 按字符数切分（CHUNK_SIZE / CHUNK_OVERLAP）；
+# "tokens" 用嵌入模型自己的分词器计数（CHUNK_SIZE_TOKENS / CHUNK_OVERLAP_TOKENS），保证文本块不超出模型的输入窗口
+CHUNK_LENGTH_UNIT = "chars"
+CHUNK_SIZE_TOKENS = 500  # bge-large-zh 的窗口为512个token，需为 [CLS] / [SEP] 预留位置
+CHUNK_OVERLAP_TOKENS = 50
+CHUNK_WORKERS = max(1, (os.cpu_count() or 1) // 2)  # 并行切分的进程数，设为1则串行切分
+CHUNK_PAPERS_PER_TASK = 8  # 每个切分任务包含的论文数
+PIPELINE_QUEUE_SIZE = 8  # 流水线构建中各阶段之间队列的最大长度，决定了构建时的内存上限
+# 按章节切分：识别摘要、引言、方法、结果、结论及参考文献等章节，文本块不跨章节，章节名写入元数据 `section`
+SECTION_AWARE_CHUNKING = True
+SECTION_DROP = {"references", "back_matter"}  # 不写入向量数据库的章节（参考文献、致谢、基金、利益声明等）
+# 近似重复文本块去重 (MinHash/LSH)：许可声明、作者单位、标准实验方法等重复内容只嵌入一次
+DEDUP_ENABLED = True
+DEDUP_JACCARD_THRESHOLD = 0.85  # 字符n-gram集合的Jaccard相似度达到该值即视为重复
+DEDUP_NUM_PERM = 128  # MinHash 签名长度
+DEDUP_SHINGLE_SIZE = 5  # 字符 n-gram 的长度
+# "drop": 只在同一篇论文内部去重，直接丢弃重复块；"link": 跨论文去重，并在 dedup_links.jsonl 中记录重复块及其对应的规范块，
+# 规范块所在论文被撤回或重新投递后，重复块会被写回向量数据库
+DEDUP_MODE = "link"
+DEDUP_MAX_CANONICAL_CHUNKS = 200000  # link 模式最多保留的规范块数（每个约2.4KB内存），超出后淘汰最久未被匹配的；None 表示不限制
+# 按发表年份分片：None 表示所有文本块存入同一个集合；设为N时每N年的文本块存入一个独立的集合（1即每年一个），
+# 带年份过滤条件的检索只查询年份范围相交的分片。只在完整重建时生效，已有索引的分片方式记录在其 shards.json 中
+VECTOR_DB_SHARD_YEARS = None
+# 投递目录持续注入 (watch_folder)：守护进程轮询投递目录中的单篇论文JSON文件，增量写入向量数据库和SQLite
+WATCH_DROP_DIR = PROJECT_ROOT / "data" / "incoming"  # 处理成功的文件移入其 processed/ 子目录，失败的移入 failed/
+WATCH_STATUS_PATH = PROJECT_ROOT / "data" / "incoming_status.json"  # 延迟和吞吐量计数器，每个批次后更新
+# 注入日志：投递注入的论文记录按行追加到这里，构建和 --sync 与 SOURCE_DATA_PATH 一起读取，注入的论文不会被同步删除
+WATCH_LOG_PATH = PROJECT_ROOT / "data" / "processed_text" / "watch_ingested.jsonl"
+WATCH_POLL_SECONDS = 10  # 轮询间隔
+WATCH_SETTLE_SECONDS = 2  # 文件修改时间距今超过该值才被视为写入完成
+WATCH_BATCH_WINDOW_SECONDS = 60  # 最早到达的文件等待超过该时间后，连同期间到达的文件作为一个批次处理
+WATCH_MAX_BATCH_FILES = 200  # 单个批次的文件数上限，达到后立即处理
+# 论文撤回 (retraction)：撤回记录（墓碑）保存在 SQLITE_DB_PATH 中，执行时每批删除的论文数
+TOMBSTONE_BATCH_SIZE = 100
 
 # 2. 检索 (Retrieval)
 # 在从数据库中检索时，返回最相似的 top_k 个文本块
 RETRIEVER_K = 10
+# 检索模式："chroma" 直接使用Chroma的HNSW索引；"binary" 先用符号位二值码按汉明距离粗筛候选，
+# 再用原始浮点向量精确重排（需在构建时生成二值索引）；"paper" 先用论文级向量选出最相关的若干篇论文，
+# 再只在这些论文的文本块中精确检索（需在构建时生成论文级索引）
+RETRIEVAL_MODE = "chroma"
+BINARY_INDEX_ENABLED = RETRIEVAL_MODE == "binary"  # 构建和更新向量数据库时同时维护二值索引，只有 "binary" 模式会用到
+BINARY_RESCORE_MULTIPLIER = 10  # 二值粗筛的候选数相对 k 的倍数
+PAPER_INDEX_ENABLED = RETRIEVAL_MODE == "paper"  # 构建和更新向量数据库时同时维护论文级索引（每篇论文一个向量），只有 "paper" 模式会用到
+# 论文向量的来源："abstract" 优先使用摘要文本块向量的均值，没有摘要的论文使用全部文本块向量的质心；"centroid" 总是使用质心
+PAPER_VECTOR_SOURCE = "abstract"
+PAPER_PREFILTER_TOP_N = 20  # 两阶段检索第一阶段选出的论文数
+# 检索结果缓存：以 (查询文本, k, 过滤条件, 索引版本与修订号) 为键缓存检索结果，热门问题跳过嵌入和向量检索。
+# 重建发布新版本，或增量更新/投递注入/撤回原地修改当前版本后，旧结果自动失效
+RETRIEVAL_CACHE_ENABLED = True
+RETRIEVAL_CACHE_SIZE = 512  # 内存中最多缓存的检索结果数，超出后按最近最少使用淘汰
+RETRIEVAL_CACHE_TTL_SECONDS = 3600  # 缓存结果的有效期（秒）；None 表示不过期
+# SQLite二级缓存，多个进程（如多个应用实例）共享；None 表示只使用内存缓存
+RETRIEVAL_CACHE_SQLITE_PATH = None  # 例如 PROJECT_ROOT / "data" / "retrieval_cache" / "results.sqlite3"
+RETRIEVAL_CACHE_SQLITE_MAX_ENTRIES = 20000
+# 按章节调整相似度：先多取 RETRIEVER_K × SECTION_RERANK_FETCH_MULTIPLIER 个候选，
+# 把相关度乘以所在章节的权重后重新排序，使结果、讨论等章节的文本块优先；未列出的章节权重为1
+SECTION_RERANK_ENABLED = True
+SECTION_RERANK_FETCH_MULTIPLIER = 3
+SECTION_WEIGHTS = {
+    "results": 1.15,
+    "discussion": 1.1,
+    "conclusions": 1.1,
+    "abstract": 1.05,
+    "methods": 0.95,
+    "introduction": 0.9,
+    "front_matter": 0.8,
+    "header": 0.8,
+}
 
 # 3. 生成 (Generation)
 # 这是提供给LLM的、包含上下文和问题的提示词模板
@@ -0,0 +1,41 @@
+"""
+统一的数据注入入口，所有命令共用同一套构建引擎（rag_system.ingestion.build_vectordb）：
+
+    python -m rag_system.ingestion build [--source ...] [--output ...] [--resume] [--no-title-join]
+    python -m rag_system.ingestion update [--sync] [--dry-run]
+    python -m rag_system.ingestion watch [--drop-dir ...] [--once]
+    python -m rag_system.ingestion retraction {retract,reinstate,apply,list,compact} ...
+
+命令之后的参数原样交给对应模块的 main()，与直接运行该模块时相同。
+"""
+import argparse
+import importlib
+import sys
+
+# 命令 -> (模块, 说明)
+COMMANDS = {
+    "build": ("rag_system.ingestion.build_vectordb", "从JSON全量构建新的向量数据库版本，结束时输出各阶段的性能分析"),
+    "update": ("rag_system.ingestion.update_vectordb", "增量更新或同步向量数据库"),
+    "watch": ("rag_system.ingestion.watch_folder", "持续监视投递目录并增量注入"),
+    "retraction": ("rag_system.ingestion.retraction", "撤回论文、执行墓碑和压缩数据库"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m rag_system.ingestion",
+        description="数据注入统一入口。",
+        epilog="\n".join(f"  {name:<11} {help_text}" for name, (_, help_text) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=COMMANDS, help="要执行的命令")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="传给该命令的参数")
+    args = parser.parse_args()
+
+    module_name, _ = COMMANDS[args.command]
+    sys.argv[0] = f"python -m rag_system.ingestion {args.command}"
+    importlib.import_module(module_name).main(args.args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from rag_system.config import settings
+
+# 二值索引与Chroma索引保存在同一个版本目录中
+BINARY_INDEX_FILENAME = "binary_index.npz"
+
+# 从Chroma中分页读取向量时每页的条目数
+_PAGE_SIZE = 5000
+# 每个字节中1的个数，numpy 2.0 之前没有 bitwise_count 时使用
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_signs(vectors) -> np.ndarray:
+    """把向量的每一维按正负号压缩为1个比特，1024维向量得到128字节的二值码。"""
+    return np.packbits(np.asarray(vectors, dtype=np.float32) > 0, axis=-1)
+
+
+def build_binary_index(db: Chroma, index_path: Path) -> Path:
+    """
+    从Chroma集合中分页读取全部向量，生成符号位二值码并保存到 index_path 目录。
+    先写入临时文件再原子替换，正在使用旧文件的检索组件不受影响。
+    开销与整个库的大小成正比，只用于完整构建和压缩；增量写入之后使用 update_binary_index。
+    """
+    codes, ids = [], []
+    offset = 0
+    while True:
+        page = db._collection.get(include=["embeddings"], limit=_PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        codes.append(pack_signs(page["embeddings"]))
+        ids.extend(page["ids"])
+        offset += len(page["ids"])
+
+    path = _save(index_path,
+                 np.concatenate(codes) if codes else np.zeros((0, 0), dtype=np.uint8),
+                 np.array([chunk_id.encode('utf-8') for chunk_id in ids], dtype=np.bytes_))
+    print(f"Binary index written: {len(ids)} codes, {path.stat().st_size / 1024 / 1024:.1f} MB at {path}")
+    return path
+
+
+def update_binary_index(db: Chroma, index_path: Path, added_ids: Iterable[str], removed_ids: Iterable[str]) -> Path:
+    """
+    增量更新之后调用：去掉已删除（或被重写）的文本块的二值码，只读取新写入的文本块的向量并追加其二值码。
+    开销与本次变化的文本块数成正比，而不是整个库的大小。索引文件不存在时退回到完整构建。
+    """
+    index = BinaryIndex.load(index_path)
+    if index is None:
+        return build_binary_index(db, index_path)
+    added_ids = list(dict.fromkeys(added_ids))
+    dropped = {chunk_id.encode('utf-8') for chunk_id in removed_ids}
+    dropped.update(chunk_id.encode('utf-8') for chunk_id in added_ids)
+    keep = ~np.isin(index.ids, list(dropped)) if dropped and len(index.ids) else np.ones(len(index.ids), dtype=bool)
+    codes, ids = [index.codes[keep]] if len(index.codes) else [], [index.ids[keep]]
+    for i in range(0, len(added_ids), _PAGE_SIZE):
+        found = db._collection.get(ids=added_ids[i:i + _PAGE_SIZE], include=["embeddings"])
+        if found["ids"]:
+            codes.append(pack_signs(found["embeddings"]))
+            ids.append(np.array([chunk_id.encode('utf-8') for chunk_id in found["ids"]], dtype=np.bytes_))
+    all_ids = np.concatenate(ids)
+    path = _save(index_path, np.concatenate(codes) if codes else index.codes, all_ids)
+    print(f"Binary index updated: {len(index.ids) - int(keep.sum())} codes removed, "
+          f"{len(all_ids) - int(keep.sum())} added, {len(all_ids)} in total")
+    return path
+
+
+def _save(index_path: Path, codes: np.ndarray, ids: np.ndarray) -> Path:
+    # 先写入临时文件再原子替换，正在使用旧文件的检索组件不受影响
+    path = Path(index_path) / BINARY_INDEX_FILENAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, codes=codes, ids=ids)
+    os.replace(tmp_path, path)
+    return path
+
+
+class BinaryIndex:
+    """
+    符号位二值索引：第一阶段用汉明距离在全部二值码中找出候选，
+    第二阶段从Chroma中只取候选的原始浮点向量，用精确的余弦相似度重新打分排序。
+
+    二值码只占浮点向量的1/32内存，汉明距离用按位异或加查表/位计数计算，在CPU上非常快。
+    """
+
+    def __init__(self, codes: np.ndarray, ids: np.ndarray):
+        self.codes = codes
+        self.ids = ids
+
+    @classmethod
+    def load(cls, index_path: Path) -> Optional["BinaryIndex"]:
+        path = Path(index_path) / BINARY_INDEX_FILENAME
+        if not path.exists():
+            return None
+        with np.load(str(path)) as data:
+            return cls(data["codes"], data["ids"])
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.ids.nbytes
+
+    def hamming_candidates(self, query_vector, count: int) -> np.ndarray:
+        """返回与查询二值码汉明距离最小的 count 个条目的下标（按距离升序）。"""
+        if len(self.codes) == 0:
+            return np.zeros(0, dtype=np.int64)
+        xor = np.bitwise_xor(self.codes, pack_signs(query_vector))
+        if hasattr(np, "bitwise_count"):
+            distances = np.bitwise_count(xor).sum(axis=1, dtype=np.int32)
+        else:
+            distances = _POPCOUNT[xor].sum(axis=1, dtype=np.int32)
+        count = min(count, len(distances))
+        candidates = np.argpartition(distances, count - 1)[:count]
+        return candidates[np.argsort(distances[candidates], kind="stable")]
+
+    def search(self, db: Chroma, query_vector: List[float], k: int,
+               rescore_multiplier: int = settings.BINARY_RESCORE_MULTIPLIER) -> List[Tuple[Document, float]]:
+        """汉明距离取 k × rescore_multiplier 个候选，再用精确向量重新打分，返回 (文档, 余弦相似度)。"""
+        candidates = self.hamming_candidates(query_vector, k * rescore_multiplier)
+        if len(candidates) == 0:
+            return []
+        candidate_ids = [self.ids[i].decode('utf-8') for i in candidates]
+        found = db._collection.get(ids=candidate_ids, include=["embeddings", "documents", "metadatas"])
+        if not found["ids"]:
+            return []
+        scores = np.asarray(found["embeddings"], dtype=np.float32) @ np.asarray(query_vector, dtype=np.float32)
+        order = np.argsort(-scores)[:k]
+        return [
+            (Document(page_content=found["documents"][i], metadata=found["metadatas"][i] or {}), float(scores[i]))
+            for i in order
+        ]
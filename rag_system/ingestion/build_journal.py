@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+from langchain_core.documents import Document
+
+JOURNAL_FILENAME = "build_journal.jsonl"
+# 决定向量本身的构建参数。文本块ID只由内容决定，这些参数变化后同一个批次的ID不变、向量却已不同，
+# 因此不能沿用暂存目录中已写入的批次
+EMBEDDING_FINGERPRINT_FIELDS = ("model", "backend", "normalize", "reduction")
+
+
+def batch_key(batch: List[Document]) -> str:
+    """根据批次内所有文本块的内容寻址ID计算批次标识：同样的文本块总是得到同样的批次标识。"""
+    digest = hashlib.sha1()
+    for doc in batch:
+        digest.update(doc.metadata["chunk_id"].encode('utf-8'))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class BuildJournal:
+    """
+    向量数据库构建的进度日志。
+
+    每当一个文本块批次被写入Chroma，就向日志文件追加一行记录并立即 fsync，
+    因此即使构建进程因 OOM 或被杀死而中断，日志中记录的批次也一定已经持久化。
+    使用 --resume 重新构建时，日志中已有的批次会被直接跳过，不再嵌入和写入。
+    嵌入相关的参数（EMBEDDING_FINGERPRINT_FIELDS）与日志中记录的不一致时拒绝恢复，其他参数不一致时只给出警告。
+
+    日志是追加写入的JSON Lines文件，第一行记录构建参数（fingerprint），
+    之后每行记录一个已完成的批次，构建成功结束时追加一行 complete 记录。
+    """
+
+    def __init__(self, path: Path, fingerprint: Dict[str, Any], resume: bool = False):
+        """
+        Args:
+            path (Path): 日志文件路径，通常位于向量数据库目录中。
+            fingerprint (Dict[str, Any]): 影响构建结果的参数（源文件、模型、切分参数等）。
+            resume (bool): 为True时读取已有日志并跳过其中的批次；否则覆盖旧日志。
+        """
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.completed = set()
+        self.skipped_batches = 0
+        self.skipped_chunks = 0
+
+        if resume and self.path.exists():
+            self._load()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"type": "header", "fingerprint": fingerprint, "created": time.time()},
+                                   ensure_ascii=False) + "\n")
+        self._file = open(self.path, "a", encoding="utf-8")
+        if resume and self._ends_with_partial_line():
+            self._file.write("\n")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程在写入最后一行时被中断，这一行不完整，忽略即可
+                    continue
+                if record.get("type") == "header" and record.get("fingerprint") != self.fingerprint:
+                    logged = record.get("fingerprint") or {}
+                    changed = [field for field in EMBEDDING_FINGERPRINT_FIELDS
+                               if logged.get(field) != self.fingerprint.get(field)]
+                    if changed:
+                        raise RuntimeError(
+                            f"无法继续构建：嵌入相关的参数 {', '.join(changed)} 与进度日志 {self.path} 中记录的不一致，"
+                            f"暂存目录中已写入的向量不能复用。请去掉 --resume 重新构建。")
+                    print(f"⚠️ 构建参数与进度日志中记录的不一致，只有内容完全相同的批次会被跳过。"
+                          f"\n   日志: {record.get('fingerprint')}\n   当前: {self.fingerprint}")
+                elif record.get("type") == "batch":
+                    self.completed.add(record["key"])
+        print(f"--- 从进度日志 {self.path} 恢复：已有 {len(self.completed)} 个批次完成 ---")
+
+    def _ends_with_partial_line(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def filter_batches(self, batches: Iterable[List[Document]]) -> Iterator[List[Document]]:
+        """过滤掉日志中已完成的批次，只产出仍需嵌入和写入的批次。"""
+        for batch in batches:
+            if batch_key(batch) in self.completed:
+                self.skipped_batches += 1
+                self.skipped_chunks += len(batch)
+                continue
+            yield batch
+
+    def record(self, batch: List[Document]):
+        """在批次成功写入向量数据库之后调用，持久化地记录该批次已完成。"""
+        key = batch_key(batch)
+        self._append({"type": "batch", "key": key, "chunks": len(batch)})
+        self.completed.add(key)
+
+    def mark_complete(self):
+        self._append({"type": "complete", "finished": time.time()})
+
+    def close(self):
+        self._file.close()
+
+    def _append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
@@ -1,86 +1,266 @@
-import json
-import shutil
 from pathlib import Path
 import argparse
-from typing import List
+import sqlite3
+from functools import partial
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import os
 os.environ["HF_ENDPOINT"] = "https://hf-mirror.com"
 # The new, recommended way to import HuggingFace embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import Embeddings
 from tqdm import tqdm
-import os
+
+from rag_system.config import settings
+from rag_system.ingestion import embedding as shared_embedding
+from rag_system.ingestion.embedding import (
+    close_embedding_function,
+    get_embedding_concurrency,
+    report_embedding_stats,
+    wrap_embedding_function
+)
+from rag_system.ingestion.binary_index import build_binary_index
+from rag_system.ingestion.build_journal import JOURNAL_FILENAME, BuildJournal
+from rag_system.ingestion.dedup import DEDUP_LINKS_FILENAME, ChunkDeduplicator, get_deduplicator
+from rag_system.ingestion.dim_reduction import (
+    PROJECTION_FILENAME,
+    Projection,
+    ReducedEmbeddings,
+    fit_projection,
+    load_index_projection
+)
+from rag_system.ingestion.index_versions import (
+    create_staging_dir,
+    publish_version,
+    resolve_active_path
+)
+from rag_system.ingestion.model_registry import get_model_spec, write_index_meta
+from rag_system.ingestion.paper_index import build_paper_index
+from rag_system.ingestion.paper_store import PaperStore, slim_chunk_metadata
+from rag_system.ingestion.pipeline import run_ingestion_pipeline
+from rag_system.ingestion.retraction import get_retracted_keys
+from rag_system.ingestion.shards import ShardedChroma, load_shard_manifest
+from rag_system.ingestion.text_chunker import assign_chunk_ids, get_chunk_sizes, get_paper_key, iter_split_documents
+from rag_system.ingestion.watch_log import iter_source_records
 # --- MODEL AND CHUNKING CONFIGURATION ---
-# Use the CORRECT, full model identifier from Hugging Face
-EMBEDDING_MODEL_NAME = "BAAI/bge-large-zh-v1.5"
-# For your Mac: "mps". For Nvidia GPU: "cuda". For CPU-only: "cpu".
-EMBEDDING_DEVICE = "mps"
+# Use the CORRECT, full model identifier from Hugging Face; must be registered in settings.EMBEDDING_MODELS
+EMBEDDING_MODEL_NAME = settings.EMBEDDING_MODEL_NAME
+# For your Mac: "mps". For Nvidia GPU: "cuda". For CPU-only: "cpu". Override with the EMBEDDING_DEVICE env var.
+EMBEDDING_DEVICE = settings.EMBEDDING_DEVICE
 
 # Text chunking settings
 CHUNK_SIZE = 750
 CHUNK_OVERLAP = 75
+# 每批写入向量数据库的文本块数量。流式构建时，内存中最多只保留一个批次
+BATCH_SIZE = 128
+# SQLite 单条语句中允许的参数数量有限，按DOI读取标题时按此大小分批
+_SQL_BATCH = 500
 
 
 # --- CORE FUNCTIONS ---
 
-def load_and_prepare_documents(json_path: Path) -> List[Document]:
+def prepare_document(paper: Dict[str, Any]) -> Optional[Document]:
+    """Converts one paper record into a LangChain Document, or None if it has no full text."""
+    page_content = paper.get("llm_ready_fulltext_cleaned", "")
+    if not page_content:
+        return None
+
+    metadata = {
+        "doi": paper.get("doi", "N/A"),
+        "title": paper.get("retrieved_title", "N/A"),
+        "year": paper.get("retrieved_year", "N/A"),
+        "journal": paper.get("retrieved_journal", "N/A"),
+        "authors": ", ".join(paper.get("retrieved_authors", [])),
+        "keywords": ", ".join(paper.get("extracted_keywords", [])),
+        "filename": paper.get("filename", "N/A"),
+        "local_path": paper.get("local_path", "N/A"),
+    }
+    return Document(page_content=page_content, metadata=metadata)
+
+
+def get_authoritative_titles(sqlite_path: Path = settings.SQLITE_DB_PATH,
+                             dois: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    Reads the DOI -> title map from the Papers table of the structured SQLite database.
+
+    Titles there were curated during structuring and are preferred over the titles scraped into
+    the JSON source. Returns an empty map (and the build keeps the JSON titles) if the database
+    or its Papers table does not exist yet. With dois, only the titles of those papers are read.
+    """
+    sqlite_path = Path(sqlite_path)
+    if not sqlite_path.exists():
+        print(f"⚠️ SQLite database not found at '{sqlite_path}', keeping titles from the JSON source.")
+        return {}
+    conn = sqlite3.connect(sqlite_path)
+    try:
+        if dois is None:
+            rows = conn.execute("SELECT doi, title FROM Papers").fetchall()
+        else:
+            dois = sorted(set(dois))
+            rows = []
+            for i in range(0, len(dois), _SQL_BATCH):
+                part = dois[i:i + _SQL_BATCH]
+                rows.extend(conn.execute(
+                    f"SELECT doi, title FROM Papers WHERE doi IN ({','.join('?' * len(part))})", part).fetchall())
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ Could not read authoritative titles from '{sqlite_path}': {e}")
+        return {}
+    finally:
+        conn.close()
+    title_map = {doi: title for doi, title in rows if doi and title}
+    print(f"✅ Loaded {len(title_map)} authoritative titles from SQLite.")
+    return title_map
+
+
+def make_title_join(title_map: Dict[str, str]) -> Callable[[Document], Document]:
+    """Returns a per-document transform that replaces the title with the authoritative one, matched by DOI."""
+    def join_title(document: Document) -> Document:
+        title = title_map.get(document.metadata.get("doi"))
+        if title:
+            document.metadata["title"] = title
+        return document
+
+    return join_title
+
+
+def get_title_join(enabled: Optional[bool] = None,
+                   dois: Optional[Iterable[str]] = None) -> Optional[Callable[[Document], Document]]:
+    """
+    The SQLite title join shared by the build, update, sync and the watch folder, or None when it
+    is disabled (enabled defaults to settings.TITLE_JOIN_ENABLED).
+
+    Every path that writes paper rows must apply it: PaperStore replaces the IndexedPapers row, so
+    a path without it would reset the curated titles to the scraped ones. With dois, only the
+    titles of those papers are read.
+    """
+    if enabled is None:
+        enabled = settings.TITLE_JOIN_ENABLED
+    if not enabled:
+        return None
+    return make_title_join(get_authoritative_titles(settings.SQLITE_DB_PATH, dois))
+
+
+def load_and_prepare_documents(json_path: Path, watch_log_path: Path = settings.WATCH_LOG_PATH) -> Iterator[Document]:
     """
-    Loads paper data from the JSON file and prepares them as LangChain Document objects.
+    Streams paper records from the JSON file and yields them as LangChain Document objects.
+
+    Records are parsed one at a time, so memory does not grow with the size of the corpus.
+    Papers delivered through the watch folder are read from its append-only log after the
+    JSON file (see rag_system.ingestion.watch_log.iter_source_records).
+    Papers retracted with a tombstone (see rag_system.ingestion.retraction) are skipped.
     """
     print(f"--- Loading data from {json_path} ---")
 
     if not json_path.exists():
         print(f"Error: Source JSON file not found at {json_path}")
-        return []
-
-    with open(json_path, 'r', encoding='utf-8') as f:
-        papers_data = json.load(f)
+        return
 
-    documents = []
-    for paper in tqdm(papers_data, desc="Preparing documents"):
-        page_content = paper.get("llm_ready_fulltext_cleaned", "")
-        if not page_content:
+    retracted = get_retracted_keys()
+    document_count = 0
+    for paper in tqdm(iter_source_records(json_path, watch_log_path), desc="Preparing documents"):
+        doc = prepare_document(paper)
+        if doc is None or get_paper_key(doc.metadata) in retracted:
             continue
 
-        metadata = {
-            "doi": paper.get("doi", "N/A"),
-            "title": paper.get("retrieved_title", "N/A"),
-            "year": paper.get("retrieved_year", "N/A"),
-            "journal": paper.get("retrieved_journal", "N/A"),
-            "authors": ", ".join(paper.get("retrieved_authors", [])),
-            "keywords": ", ".join(paper.get("extracted_keywords", [])),
-            "filename": paper.get("filename", "N/A"),
-            "local_path": paper.get("local_path", "N/A"),
-        }
+        document_count += 1
+        yield doc
 
-        doc = Document(page_content=page_content, metadata=metadata)
-        documents.append(doc)
+    print(f"Successfully loaded and prepared {document_count} documents.")
 
-    print(f"Successfully loaded and prepared {len(documents)} documents.")
-    return documents
+
+def get_chunk_params() -> Tuple[int, int]:
+    """
+    Chunk size and overlap for settings.CHUNK_LENGTH_UNIT: this module's character sizes,
+    or settings.CHUNK_SIZE_TOKENS / CHUNK_OVERLAP_TOKENS when measuring with the model tokenizer.
+    """
+    if settings.CHUNK_LENGTH_UNIT == "chars":
+        return CHUNK_SIZE, CHUNK_OVERLAP
+    return get_chunk_sizes(settings.CHUNK_LENGTH_UNIT)
 
 
-def chunk_documents(documents: List[Document]) -> List[Document]:
-    """Splits the loaded documents into smaller chunks."""
+def chunk_documents(documents: List[Document], workers: int = settings.CHUNK_WORKERS) -> List[Document]:
+    """Splits the loaded documents into smaller chunks, using a process pool when workers > 1."""
     print("--- Chunking documents ---")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        add_start_index=True
-    )
-    chunked_documents = text_splitter.split_documents(documents)
+    chunked_documents = [
+        chunk
+        for chunks in iter_split_documents(documents, *get_chunk_params(), workers=workers)
+        for chunk in chunks
+    ]
     print(f"Split {len(documents)} documents into {len(chunked_documents)} chunks.")
     return chunked_documents
 
 
-def get_embedding_function() -> HuggingFaceEmbeddings:
-    """Initializes and returns the embedding model function using the new package."""
+def iter_chunk_batches(
+        documents: Iterable[Document],
+        batch_size: int = BATCH_SIZE,
+        workers: int = settings.CHUNK_WORKERS,
+        deduplicator: Optional[ChunkDeduplicator] = None,
+        paper_store: Optional[PaperStore] = None
+) -> Iterator[List[Document]]:
+    """
+    Splits documents and yields their chunks in fixed-size batches, in document order.
+
+    With workers > 1 the splitting runs in a process pool. Every chunk gets a content-addressed
+    `chunk_id` in its metadata. A paper whose key (DOI, falling back to its path) was already
+    seen is skipped, so IDs stay unique. With a deduplicator, near-duplicate chunks are removed
+    before batching, so they are never embedded.
+
+    With a paper_store, paper-level fields are written once per paper to the side table and each
+    chunk keeps only slim metadata (paper_key, chunk_id, start_index, section, year). The side
+    table is flushed before a batch is yielded, so its rows always exist before the chunks do.
+    """
+    seen_paper_keys = set()
+
+    def iter_unique_documents():
+        for document in documents:
+            paper_key = get_paper_key(document.metadata)
+            if paper_key in seen_paper_keys:
+                print(f"Warning: duplicate paper '{paper_key}' in source, skipping.")
+                continue
+            seen_paper_keys.add(paper_key)
+            yield document
+
+    batch = []
+    chunk_size, chunk_overlap = get_chunk_params()
+    for chunks in iter_split_documents(iter_unique_documents(), chunk_size=chunk_size,
+                                       chunk_overlap=chunk_overlap, workers=workers):
+        assign_chunk_ids(chunks)
+        if paper_store is not None and chunks:
+            paper_store.add(chunks[0].metadata)
+            for chunk in chunks:
+                chunk.metadata = slim_chunk_metadata(chunk.metadata)
+        if deduplicator is not None:
+            chunks = deduplicator.filter_chunks(chunks)
+        batch.extend(chunks)
+        while len(batch) >= batch_size:
+            if paper_store is not None:
+                paper_store.flush()
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        if paper_store is not None:
+            paper_store.flush()
+        yield batch
+
+
+def get_embedding_function(use_cache: bool = settings.EMBEDDING_CACHE_ENABLED) -> Embeddings:
+    """
+    Initializes and returns the embedding model function using the new package.
+
+    The model is wrapped in the length-bucketed batcher and, with use_cache, in the persistent
+    embedding cache shared by build and update. The ONNX backends (settings.EMBEDDING_BACKEND)
+    and multi-process embedding (settings.EMBEDDING_WORKERS > 1) are provided by the shared
+    rag_system.ingestion.embedding module.
+    """
+    if settings.EMBEDDING_BACKEND != "torch" or settings.EMBEDDING_WORKERS > 1:
+        return shared_embedding.get_embedding_function(use_cache=use_cache, workers=settings.EMBEDDING_WORKERS)
+
     print(f"--- Initializing embedding model: {EMBEDDING_MODEL_NAME} ---")
     # Use the new HuggingFaceEmbeddings class from langchain-huggingface
     model_kwargs = {"device": EMBEDDING_DEVICE}
-    encode_kwargs = {"normalize_embeddings": True}
+    encode_kwargs = {"normalize_embeddings": get_model_spec(EMBEDDING_MODEL_NAME)["normalize"]}
 
     embeddings = HuggingFaceEmbeddings(
         model_name=EMBEDDING_MODEL_NAME,
@@ -88,71 +268,229 @@ def get_embedding_function() -> HuggingFaceEmbeddings:
         encode_kwargs=encode_kwargs
     )
     print(f"Embedding model loaded successfully on device: '{EMBEDDING_DEVICE}'")
-    return embeddings
+    return wrap_embedding_function(embeddings, EMBEDDING_MODEL_NAME,
+                                   encode_kwargs["normalize_embeddings"], use_cache=use_cache)
+
+
+def get_build_fingerprint(source_path: Path, title_join: bool = settings.TITLE_JOIN_ENABLED) -> Dict[str, Any]:
+    """Parameters that determine the content of a build, recorded in the progress journal."""
+    return {
+        "source": str(source_path.resolve()),
+        "model": EMBEDDING_MODEL_NAME,
+        "backend": settings.EMBEDDING_BACKEND,
+        "normalize": get_model_spec(EMBEDDING_MODEL_NAME)["normalize"],
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "length_unit": settings.CHUNK_LENGTH_UNIT,
+        "metadata": "slim",
+        "reduction": [settings.EMBEDDING_REDUCTION_METHOD, settings.EMBEDDING_REDUCED_DIM]
+        if settings.EMBEDDING_REDUCED_DIM else None,
+        "token_sizes": [settings.CHUNK_SIZE_TOKENS, settings.CHUNK_OVERLAP_TOKENS]
+        if settings.CHUNK_LENGTH_UNIT == "tokens" else None,
+        "batch_size": BATCH_SIZE,
+        "sections": sorted(settings.SECTION_DROP) if settings.SECTION_AWARE_CHUNKING else None,
+        "dedup": [settings.DEDUP_JACCARD_THRESHOLD, settings.DEDUP_NUM_PERM, settings.DEDUP_SHINGLE_SIZE,
+                  settings.DEDUP_MODE, settings.DEDUP_MAX_CANONICAL_CHUNKS]
+        if settings.DEDUP_ENABLED else None,
+        "shard_years": settings.VECTOR_DB_SHARD_YEARS,
+        "title_join": title_join,
+    }
+
+
+def validate_build(db: Union[Chroma, ShardedChroma], expected_count: int):
+    """
+    Checks a freshly built index before it is published: the vector count must match the number
+    of chunks written, and a sample query must return results. Raises RuntimeError otherwise.
+    """
+    count = db._collection.count()
+    if count == 0 or count != expected_count:
+        raise RuntimeError(f"Validation failed: expected {expected_count} vectors, found {count}.")
+    if not db.similarity_search(settings.INDEX_VALIDATION_QUERY, k=1):
+        raise RuntimeError(f"Validation failed: sample query '{settings.INDEX_VALIDATION_QUERY}' returned nothing.")
+    print(f"Validation passed: {count} vectors, sample query returned results.")
+
+
+def build_index(
+        documents: Iterable[Document],
+        chunk_batches: Callable[[Iterable[Document]], Iterator[List[Document]]],
+        embedding_function: Embeddings,
+        db_path: Path,
+        fingerprint: Dict[str, Any],
+        resume: bool = False,
+        deduplicator: Optional[ChunkDeduplicator] = None,
+        projection_factory: Optional[Callable[[], Projection]] = None,
+        shard_years: Optional[int] = settings.VECTOR_DB_SHARD_YEARS,
+        document_transform: Optional[Callable[[Document], Document]] = None
+) -> Path:
+    """
+    Builds a new index version under db_path and publishes it atomically.
+
+    The build is written into a versioned staging directory while the current version keeps
+    serving queries. Once the staging index passes validation, the CURRENT pointer is switched
+    to it. With resume=True, the latest unpublished staging directory is reused and batches
+    recorded in its progress journal are skipped. Resuming is refused (RuntimeError) when the
+    model, backend, normalization or dimension reduction differ from the journal's.
+
+    The deduplicator, if any, must be the one used by chunk_batches; its duplicate -> canonical
+    links are written next to the index.
+
+    With a projection_factory the index stores reduced-dimension vectors: the projection is fitted
+    once (or reloaded from the staging directory on resume), saved with the index, and applied to
+    both the stored chunks and the validation query.
+
+    The embedding model, backend and stored vector dimension are recorded in the version's
+    index_meta.json; readers refuse to query the index with a different model.
+
+    With shard_years, chunks are routed by publication year into one Chroma collection per
+    shard_years-year range, listed in the version's shards.json (see ShardedChroma).
 
+    A document_transform (e.g. the SQLite title join) is applied to every document as it is
+    loaded and profiled as its own pipeline stage.
 
-def run_build_pipeline(source_path: Path, db_path: Path):
+    Returns:
+        Path: The published version directory.
+    """
+    staging_path = create_staging_dir(db_path, resume=resume)
+    print(f"--- Building new index version in {staging_path} ---")
+    if projection_factory is not None:
+        projection = load_index_projection(staging_path)
+        if projection is None:
+            projection = projection_factory()
+            projection.save(staging_path / PROJECTION_FILENAME)
+        print(f"Reduced-dimension index: {projection.method}, {projection.dim} dims")
+        embedding_function = ReducedEmbeddings(embedding_function, projection)
+    if shard_years or load_shard_manifest(staging_path) is not None:
+        db = ShardedChroma(staging_path, embedding_function, span=shard_years)
+        print(f"Year-sharded index: {db.span} year(s) per shard")
+    else:
+        db = Chroma(
+            persist_directory=str(staging_path),
+            embedding_function=embedding_function
+        )
+    journal = BuildJournal(staging_path / JOURNAL_FILENAME, fingerprint, resume=resume)
+    if deduplicator is not None:
+        # 断点续建时会重放全部文本块，去重结果与之前完全相同，所以对应关系文件总是重新写入
+        deduplicator.open_links(staging_path / DEDUP_LINKS_FILENAME)
+    try:
+        stats = run_ingestion_pipeline(
+            documents,
+            lambda docs: journal.filter_batches(chunk_batches(docs)),
+            embedding_function,
+            db,
+            on_batch_written=journal.record,
+            embed_threads=get_embedding_concurrency(embedding_function),
+            transform=document_transform
+        )
+        journal.mark_complete()
+    finally:
+        journal.close()
+        if deduplicator is not None:
+            deduplicator.close()
+    written = stats.stages['write']['items']
+    print(f"Embedded and stored {written} chunks.")
+    if journal.skipped_batches:
+        print(f"Resumed: skipped {journal.skipped_batches} batches ({journal.skipped_chunks} chunks) "
+              f"already recorded in the progress journal.")
+    print(stats.format_report())
+    if deduplicator is not None:
+        print(deduplicator.format_stats())
+    report_embedding_stats(embedding_function)
+
+    validate_build(db, expected_count=written + journal.skipped_chunks)
+    meta = write_index_meta(staging_path, db, EMBEDDING_MODEL_NAME)
+    print(f"Index model: {meta['model']} ({meta['backend']}), {meta['dim']} dims stored")
+    if settings.BINARY_INDEX_ENABLED:
+        build_binary_index(db, staging_path)
+    if settings.PAPER_INDEX_ENABLED:
+        build_paper_index(db, staging_path)
+    publish_version(db_path, staging_path)
+    return resolve_active_path(db_path)
+
+
+def fit_projection_from_source(source_path: Path, embedding_function: Embeddings,
+                               dim: int = settings.EMBEDDING_REDUCED_DIM,
+                               method: str = settings.EMBEDDING_REDUCTION_METHOD,
+                               sample_size: int = settings.EMBEDDING_PCA_FIT_SAMPLE) -> Projection:
+    """
+    Fits the dimensionality-reduction projection on the first sample_size chunks of the source.
+    With the embedding cache enabled, these vectors are reused by the main build pass.
+    """
+    if method == "prefix":
+        return fit_projection([], dim, method)
+    print(f"--- Fitting {dim}-dim PCA projection on up to {sample_size} chunks ---")
+    vectors = []
+    for batch in iter_chunk_batches(load_and_prepare_documents(source_path)):
+        texts = [doc.page_content for doc in batch[:sample_size - len(vectors)]]
+        vectors.extend(embedding_function.embed_documents(texts))
+        if len(vectors) >= sample_size:
+            break
+    return fit_projection(vectors, dim, method)
+
+
+def run_build_pipeline(source_path: Path, db_path: Path, resume: bool = False,
+                       title_join: bool = settings.TITLE_JOIN_ENABLED):
     """
     The main function to orchestrate the vector DB creation process using provided paths.
+
+    The new index is built next to the live one and swapped in atomically (see build_index),
+    so readers never see a missing or half-built database. With title_join, paper titles are
+    replaced by the authoritative titles from the SQLite Papers table. A per-stage profile
+    (wall time, items/s, peak memory) is printed at the end.
     """
-    # Step 1: Load and prepare documents from the JSON file
+    # Step 1: Stream documents from the JSON file (nothing is parsed up front)
     documents = load_and_prepare_documents(source_path)
-    if not documents:
+    first_document = next(documents, None)
+    if first_document is None:
         print("No documents to process. Exiting.")
         return
+    documents = chain([first_document], documents)
+    document_transform = get_title_join(title_join)
 
-    # Step 2: Split the documents into manageable chunks
-    chunked_docs = chunk_documents(documents)
-
-    # Step 3: Initialize the embedding model
+    # Step 2: Initialize the embedding model
     embedding_function = get_embedding_function()
 
-    # Step 4: Build and persist the vector database
+    # Step 3: Load, chunk, embed and persist concurrently, then validate and publish
     print(f"--- Building vector database at {db_path} ---")
-
-    if db_path.exists():
-        print(f"Found existing database. Removing to create a new one...")
-        shutil.rmtree(db_path)
-
-    db = Chroma.from_documents(
-        documents=chunked_docs,
-        embedding=embedding_function,
-        persist_directory=str(db_path)
-    )
+    deduplicator = get_deduplicator()
+    paper_store = PaperStore()
+    projection_factory = None
+    if settings.EMBEDDING_REDUCED_DIM:
+        projection_factory = partial(fit_projection_from_source, source_path, embedding_function)
+    try:
+        version_path = build_index(documents,
+                                   partial(iter_chunk_batches, deduplicator=deduplicator, paper_store=paper_store),
+                                   embedding_function, db_path, get_build_fingerprint(source_path, title_join),
+                                   resume=resume, deduplicator=deduplicator,
+                                   projection_factory=projection_factory,
+                                   document_transform=document_transform)
+    finally:
+        paper_store.close()
+        # Shuts down the embedding worker processes when EMBEDDING_WORKERS > 1
+        close_embedding_function(embedding_function)
 
     print("\n🎉 Vector database build complete!")
-    print(f"   Database stored at: {db_path}")
-    print(f"   Total vectors in DB: {db._collection.count()}")
+    print(f"   Database stored at: {version_path}")
 
 
-# --- MAIN EXECUTION LOGIC ---
-def main():
-    # --- Configuration for direct IDE run ---
-    IDE_RUN = True
-
-    # --- Default values for IDE execution (Modify these as needed) ---
-    IDE_DEFAULT_SOURCE_JSON_PATH = "../data/processed_text/processed_papers_test.json"
-    IDE_DEFAULT_VECTOR_DB_PATH = "../data/vector_db_test/chroma_db_test.db"
-
-    if IDE_RUN:
-        print("Running in IDE mode with hardcoded paths.")
-        source_path_str = IDE_DEFAULT_SOURCE_JSON_PATH
-        db_path_str = IDE_DEFAULT_VECTOR_DB_PATH
-    else:
-        print("Running with command-line arguments.")
-        parser = argparse.ArgumentParser(description="Build a Chroma vector database from processed JSON data.")
-        parser.add_argument("--source", required=True, help="Path to the source processed JSON file.")
-        parser.add_argument("--output", required=True, help="Path to the output folder for the Chroma database.")
-        args = parser.parse_args()
-        source_path_str = args.source
-        db_path_str = args.output
+def add_build_arguments(parser: argparse.ArgumentParser):
+    """Command-line options of the build, shared by this module and `python -m rag_system.ingestion build`."""
+    parser.add_argument("--source", default=str(settings.SOURCE_DATA_PATH), help="Path to the source processed JSON file.")
+    parser.add_argument("--output", default=str(settings.VECTOR_DB_PATH),
+                        help="Path to the output folder for the Chroma database.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted build, skipping batches recorded in its progress journal.")
+    parser.add_argument("--no-title-join", action="store_true",
+                        help="Keep the titles from the JSON source instead of the authoritative SQLite titles.")
 
-    # --- Run the pipeline ---
-    source_path = Path(source_path_str)
-    db_path = Path(db_path_str)
 
-    run_build_pipeline(source_path, db_path)
+# --- MAIN EXECUTION LOGIC ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build a Chroma vector database from processed JSON data.")
+    add_build_arguments(parser)
+    args = parser.parse_args(argv)
+    run_build_pipeline(Path(args.source), Path(args.output), resume=args.resume,
+                       title_join=settings.TITLE_JOIN_ENABLED and not args.no_title_join)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,266 @@
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import AbstractSet, Any, Dict, Iterable, List, Optional, TextIO, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag_system.config import settings
+from rag_system.ingestion.text_chunker import get_paper_key
+
+DEDUP_LINKS_FILENAME = "dedup_links.jsonl"
+
+# MinHash 使用的哈希族 h(x) = ((a * x + b) mod p) & 0xFFFFFFFF
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WHITESPACE = re.compile(r"\s+")
+# 写回重复块时每批写入的条目数
+_UPSERT_BATCH = 5000
+
+
+def _choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    选择LSH的分段数 b 和每段行数 r，使阈值附近的误报率与漏报率之和最小。
+    两个候选在某一段上完全相同的概率为 s^r，至少一段相同的概率为 1 - (1 - s^r)^b。
+    """
+    steps = np.linspace(0.0, 1.0, 201)
+    step = steps[1] - steps[0]
+    best, best_error = (1, num_perm), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        probability = 1 - (1 - steps ** rows) ** bands
+        false_positive = np.sum(np.where(steps < threshold, probability, 0.0)) * step
+        false_negative = np.sum(np.where(steps >= threshold, 1 - probability, 0.0)) * step
+        if false_positive + false_negative < best_error:
+            best, best_error = (bands, rows), false_positive + false_negative
+    return best
+
+
+class ChunkDeduplicator:
+    """
+    基于 MinHash/LSH 的近似重复文本块过滤器。
+
+    每个文本块被规范化（小写、合并空白）后切成字符 n-gram，计算 MinHash 签名，
+    再用LSH分段索引找出候选的相似块；签名估计的Jaccard相似度不低于阈值时视为重复。
+    第一次出现的块作为“规范块”保留，之后的重复块不会被嵌入和写入：
+    - mode="drop"：只在同一篇论文内部去重，重复块直接丢弃。论文被删除时它的全部文本块一起删除，
+      不会有其他论文的内容因此丢失；每篇论文开始时清空状态，内存占用与语料规模无关；
+    - mode="link"：跨论文去重（许可声明、作者单位、标准实验方法等），并在 dedup_links.jsonl 中记录
+      重复块 -> 规范块 的对应关系以及重复块的文本和元数据。规范块所在的论文被撤回或重新投递后，
+      `readmit_linked_duplicates` 会把链接到它的重复块写回向量数据库，内容不会丢失。
+
+    link 模式的状态在构建过程中累积：每个规范块约占 num_perm × 4 字节的签名，加上LSH分段索引和字典的开销，
+    默认参数（128维签名、8段×16行）下实测合计约 2.4 KB。max_entries 限制保留的规范块数，超出后淘汰最久没有
+    被匹配到的规范块（之后与它重复的块不再被识别，只是少去重一些；反复出现的模板内容因为总被匹配而一直保留），
+    因此内存上限约为 max_entries × 2.4 KB。
+    同样的输入顺序总是得到同样的过滤结果，断点续建和增量同步时的文本块ID集合保持一致。
+    """
+
+    def __init__(
+            self,
+            threshold: float = settings.DEDUP_JACCARD_THRESHOLD,
+            num_perm: int = settings.DEDUP_NUM_PERM,
+            shingle_size: int = settings.DEDUP_SHINGLE_SIZE,
+            mode: str = settings.DEDUP_MODE,
+            max_entries: Optional[int] = settings.DEDUP_MAX_CANONICAL_CHUNKS,
+    ):
+        """
+        Args:
+            threshold (float): 判定为重复的Jaccard相似度阈值。
+            num_perm (int): MinHash 签名长度，越长估计越准、也越慢。
+            shingle_size (int): 字符 n-gram 的长度。
+            mode (str): "drop" 或 "link"。
+            max_entries (Optional[int]): link 模式下最多保留的规范块数，None 表示不限制。
+        """
+        if mode not in ("drop", "link"):
+            raise ValueError(f"未知的去重模式: {mode}，可选值为 drop / link")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.mode = mode
+        self.max_entries = max_entries
+        self.bands, self.rows = _choose_bands(threshold, num_perm)
+
+        generator = np.random.RandomState(1)
+        self._a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(self.bands)]
+        self._links_file: Optional[TextIO] = None
+        self._paper_key: Optional[str] = None
+
+        self.chunks_seen = 0
+        self.duplicates = 0
+        self.duplicate_chars = 0
+        self.evicted = 0
+
+    # --- 过滤 ---
+
+    def filter_chunks(self, chunks: List[Document]) -> List[Document]:
+        """返回去除近似重复块之后的文本块列表；每个文本块的元数据中必须已有 `chunk_id`。"""
+        kept = []
+        for chunk in chunks:
+            self.chunks_seen += 1
+            chunk_id = chunk.metadata["chunk_id"]
+            paper_key = get_paper_key(chunk.metadata)
+            if self.mode == "drop" and paper_key != self._paper_key:
+                self._reset()
+            self._paper_key = paper_key
+            signature = self.signature(chunk.page_content)
+            canonical_id, similarity = self._find_duplicate(signature)
+            if canonical_id is None:
+                self._insert(chunk_id, signature)
+                kept.append(chunk)
+                continue
+
+            self.duplicates += 1
+            self.duplicate_chars += len(chunk.page_content)
+            if self.mode == "link" and self._links_file is not None:
+                # 文本和元数据一并记录，规范块被删除后可以把重复块写回向量数据库
+                self._links_file.write(json.dumps({
+                    "chunk_id": chunk_id,
+                    "canonical_id": canonical_id,
+                    "paper_key": paper_key,
+                    "similarity": round(similarity, 4),
+                    "page_content": chunk.page_content,
+                    "metadata": chunk.metadata,
+                }, ensure_ascii=False) + "\n")
+        return kept
+
+    def signature(self, text: str) -> np.ndarray:
+        normalized = _WHITESPACE.sub(" ", text.lower()).strip()
+        size = self.shingle_size
+        shingles = {normalized[i:i + size] for i in range(max(1, len(normalized) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64,
+                             count=len(shingles))
+        permuted = ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _find_duplicate(self, signature: np.ndarray) -> Tuple[Optional[str], float]:
+        checked = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= self.threshold:
+                    # 被匹配到的规范块移到末尾，淘汰时最后才轮到它
+                    self._signatures[candidate] = self._signatures.pop(candidate)
+                    return candidate, similarity
+        return None, 0.0
+
+    def _insert(self, chunk_id: str, signature: np.ndarray):
+        self._signatures[chunk_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(chunk_id)
+        if self.max_entries is not None and len(self._signatures) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        # 字典保持插入（和最近匹配）顺序，第一个键就是最久没有被匹配到的规范块
+        chunk_id = next(iter(self._signatures))
+        signature = self._signatures.pop(chunk_id)
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band][key]
+            bucket.remove(chunk_id)
+            if not bucket:
+                del self._buckets[band][key]
+        self.evicted += 1
+
+    def _reset(self):
+        self._signatures.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+
+    # --- 对应关系文件 ---
+
+    def open_links(self, path: Path, append: bool = False):
+        """mode="link" 时，把重复块与规范块的对应关系写入 path（JSON Lines）。"""
+        if self.mode != "link":
+            return
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._links_file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def close(self):
+        if self._links_file is not None:
+            self._links_file.close()
+            self._links_file = None
+
+    # --- 统计 ---
+
+    def format_stats(self) -> str:
+        rate = self.duplicates / self.chunks_seen if self.chunks_seen else 0.0
+        action = "linked" if self.mode == "link" else "dropped within their paper"
+        evicted = f", {self.evicted} canonical chunks evicted from the index" if self.evicted else ""
+        return (
+            f"Near-duplicate filter (Jaccard >= {self.threshold}, {self.bands} bands x {self.rows} rows): "
+            f"{self.duplicates} of {self.chunks_seen} chunks {action} ({rate:.1%}), "
+            f"{self.duplicate_chars / 1e6:.1f} M chars not embedded{evicted}"
+        )
+
+
+def readmit_linked_duplicates(db, index_path: Path, removed_ids: Iterable[str],
+                              removed_paper_keys: AbstractSet[str]) -> List[str]:
+    """
+    在删除文本块之前调用：找出 dedup_links.jsonl 中链接到即将删除的规范块、且所在论文不在 removed_paper_keys 中的
+    重复块，把它们写回向量数据库，返回写回的文本块ID（调用方据此更新二值索引和论文级索引）。
+
+    重复块从未被嵌入，写回时直接使用其规范块的向量（两者的Jaccard相似度不低于去重阈值，检索行为与删除前相同），
+    因此不需要加载嵌入模型。同一个规范块的多个重复块中，第一个被写回并成为新的规范块，其余的改为链接到它。
+    链接到已删除规范块、但自身也属于被删除论文的记录直接丢弃。对应关系文件先写临时文件再原子替换。
+    """
+    links_path = Path(index_path) / DEDUP_LINKS_FILENAME
+    if not links_path.exists():
+        return []
+    removed_ids = set(removed_ids)
+    with open(links_path, "r", encoding="utf-8") as f:
+        links = [json.loads(line) for line in f if line.strip()]
+    affected = [link for link in links if link["canonical_id"] in removed_ids]
+    if not affected:
+        return []
+
+    found = db._collection.get(ids=sorted({link["canonical_id"] for link in affected}), include=["embeddings"])
+    vectors = dict(zip(found["ids"], found["embeddings"]))
+    new_canonical: Dict[str, str] = {}
+    readmitted: List[Dict[str, Any]] = []
+    kept_links = []
+    for link in links:
+        canonical_id = link["canonical_id"]
+        if canonical_id not in removed_ids:
+            kept_links.append(link)
+        elif link["paper_key"] in removed_paper_keys or "page_content" not in link or canonical_id not in vectors:
+            # 属于被删除的论文，或是由旧版本写入、没有记录文本的对应关系，无法写回
+            continue
+        elif canonical_id in new_canonical:
+            kept_links.append(dict(link, canonical_id=new_canonical[canonical_id]))
+        else:
+            new_canonical[canonical_id] = link["chunk_id"]
+            readmitted.append(link)
+
+    for i in range(0, len(readmitted), _UPSERT_BATCH):
+        part = readmitted[i:i + _UPSERT_BATCH]
+        db._collection.upsert(ids=[link["chunk_id"] for link in part],
+                              embeddings=[vectors[link["canonical_id"]] for link in part],
+                              metadatas=[link["metadata"] for link in part],
+                              documents=[link["page_content"] for link in part])
+    tmp_path = links_path.with_name(links_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for link in kept_links:
+            f.write(json.dumps(link, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, links_path)
+    if readmitted:
+        print(f"Re-admitted {len(readmitted)} near-duplicate chunks whose canonical chunks were removed.")
+    return [link["chunk_id"] for link in readmitted]
+
+
+def get_deduplicator() -> Optional[ChunkDeduplicator]:
+    """按 settings.DEDUP_ENABLED 返回一个新的去重器，未启用时返回None。"""
+    return ChunkDeduplicator() if settings.DEDUP_ENABLED else None
@@ -0,0 +1,96 @@
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag_system.config import settings
+
+# 降维投影与索引保存在同一个版本目录中，读取该版本的组件会自动使用它
+PROJECTION_FILENAME = "projection.npz"
+
+
+class Projection:
+    """
+    把嵌入向量投影到低维空间并重新归一化。
+
+    - method="pca"：减去样本均值后乘以前 dim 个主成分；
+    - method="prefix"：直接截取前 dim 维（对以 Matryoshka 方式训练的模型效果最好）。
+    """
+
+    def __init__(self, method: str, dim: int, mean: Optional[np.ndarray] = None,
+                 components: Optional[np.ndarray] = None):
+        if method not in ("pca", "prefix"):
+            raise ValueError(f"未知的降维方法: {method}，可选值为 pca / prefix")
+        if method == "pca" and (mean is None or components is None):
+            raise ValueError("PCA 投影需要 mean 和 components。")
+        self.method = method
+        self.dim = dim
+        self.mean = mean
+        self.components = components
+
+    def apply(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.method == "pca":
+            reduced = (vectors - self.mean) @ self.components
+        else:
+            reduced = vectors[..., :self.dim]
+        norms = np.linalg.norm(reduced, axis=-1, keepdims=True)
+        return reduced / np.clip(norms, 1e-12, None)
+
+    def save(self, path: Path):
+        arrays = {"method": np.array(self.method), "dim": np.array(self.dim)}
+        if self.method == "pca":
+            arrays.update(mean=self.mean, components=self.components)
+        np.savez(str(path), **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "Projection":
+        with np.load(str(path)) as data:
+            method = str(data["method"])
+            return cls(method, int(data["dim"]),
+                       data["mean"] if method == "pca" else None,
+                       data["components"] if method == "pca" else None)
+
+
+def fit_projection(vectors, dim: int, method: str = settings.EMBEDDING_REDUCTION_METHOD) -> Projection:
+    """在样本向量上拟合投影。PCA 通过对中心化后的样本做SVD得到前 dim 个主成分。"""
+    if method == "prefix":
+        return Projection("prefix", dim)
+    sample = np.asarray(vectors, dtype=np.float32)
+    if len(sample) < dim:
+        raise ValueError(f"拟合 {dim} 维PCA至少需要 {dim} 个样本向量，当前只有 {len(sample)} 个。")
+    mean = sample.mean(axis=0)
+    _, singular_values, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    explained = (singular_values[:dim] ** 2).sum() / (singular_values ** 2).sum()
+    print(f"PCA projection fitted on {len(sample)} vectors: {sample.shape[1]} -> {dim} dims, "
+          f"{explained:.1%} variance retained")
+    return Projection("pca", dim, mean, vt[:dim].T.copy())
+
+
+class ReducedEmbeddings(Embeddings):
+    """在原始嵌入函数的输出上应用投影，文档和查询使用同一个投影，保证处于同一向量空间。"""
+
+    def __init__(self, embeddings: Embeddings, projection: Projection):
+        self.underlying = embeddings
+        self.projection = projection
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.projection.apply(self.underlying.embed_documents(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.projection.apply(self.underlying.embed_query(text)).tolist()
+
+
+def load_index_projection(index_path: Path) -> Optional[Projection]:
+    """读取索引版本目录中的投影；全维索引返回None。"""
+    path = Path(index_path) / PROJECTION_FILENAME
+    return Projection.load(path) if path.exists() else None
+
+
+def wrap_for_index(embeddings: Embeddings, index_path: Path) -> Embeddings:
+    """如果该索引是降维索引，为嵌入函数套上它的投影；否则原样返回。"""
+    projection = load_index_projection(index_path)
+    return ReducedEmbeddings(embeddings, projection) if projection is not None else embeddings
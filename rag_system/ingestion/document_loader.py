@@ -1,8 +1,78 @@
 import json
 from pathlib import Path
-from typing import List
+from typing import Any, Iterator, List
 from langchain_core.documents import Document
 
+# 每次从磁盘读取的字符数。单篇论文记录通常在几十KB量级，1MB的缓冲区足以容纳多条记录
+STREAM_READ_SIZE = 1 << 20
+
+
+def iter_json_records(file_path: Path, read_size: int = STREAM_READ_SIZE) -> Iterator[Any]:
+    """
+    以流式方式逐条读取一个顶层为JSON数组的文件（如 `processed_papers.json`）。
+
+    与 `json.load` 一次性解析整个文件不同，这里只在内存中保留一个读缓冲区和当前记录，
+    因此峰值内存不随语料规模增长，并且下游的切分/嵌入可以在整个文件解析完之前就开始。
+
+    Args:
+        file_path (Path): 顶层为JSON数组的文件路径。
+        read_size (int): 每次从磁盘读取的字符数。
+
+    Yields:
+        Any: 数组中的每一个元素（对于论文数据即为一个dict）。
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = f.read(read_size)
+        pos = _skip_whitespace(buffer, 0)
+        if pos >= len(buffer) or buffer[pos] != '[':
+            raise ValueError(f"{file_path} 的顶层不是JSON数组，无法流式读取。")
+        pos += 1
+        eof = False
+        fetch_size = read_size
+
+        while True:
+            pos = _skip_whitespace(buffer, pos)
+            if pos < len(buffer) and buffer[pos] == ',':
+                pos = _skip_whitespace(buffer, pos + 1)
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+                # 数字等没有结束符的值在缓冲区边界处可能只解析到一部分（如把 12345 读成 123、把 3.25 读成 3），
+                # 因此只有看到其后的 ',' 或 ']' 才算完整，否则读入更多内容后重新解析
+                following = _skip_whitespace(buffer, end)
+                truncated = not eof and (following >= len(buffer) or buffer[following] not in ',]')
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                truncated = True
+            if truncated:
+                # 当前记录跨越了缓冲区边界：丢弃已消费的部分并继续读入
+                more = f.read(fetch_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                # 单条记录超过缓冲区时，逐步放大读取量，避免反复解析同一段前缀
+                fetch_size *= 2
+                continue
+
+            yield record
+            pos = end
+            fetch_size = read_size
+            if len(buffer) - pos < read_size // 2 and not eof:
+                more = f.read(read_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in ' \t\r\n':
+        pos += 1
+    return pos
+
 
 def load_json_documents(file_path: Path) -> List[Document]:
     """
@@ -15,10 +85,7 @@ def load_json_documents(file_path: Path) -> List[Document]:
         List[Document]: A list of Document objects.
     """
     documents = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    for item in data:
+    for item in iter_json_records(file_path):
         # 确保JSON文件中的每个对象都有 'page_content' 和 'metadata' 键
         page_content = item.get("page_content", "")
         metadata = item.get("metadata", {})
@@ -1,22 +1,98 @@
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 from rag_system.config import settings  # 注意，这里要用相对路径导入settings
+from rag_system.ingestion.embedding_batcher import BucketedEmbeddings
+from rag_system.ingestion.embedding_cache import CachedEmbeddings
+from rag_system.ingestion.model_registry import get_model_spec
 
 
-def get_embedding_function() -> HuggingFaceEmbeddings:
+def get_embedding_function(use_cache: bool = settings.EMBEDDING_CACHE_ENABLED,
+                           backend: str = settings.EMBEDDING_BACKEND,
+                           workers: int = 1,
+                           model_name: str = settings.EMBEDDING_MODEL_NAME) -> Embeddings:
     """
     初始化并返回用于文本向量化的HuggingFace嵌入模型函数。
     这是一个核心的、可被多处复用的组件。
+
+    backend 为 "torch" 时使用 sentence-transformers 在 settings.EMBEDDING_DEVICE 上推理；
+    为 "onnx" / "onnx-int8" 时使用导出的ONNX模型（后者为动态int8量化）在 ONNX Runtime 上推理。
+
+    批量嵌入文档时，文本块会按token长度分桶后再送入模型（见 BucketedEmbeddings）；
+    当 use_cache 为True时，还会先查询持久化嵌入缓存，只对未命中的文本块运行模型。
+
+    workers 大于1时（批量构建，见 settings.EMBEDDING_WORKERS），模型在多个工作进程中运行
+    （见 EmbeddingWorkerPool），各进程内部各自做长度分桶，当前进程只保留缓存这一层。
+
+    model_name 必须在 settings.EMBEDDING_MODELS 中登记，是否归一化由登记信息决定。
     """
-    print(
-        f"--- Initializing embedding model: {settings.EMBEDDING_MODEL_NAME} on device: {settings.EMBEDDING_DEVICE} ---")
+    normalize = get_model_spec(model_name)["normalize"]  # 归一化对于相似度计算很重要
+    if workers > 1:
+        from rag_system.ingestion.embedding_workers import EmbeddingWorkerPool
 
-    model_kwargs = {"device": settings.EMBEDDING_DEVICE}
-    encode_kwargs = {"normalize_embeddings": True}  # 归一化对于相似度计算很重要
+        pool = EmbeddingWorkerPool(workers=workers, backend=backend, model_name=model_name)
+        if use_cache:
+            return CachedEmbeddings(pool, model_name=get_cache_model_key(model_name, backend),
+                                    normalize=normalize)
+        return pool
+    if backend == "torch":
+        print(
+            f"--- Initializing embedding model: {model_name} on device: {settings.EMBEDDING_DEVICE} ---")
+        embeddings = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": settings.EMBEDDING_DEVICE},
+            encode_kwargs={"normalize_embeddings": normalize}
+        )
+    elif backend in ("onnx", "onnx-int8"):
+        from rag_system.ingestion.onnx_embedding import OnnxEmbeddings
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name=settings.EMBEDDING_MODEL_NAME,
-        model_kwargs=model_kwargs,
-        encode_kwargs=encode_kwargs
-    )
+        print(f"--- Initializing embedding model: {model_name} on ONNX Runtime ({backend}) ---")
+        embeddings = OnnxEmbeddings(model_name, quantized=backend == "onnx-int8",
+                                    normalize=normalize)
+    else:
+        raise ValueError(f"未知的嵌入后端: {backend}，可选值为 torch / onnx / onnx-int8")
     print("✅ Embedding model loaded successfully.")
-    return embeddings
\ No newline at end of file
+    return wrap_embedding_function(embeddings, get_cache_model_key(model_name, backend),
+                                   normalize, use_cache=use_cache)
+
+
+def get_cache_model_key(model_name: str, backend: str) -> str:
+    """
+    嵌入缓存中使用的模型标识。量化模型的向量与原模型略有差异，不能混用，
+    因此非 torch 后端会在模型名称后附加后端名；torch 后端沿用原有的键，已有缓存继续有效。
+    """
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def wrap_embedding_function(embeddings: Embeddings, model_name: str, normalize: bool,
+                            use_cache: bool = settings.EMBEDDING_CACHE_ENABLED) -> Embeddings:
+    """按settings中的开关，为原始嵌入模型依次套上长度分桶和持久化缓存。"""
+    if settings.EMBEDDING_BUCKETING_ENABLED:
+        embeddings = BucketedEmbeddings(embeddings)
+    if use_cache:
+        embeddings = CachedEmbeddings(embeddings, model_name=model_name, normalize=normalize)
+    return embeddings
+
+
+def get_embedding_concurrency(embeddings: Embeddings) -> int:
+    """嵌入函数能同时处理的批次数：多进程嵌入为工作进程数，否则为1。"""
+    while embeddings is not None:
+        if hasattr(embeddings, "concurrency"):
+            return embeddings.concurrency
+        embeddings = getattr(embeddings, "underlying", None)
+    return 1
+
+
+def report_embedding_stats(embeddings: Embeddings):
+    """打印嵌入函数各层包装（缓存、分桶等）的统计信息。"""
+    while embeddings is not None:
+        if hasattr(embeddings, "format_stats"):
+            print(embeddings.format_stats())
+        embeddings = getattr(embeddings, "underlying", None)
+
+
+def close_embedding_function(embeddings: Embeddings):
+    """释放嵌入函数各层包装持有的资源（如多进程嵌入的工作进程）。嵌入函数的创建者在用完后调用，放在 finally 中。"""
+    while embeddings is not None:
+        if hasattr(embeddings, "close"):
+            embeddings.close()
+        embeddings = getattr(embeddings, "underlying", None)
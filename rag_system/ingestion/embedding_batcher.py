@@ -0,0 +1,128 @@
+import time
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from rag_system.config import settings
+
+
+def get_sentence_transformer(embeddings: Embeddings):
+    """
+    取出 HuggingFaceEmbeddings 内部的 SentenceTransformer 对象。
+    新版 langchain-huggingface 把它放在 `_client`，旧版放在 `client`。
+    """
+    client = getattr(embeddings, "_client", None) or getattr(embeddings, "client", None)
+    if client is None:
+        raise TypeError(f"{type(embeddings).__name__} 不包含 SentenceTransformer 模型，无法按token长度分桶。")
+    return client
+
+
+class BucketedEmbeddings(Embeddings):
+    """
+    按token长度分桶的批量嵌入器。
+
+    文本块按文档顺序直接送入模型时，长短不一的块会被填充 (padding) 到同一批次的最大长度，
+    大量计算浪费在填充token上。这里先用模型自己的分词器统计每个块的token数，
+    按长度排序后把长度相近的块放进同一批次，并让每批的“批大小 × 最大长度”不超过 token_budget，
+    从而把填充开销降到最低、同时控制单批次的显存/内存占用。嵌入完成后按原始顺序返回结果。
+
+    只有 `embed_documents` 会分桶；`embed_query` 直接交给底层模型。
+    """
+
+    def __init__(
+            self,
+            embeddings: Embeddings,
+            token_budget: int = settings.EMBEDDING_TOKEN_BUDGET,
+            max_batch_size: int = settings.EMBEDDING_MAX_BATCH_SIZE,
+    ):
+        """
+        Args:
+            embeddings (Embeddings): 一个 HuggingFaceEmbeddings 实例（需使用 settings.EMBEDDING_MODEL_NAME 加载）。
+            token_budget (int): 每个批次允许的填充后token总数（批大小 × 批内最大token数）。
+            max_batch_size (int): 每个批次的最大文本块数。
+        """
+        self.underlying = embeddings
+        self.client = get_sentence_transformer(embeddings)
+        self.tokenizer = self.client.tokenizer
+        self.max_seq_length = self.client.max_seq_length
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+
+        encode_kwargs = dict(getattr(embeddings, "encode_kwargs", {}) or {})
+        encode_kwargs.pop("batch_size", None)
+        self.encode_kwargs = encode_kwargs
+
+        self.chunks_embedded = 0
+        self.batches = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.truncated = 0
+        self.seconds = 0.0
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        返回每段文本在模型中实际占用的token数（含特殊token，超出窗口的部分按截断计），
+        并累计超出模型窗口、会被截断的文本块数。
+        """
+        encoded = self.tokenizer(texts, truncation=False)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        self.truncated += sum(1 for length in lengths if length > self.max_seq_length)
+        return [min(length, self.max_seq_length) for length in lengths]
+
+    def plan_batches(self, lengths: List[int]) -> List[List[int]]:
+        """
+        按token长度把文本下标分成若干批次：先按长度升序排列，再贪心地填充批次，
+        直到加入下一个文本会让“批大小 × 批内最大长度”超出预算，或达到最大批大小。
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches = []
+        current: List[int] = []
+        for index in order:
+            # 升序排列，所以新加入的文本就是批内最长的
+            padded_cost = (len(current) + 1) * lengths[index]
+            if current and (padded_cost > self.token_budget or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current = []
+            current.append(index)
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        lengths = self.count_tokens(texts)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        for batch in self.plan_batches(lengths):
+            vectors = self.client.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+                **self.encode_kwargs
+            )
+            for i, vector in zip(batch, vectors):
+                results[i] = vector.tolist()
+            self.batches += 1
+            self.real_tokens += sum(lengths[i] for i in batch)
+            self.padded_tokens += len(batch) * max(lengths[i] for i in batch)
+
+        self.chunks_embedded += len(texts)
+        self.seconds += time.perf_counter() - start
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks_embedded / self.seconds if self.seconds else 0.0
+
+    def format_stats(self) -> str:
+        efficiency = self.real_tokens / self.padded_tokens if self.padded_tokens else 0.0
+        return (
+            f"Bucketed embedding: {self.chunks_embedded} chunks in {self.batches} batches, "
+            f"{self.chunks_per_second:.1f} chunks/s, padding efficiency {efficiency:.1%}, "
+            f"{self.truncated} chunks truncated to {self.max_seq_length} tokens"
+        )
@@ -0,0 +1,256 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from rag_system.config import settings
+
+# SQLite 单条语句中允许的参数数量有限，查询/更新时按此大小分批
+_SQL_BATCH = 500
+
+
+def hash_text(text: str) -> str:
+    """返回文本的SHA-256哈希，作为嵌入缓存的键之一。"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    带持久化磁盘缓存的嵌入函数包装器。
+
+    缓存以 (嵌入模型名称, 是否归一化, 文本哈希) 为键，保存在一个SQLite文件中，
+    由构建 (build) 和增量更新 (update) 共享。重新构建向量数据库时，只要文本块内容不变，
+    即使切分参数或元数据发生了变化，也可以直接复用已有向量，而无需再次运行模型。
+
+    只有 `embed_documents` 会经过缓存；`embed_query` 直接交给底层模型。
+    """
+
+    def __init__(
+            self,
+            underlying: Embeddings,
+            model_name: str,
+            normalize: bool,
+            cache_path: Path = settings.EMBEDDING_CACHE_PATH,
+            max_bytes: Optional[int] = settings.EMBEDDING_CACHE_MAX_BYTES,
+    ):
+        """
+        Args:
+            underlying (Embeddings): 真正执行嵌入的模型。
+            model_name (str): 模型标识，写入缓存键，防止不同模型的向量混用。
+            normalize (bool): 模型是否输出归一化向量，同样写入缓存键。
+            cache_path (Path): SQLite缓存文件路径。
+            max_bytes (Optional[int]): 缓存中向量数据的最大字节数，超出后按最近最少使用淘汰。None表示不限制。
+        """
+        self.underlying = underlying
+        self.model_name = model_name
+        self.normalize = int(bool(normalize))
+        self.cache_path = Path(cache_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                normalize INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, normalize, text_hash)
+            );
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access);")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+    # --- Embeddings 接口 ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [hash_text(text) for text in texts]
+        cached = self._lookup(set(hashes))
+
+        # 同一批次中重复出现的文本只嵌入一次
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        miss_count = sum(1 for text_hash in hashes if text_hash in missing)
+        self.misses += miss_count
+        self.hits += len(texts) - miss_count
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            new_entries = dict(zip(missing.keys(), vectors))
+            self._store(new_entries)
+            cached.update(new_entries)
+
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    # --- 统计 ---
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def format_stats(self) -> str:
+        return (
+            f"Embedding cache: {self.hits} hits / {self.misses} misses "
+            f"(hit rate {self.hit_rate:.1%}), {self.evictions} evicted, "
+            f"{self._total_bytes / 1024 / 1024:.1f} MB on disk at {self.cache_path}"
+        )
+
+    # --- 内部实现 ---
+
+    def _lookup(self, hashes: set) -> Dict[str, List[float]]:
+        found = {}
+        if not hashes:
+            return found
+        hash_list = list(hashes)
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(hash_list), _SQL_BATCH):
+                part = hash_list[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND normalize = ? AND text_hash IN ({placeholders})",
+                    (self.model_name, self.normalize, *part)
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array('f', blob).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_access = ? "
+                        f"WHERE model = ? AND normalize = ? AND text_hash IN ({','.join('?' * len(rows))})",
+                        (now, self.model_name, self.normalize, *(row[0] for row in rows))
+                    )
+            self._conn.commit()
+        return found
+
+    def _store(self, entries: Dict[str, List[float]]):
+        now = time.time()
+        rows = []
+        for text_hash, vector in entries.items():
+            blob = array('f', vector).tobytes()
+            rows.append((self.model_name, self.normalize, text_hash, blob, len(blob), now))
+        with self._lock:
+            # 其他进程（或并发的批次）可能已经写入了同一个键，被替换的条目的大小要从总量中减去
+            replaced_bytes = 0
+            hash_list = list(entries)
+            for i in range(0, len(hash_list), _SQL_BATCH):
+                part = hash_list[i:i + _SQL_BATCH]
+                replaced_bytes += self._conn.execute(
+                    f"SELECT COALESCE(SUM(nbytes), 0) FROM embeddings "
+                    f"WHERE model = ? AND normalize = ? AND text_hash IN ({','.join('?' * len(part))})",
+                    (self.model_name, self.normalize, *part)
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, normalize, text_hash, vector, nbytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._total_bytes += sum(row[4] for row in rows) - replaced_bytes
+            if self.max_bytes is not None and self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按 last_access 从旧到新删除条目，直到缓存降到上限的90%以下。调用方需持有锁。"""
+        # 其他进程可能也在写入同一个缓存文件，淘汰前重新统计真实大小
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT rowid, nbytes FROM embeddings ORDER BY last_access LIMIT ?", (_SQL_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            to_delete = []
+            for rowid, nbytes in rows:
+                if self._total_bytes <= target:
+                    break
+                to_delete.append(rowid)
+                self._total_bytes -= nbytes
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", [(rowid,) for rowid in to_delete])
+            self.evictions += len(to_delete)
+        self._conn.commit()
+
+
+def normalize_query_text(text: str) -> str:
+    """查询缓存的键：Unicode NFKC 规范化（全角/半角统一），去掉首尾空白并把连续空白合并为一个空格。"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class QueryEmbeddingCache(Embeddings):
+    """
+    查询向量的内存LRU缓存包装器，放在检索阶段的嵌入函数前面。
+
+    以规范化后的查询文本为键，最多保存 max_entries 个向量，超出后淘汰最久未使用的条目。
+    查询文本与缓存中的某个键规范化后相同时直接返回向量，省去一次50~300ms的CPU推理。
+    模型收到的是规范化后的文本，保证同一个键总是对应同一个向量。
+
+    `embed_documents` 直接交给底层模型。
+    """
+
+    def __init__(self, underlying: Embeddings, max_entries: int = settings.QUERY_EMBEDDING_CACHE_SIZE):
+        self.underlying = underlying
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._vectors: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query_text(text)
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+            self.misses += 1
+        # 推理在锁外进行，不阻塞其他线程的缓存命中；并发的相同查询可能各算一次，结果相同
+        vector = tuple(self.underlying.embed_query(key))
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+                self.evictions += 1
+        return list(vector)
+
+    # --- 统计 ---
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def format_stats(self) -> str:
+        return (
+            f"Query embedding cache: {self.hits} hits / {self.misses} misses "
+            f"(hit rate {self.hit_rate:.1%}), {len(self._vectors)}/{self.max_entries} entries, "
+            f"{self.evictions} evicted"
+        )
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from rag_system.config import settings
+
+# 每个工作进程只加载一次模型，由进程池的 initializer 设置
+_worker_embeddings: Optional[Embeddings] = None
+
+
+def get_worker_threads(workers: int, threads: int = 0) -> int:
+    """每个工作进程的推理线程数；0 表示把CPU核心平均分给各进程。"""
+    return threads if threads > 0 else max(1, (os.cpu_count() or 1) // workers)
+
+
+def _init_embedding_worker(backend: str, device: str, threads: int, model_name: str):
+    global _worker_embeddings
+    # 必须在加载 torch / ONNX Runtime 之前限制线程数，否则各进程的线程池会争抢同一批核心
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    settings.EMBEDDING_DEVICE = device
+    settings.EMBEDDING_ONNX_THREADS = threads
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+    from rag_system.ingestion.embedding import get_embedding_function
+
+    _worker_embeddings = get_embedding_function(use_cache=False, backend=backend, model_name=model_name)
+
+
+def _embed_in_worker(texts: List[str]) -> Tuple[List[List[float]], int, float]:
+    start = time.perf_counter()
+    vectors = _worker_embeddings.embed_documents(texts)
+    return vectors, os.getpid(), time.perf_counter() - start
+
+
+def _embed_query_in_worker(text: str) -> List[float]:
+    return _worker_embeddings.embed_query(text)
+
+
+class EmbeddingWorkerPool(Embeddings):
+    """
+    多进程批量嵌入：启动 workers 个工作进程，每个进程加载自己的模型并只使用固定数量的推理线程。
+
+    `embed_documents` 把一个批次按长度排序后切成若干分片交给进程池，所有工作进程从同一个任务队列中
+    领取分片，结果按原顺序拼回。构建流水线会用 `concurrency` 个嵌入线程同时提交批次，
+    这样任务队列中始终有待处理的分片，各进程都保持忙碌，向量仍交给同一个写入线程写入Chroma。
+
+    PyTorch 的单进程多线程推理在核心数较多时扩展性很差；多个线程数较少的进程则可以接近线性扩展。
+    """
+
+    def __init__(
+            self,
+            workers: int = settings.EMBEDDING_WORKERS,
+            threads: int = settings.EMBEDDING_WORKER_THREADS,
+            backend: str = settings.EMBEDDING_BACKEND,
+            device: str = settings.EMBEDDING_WORKER_DEVICE,
+            shard_size: int = settings.EMBEDDING_WORKER_SHARD_SIZE,
+            model_name: str = settings.EMBEDDING_MODEL_NAME,
+    ):
+        """
+        Args:
+            workers (int): 工作进程数。
+            threads (int): 每个进程的推理线程数，0 表示把CPU核心平均分给各进程。
+            backend (str): 各进程使用的推理后端（torch / onnx / onnx-int8）。
+            device (str): torch 后端使用的设备，多进程模式通常为 "cpu"。
+            shard_size (int): 每个分片的最大文本块数。
+            model_name (str): 各进程加载的嵌入模型。
+        """
+        self.workers = workers
+        self.threads = get_worker_threads(workers, threads)
+        self.backend = backend
+        self.shard_size = shard_size
+        self.model_name = model_name
+        self.underlying = None
+        self._lock = threading.Lock()
+        self.shards = 0
+        self.chunks_embedded = 0
+        self.worker_seconds = 0.0
+        self.worker_chunks = Counter()
+        self._started = time.perf_counter()
+
+        print(f"--- Starting {workers} embedding worker processes "
+              f"({backend}, {device}, {self.threads} threads each) ---")
+        # 使用 spawn 启动，工作进程不会继承父进程中已初始化的线程池和模型状态
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_embedding_worker,
+            initargs=(backend, device, self.threads, model_name)
+        )
+
+    @property
+    def concurrency(self) -> int:
+        """构建流水线应同时提交的批次数。"""
+        return self.workers
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # 长度相近的文本块放在同一个分片中，减少工作进程内的填充
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        shards = [order[i:i + self.shard_size] for i in range(0, len(order), self.shard_size)]
+        futures = [self._executor.submit(_embed_in_worker, [texts[i] for i in shard]) for shard in shards]
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for shard, future in zip(shards, futures):
+            vectors, pid, seconds = future.result()
+            for i, vector in zip(shard, vectors):
+                results[i] = vector
+            with self._lock:
+                self.shards += 1
+                self.chunks_embedded += len(shard)
+                self.worker_seconds += seconds
+                self.worker_chunks[pid] += len(shard)
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._executor.submit(_embed_query_in_worker, text).result()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def format_stats(self) -> str:
+        elapsed = time.perf_counter() - self._started
+        utilization = self.worker_seconds / (elapsed * self.workers) if elapsed else 0.0
+        per_worker = ", ".join(str(count) for count in sorted(self.worker_chunks.values(), reverse=True))
+        return (
+            f"Embedding workers: {self.chunks_embedded} chunks in {self.shards} shards across {self.workers} processes "
+            f"({self.threads} threads each), worker utilization {utilization:.1%}, chunks per worker [{per_worker}]"
+        )
@@ -0,0 +1,176 @@
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from rag_system.config import settings
+
+# 向量数据库目录的版本化布局：
+#   chroma_db/
+#     CURRENT                      <- 指向当前对外服务的版本，通过原子替换切换
+#     versions/
+#       v20250101-120000/          <- 已发布的版本（一个完整的Chroma目录）
+#       v20250102-120000.staging/  <- 正在构建、尚未通过校验的版本
+# 没有 CURRENT 文件的目录被视为旧版的单一Chroma目录，直接使用其本身。
+POINTER_FILENAME = "CURRENT"
+VERSIONS_DIRNAME = "versions"
+STAGING_SUFFIX = ".staging"
+# 版本目录中的修订号：增量更新、投递目录注入和撤回会原地修改当前版本，每次修改后加一
+REVISION_FILENAME = "REVISION"
+# Chroma写在索引目录顶层的文件：元数据库和以UUID命名的向量段目录（旧版布局中就是 db_path 本身）
+LEGACY_CHROMA_SQLITE = "chroma.sqlite3"
+_UUID_DIRNAME = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def read_pointer(db_path: Path) -> Optional[Dict[str, Any]]:
+    """读取 CURRENT 指针文件，不存在（旧版布局）时返回None。"""
+    pointer = Path(db_path) / POINTER_FILENAME
+    try:
+        with open(pointer, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def get_active_version(db_path: Path) -> Optional[str]:
+    """返回当前发布的版本名；旧版布局返回None。"""
+    pointer = read_pointer(db_path)
+    return pointer["version"] if pointer else None
+
+
+def resolve_active_path(db_path: Path) -> Path:
+    """返回当前对外服务的Chroma目录：已发布的版本目录，或旧版布局下的 db_path 本身。"""
+    version = get_active_version(db_path)
+    if version is None:
+        return Path(db_path)
+    return Path(db_path) / VERSIONS_DIRNAME / version
+
+
+def get_index_revision(db_path: Path) -> str:
+    """
+    当前版本名与其修订号组成的标识，如 "v20250101-120000#3"。
+    重建发布新版本或原地修改当前版本后都会变化，检索结果缓存据此判断缓存是否失效。
+    """
+    version = get_active_version(db_path)
+    index_path = Path(db_path) if version is None else Path(db_path) / VERSIONS_DIRNAME / version
+    try:
+        revision = (index_path / REVISION_FILENAME).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        revision = "0"
+    return f"{version or 'legacy'}#{revision}"
+
+
+def bump_index_revision(index_path: Path) -> int:
+    """原地修改某个版本目录之后调用，把它的修订号加一（先写临时文件再原子替换）。"""
+    path = Path(index_path) / REVISION_FILENAME
+    try:
+        revision = int(path.read_text(encoding="utf-8").strip()) + 1
+    except (FileNotFoundError, ValueError):
+        revision = 1
+    tmp_path = path.with_name(REVISION_FILENAME + ".tmp")
+    tmp_path.write_text(str(revision), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return revision
+
+
+def create_staging_dir(db_path: Path, resume: bool = False) -> Path:
+    """
+    为一次新的构建创建暂存目录。
+
+    resume=True 时优先复用最近一次未发布的暂存目录（其中保存着进度日志），以便断点续建。
+    """
+    versions_dir = Path(db_path) / VERSIONS_DIRNAME
+    versions_dir.mkdir(parents=True, exist_ok=True)
+    if resume:
+        staging_dirs = sorted(p for p in versions_dir.iterdir() if p.name.endswith(STAGING_SUFFIX))
+        if staging_dirs:
+            print(f"--- 继续未完成的构建: {staging_dirs[-1]} ---")
+            return staging_dirs[-1]
+    version = f"v{time.strftime('%Y%m%d-%H%M%S')}"
+    # 同一秒内再次创建（例如刚发布就执行压缩）时加序号，避免与已有版本重名；序号版本按名称排在后面
+    name, attempt = version, 1
+    while (versions_dir / name).exists() or (versions_dir / f"{name}{STAGING_SUFFIX}").exists():
+        attempt += 1
+        name = f"{version}-{attempt}"
+    staging_path = versions_dir / f"{name}{STAGING_SUFFIX}"
+    staging_path.mkdir()
+    return staging_path
+
+
+def publish_version(db_path: Path, staging_path: Path) -> str:
+    """
+    把通过校验的暂存目录发布为当前版本。
+
+    先把暂存目录重命名为正式版本名，再写入临时指针文件并用 os.replace 原子地替换 CURRENT。
+    正在运行的检索组件在下一次查询时读取到新的指针，就会切换到新版本，整个过程无需停机。
+
+    Returns:
+        str: 新发布的版本名。
+    """
+    staging_path = Path(staging_path)
+    version = staging_path.name[:-len(STAGING_SUFFIX)] if staging_path.name.endswith(STAGING_SUFFIX) \
+        else staging_path.name
+    final_path = staging_path.parent / version
+    if staging_path != final_path:
+        os.rename(staging_path, final_path)
+
+    pointer = Path(db_path) / POINTER_FILENAME
+    tmp_pointer = pointer.with_name(POINTER_FILENAME + ".tmp")
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "published_at": time.time()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, pointer)
+    print(f"✅ 已发布向量数据库版本 {version}")
+
+    prune_versions(db_path, keep=settings.VECTOR_DB_KEEP_VERSIONS)
+    return version
+
+
+def prune_versions(db_path: Path, keep: int):
+    """
+    删除较旧的已发布版本，只保留最新的 keep 个（当前版本总会被保留）。
+    失败或中断的构建留下的暂存目录也会被删除，只保留最新的一个，以便之后仍可用 --resume 继续那次构建。
+    首次发布后，旧版布局遗留在顶层的Chroma文件（chroma.sqlite3 和向量段目录）也会被清理，
+    目录中的其他文件保持不变。
+    """
+    db_path = Path(db_path)
+    active = get_active_version(db_path)
+    if active is None:
+        return
+    versions_dir = db_path / VERSIONS_DIRNAME
+    published = sorted(p for p in versions_dir.iterdir() if p.is_dir() and not p.name.endswith(STAGING_SUFFIX))
+    for old in published[:-keep] if keep > 0 else published:
+        if old.name != active:
+            print(f"--- 清理旧版本 {old.name} ---")
+            shutil.rmtree(old, ignore_errors=True)
+    # 每个暂存目录都可能是一份完整的索引；不带 --resume 的构建每次都会新建一个
+    staging_dirs = sorted(p for p in versions_dir.iterdir() if p.is_dir() and p.name.endswith(STAGING_SUFFIX))
+    for stale in staging_dirs[:-1]:
+        print(f"--- 清理未完成构建的暂存目录 {stale.name} ---")
+        shutil.rmtree(stale, ignore_errors=True)
+
+    for entry in db_path.iterdir():
+        if not is_chroma_artifact(entry):
+            continue
+        print(f"--- 清理旧版布局遗留的Chroma文件 {entry} ---")
+        try:
+            if entry.is_dir():
+                shutil.rmtree(entry)
+            else:
+                entry.unlink()
+        except OSError as e:
+            print(f"⚠️ 无法删除 {entry}: {e}")
+
+
+def is_chroma_artifact(entry: Path) -> bool:
+    """
+    是否为Chroma自己写在目录顶层的文件：chroma.sqlite3 和以UUID命名的向量段目录。
+    旧版布局的清理只删除这些文件，其他文件一律不动。
+    """
+    if entry.name == LEGACY_CHROMA_SQLITE:
+        return entry.is_file()
+    return entry.is_dir() and _UUID_DIRNAME.fullmatch(entry.name) is not None
@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from rag_system.config import settings
+
+# 索引元数据与Chroma索引保存在同一个版本目录中
+INDEX_META_FILENAME = "index_meta.json"
+
+
+class IndexModelMismatchError(RuntimeError):
+    """当前配置的嵌入模型与索引构建时使用的模型不一致。"""
+
+
+def get_model_spec(model_name: str) -> Dict[str, Any]:
+    """返回 settings.EMBEDDING_MODELS 中登记的模型信息（维度、是否归一化），未登记的模型抛出 ValueError。"""
+    spec = settings.EMBEDDING_MODELS.get(model_name)
+    if spec is None:
+        raise ValueError(f"嵌入模型 {model_name} 未在 settings.EMBEDDING_MODELS 中登记，"
+                         f"已登记的模型: {', '.join(settings.EMBEDDING_MODELS)}")
+    return spec
+
+
+def get_embedding_model_name(embeddings: Embeddings) -> Optional[str]:
+    """
+    沿 `.underlying` 包装链找到最内层模型的名称。
+    外层的缓存包装也有 model_name（是缓存键，可能带后端后缀），所以取最内层的值。
+    """
+    model_name = None
+    while embeddings is not None:
+        model_name = getattr(embeddings, "model_name", model_name)
+        embeddings = getattr(embeddings, "underlying", None)
+    return model_name
+
+
+def write_index_meta(index_path: Path, db, model_name: str = settings.EMBEDDING_MODEL_NAME,
+                     backend: str = settings.EMBEDDING_BACKEND) -> Dict[str, Any]:
+    """
+    记录索引所用的嵌入模型、推理后端、实际存储的向量维度（降维后为降维维度）和归一化方式。
+    向量维度直接从索引中读取一条向量得到。先写临时文件再原子替换。
+    """
+    spec = get_model_spec(model_name)
+    sample = db._collection.get(include=["embeddings"], limit=1)
+    meta = {
+        "model": model_name,
+        "backend": backend,
+        "model_dim": spec["dim"],
+        "dim": len(sample["embeddings"][0]) if sample["ids"] else spec["dim"],
+        "normalize": spec["normalize"],
+        "created_at": time.time(),
+    }
+    path = Path(index_path) / INDEX_META_FILENAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return meta
+
+
+def load_index_meta(index_path: Path) -> Optional[Dict[str, Any]]:
+    path = Path(index_path) / INDEX_META_FILENAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_index_model(index_path: Path, embeddings: Embeddings):
+    """
+    检查嵌入函数的模型是否与索引构建时的模型一致，不一致时抛出 IndexModelMismatchError。
+    没有 index_meta.json 的旧索引不做检查。
+    """
+    meta = load_index_meta(index_path)
+    if meta is None:
+        return
+    model_name = get_embedding_model_name(embeddings) or settings.EMBEDDING_MODEL_NAME
+    if model_name != meta["model"]:
+        raise IndexModelMismatchError(
+            f"索引 {index_path} 使用 {meta['model']}（{meta['model_dim']}维）构建，"
+            f"当前配置的嵌入模型为 {model_name}。请改回该模型，或用新模型重新构建索引。"
+        )
+    spec = settings.EMBEDDING_MODELS.get(model_name)
+    if spec is not None and spec["normalize"] != meta["normalize"]:
+        raise IndexModelMismatchError(
+            f"索引 {index_path} 的向量归一化方式（normalize={meta['normalize']}）与当前配置不一致。"
+        )
@@ -0,0 +1,182 @@
+"""
+基于 ONNX Runtime 的嵌入模型后端。
+
+把 sentence-transformers 模型导出为ONNX（可选动态int8量化），在纯CPU机器上用 ONNX Runtime 推理。
+导出只需执行一次，结果保存在 settings.EMBEDDING_ONNX_DIR 下；首次使用时也会自动导出。
+
+手动导出（在项目根目录下）:
+    python -m rag_system.ingestion.onnx_embedding --quantize
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag_system.config import settings
+
+EXPORT_CONFIG_FILENAME = "export_config.json"
+FP32_FILENAME = "model.onnx"
+INT8_FILENAME = "model.int8.onnx"
+
+
+def get_onnx_model_dir(model_name: str, onnx_dir: Path = settings.EMBEDDING_ONNX_DIR) -> Path:
+    return Path(onnx_dir) / model_name.replace("/", "__")
+
+
+def export_onnx_model(model_name: str, onnx_dir: Path = settings.EMBEDDING_ONNX_DIR, quantize: bool = False,
+                      force: bool = False) -> Path:
+    """
+    把 sentence-transformers 模型导出为ONNX，并按需生成动态int8量化版本。
+
+    池化方式（CLS或均值）和最大序列长度从 sentence-transformers 的模型配置中读取，
+    与 PyTorch 后端保持一致，写入 export_config.json 供推理时使用。
+
+    Returns:
+        Path: 导出目录。
+    """
+    model_dir = get_onnx_model_dir(model_name, onnx_dir)
+    fp32_path = model_dir / FP32_FILENAME
+    int8_path = model_dir / INT8_FILENAME
+
+    if force or not fp32_path.exists():
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        print(f"--- Exporting {model_name} to ONNX at {model_dir} ---")
+        model_dir.mkdir(parents=True, exist_ok=True)
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer, pooling = st_model[0], st_model[1]
+        auto_model, tokenizer = transformer.auto_model, transformer.tokenizer
+        auto_model.config.return_dict = False
+        auto_model.eval()
+
+        dummy = tokenizer(["ONNX export"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                auto_model,
+                tuple(dummy[name] for name in input_names),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(str(model_dir))
+        with open(model_dir / EXPORT_CONFIG_FILENAME, "w", encoding="utf-8") as f:
+            json.dump({
+                "model_name": model_name,
+                "pooling": "cls" if pooling.pooling_mode_cls_token else "mean",
+                "max_seq_length": st_model.max_seq_length,
+            }, f, indent=2)
+        print(f"✅ ONNX model exported: {fp32_path}")
+
+    if quantize and (force or not int8_path.exists()):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"--- Quantizing {fp32_path.name} to int8 ---")
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        print(f"✅ int8 model written: {int8_path}")
+
+    return model_dir
+
+
+class OnnxSentenceEncoder:
+    """
+    ONNX Runtime 上的句向量编码器，接口与 SentenceTransformer 的 `encode` / `tokenizer` /
+    `max_seq_length` 保持一致，因此 BucketedEmbeddings 可以像使用 PyTorch 模型一样对它分桶。
+    """
+
+    def __init__(self, model_dir: Path, quantized: bool = False, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        with open(model_dir / EXPORT_CONFIG_FILENAME, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.pooling = config["pooling"]
+        self.max_seq_length = config["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = settings.EMBEDDING_ONNX_THREADS if threads is None else threads
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        model_path = model_dir / (INT8_FILENAME if quantized else FP32_FILENAME)
+        self.session = ort.InferenceSession(str(model_path), sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        outputs = []
+        for i in range(0, len(sentences), batch_size):
+            encoded = self.tokenizer(sentences[i:i + batch_size], padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors="np")
+            feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = encoded["attention_mask"][..., None].astype(hidden.dtype)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32))
+
+        embeddings = np.vstack(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+class OnnxEmbeddings(Embeddings):
+    """使用 ONNX Runtime 推理的嵌入函数，可替代 HuggingFaceEmbeddings。"""
+
+    def __init__(
+            self,
+            model_name: str = settings.EMBEDDING_MODEL_NAME,
+            quantized: bool = False,
+            normalize: bool = True,
+            threads: Optional[int] = None,
+            onnx_dir: Path = settings.EMBEDDING_ONNX_DIR,
+    ):
+        """
+        Args:
+            model_name (str): sentence-transformers 模型名称，未导出时会自动导出。
+            quantized (bool): 是否使用动态int8量化的模型。
+            normalize (bool): 是否输出归一化向量。
+            threads (Optional[int]): ONNX Runtime 的线程数，0 表示由其自动决定；None 时使用 settings 中的配置。
+            onnx_dir (Path): 导出模型的存放目录。
+        """
+        model_dir = export_onnx_model(model_name, onnx_dir, quantize=quantized)
+        self.model_name = model_name
+        self.client = OnnxSentenceEncoder(model_dir, quantized=quantized, threads=threads)
+        self.encode_kwargs = {"normalize_embeddings": normalize}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.encode(texts, **self.encode_kwargs).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.encode(text, **self.encode_kwargs).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (optionally int8-quantized).")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL_NAME, help="sentence-transformers 模型名称")
+    parser.add_argument("--quantize", action="store_true", help="同时生成动态int8量化模型")
+    parser.add_argument("--force", action="store_true", help="覆盖已导出的模型")
+    args = parser.parse_args()
+    export_onnx_model(args.model, quantize=args.quantize, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
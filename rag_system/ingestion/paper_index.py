@@ -0,0 +1,190 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from rag_system.config import settings
+from rag_system.ingestion.paper_store import parse_year
+from rag_system.ingestion.shards import YearBounds, year_bounds
+from rag_system.ingestion.text_chunker import get_paper_key
+
+# 论文级索引与Chroma索引保存在同一个版本目录中
+PAPER_INDEX_FILENAME = "paper_index.npz"
+
+# 从Chroma中分页读取向量时每页的条目数
+_PAGE_SIZE = 5000
+# 增量更新时每次按论文标识查询的论文数
+_KEYS_PER_QUERY = 500
+
+
+def paper_key_filter(paper_keys: List[str]) -> Dict[str, Any]:
+    """
+    匹配这些论文全部文本块的Chroma过滤条件。新版索引按 paper_key 过滤；旧版索引的元数据中只有 doi 和 local_path，
+    没有DOI的论文以 local_path 为标识（与 get_paper_key 的回退顺序一致）。
+    """
+    return {"$or": [{"paper_key": {"$in": paper_keys}}, {"doi": {"$in": paper_keys}},
+                    {"local_path": {"$in": paper_keys}}]}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _aggregate_papers(pages: Iterable[Dict[str, Any]], source: str) -> Tuple[List[str], np.ndarray, np.ndarray, int]:
+    """
+    把文本块向量按论文聚合：source 为 "abstract" 时优先使用摘要文本块向量的均值，没有摘要文本块的论文退回到
+    全部文本块向量的质心；为 "centroid" 时总是使用质心。返回 (论文标识, 归一化向量, 年份, 使用摘要的论文数)。
+    """
+    sums: Dict[str, np.ndarray] = {}
+    years: Dict[str, int] = {}
+    abstract_sums: Dict[str, np.ndarray] = {}
+    for page in pages:
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        for vector, metadata in zip(vectors, page["metadatas"]):
+            metadata = metadata or {}
+            paper_key = get_paper_key(metadata)
+            if paper_key in sums:
+                sums[paper_key] += vector
+            else:
+                sums[paper_key] = vector.copy()
+                years[paper_key] = parse_year(metadata.get("year"))
+            if source == "abstract" and metadata.get("section") == "abstract":
+                if paper_key in abstract_sums:
+                    abstract_sums[paper_key] += vector
+                else:
+                    abstract_sums[paper_key] = vector.copy()
+
+    keys = list(sums)
+    # 均值与总和方向相同，归一化后结果一致，因此不需要记录文本块数
+    paper_vectors = _normalize(np.stack([abstract_sums.get(key, sums[key]) for key in keys])) if keys \
+        else np.zeros((0, 0), dtype=np.float32)
+    return keys, paper_vectors, np.array([years[key] for key in keys], dtype=np.int32), len(abstract_sums)
+
+
+def _iter_collection(db: Chroma) -> Iterator[Dict[str, Any]]:
+    offset = 0
+    while True:
+        page = db._collection.get(include=["embeddings", "metadatas"], limit=_PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        yield page
+        offset += len(page["ids"])
+
+
+def build_paper_index(db: Chroma, index_path: Path, source: str = settings.PAPER_VECTOR_SOURCE) -> Path:
+    """
+    从Chroma集合中分页读取全部文本块向量，为每篇论文生成一个归一化向量并保存到 index_path 目录
+    （向量的来源见 _aggregate_papers）。同时记录每篇论文的年份（无法解析时为0），带年份过滤的检索只在范围内的论文中选择。
+    先写入临时文件再原子替换。开销与整个库的大小成正比，只用于完整构建和压缩；增量写入之后使用 update_paper_index。
+    """
+    keys, vectors, years, abstract_count = _aggregate_papers(_iter_collection(db), source)
+    path = _save(index_path, vectors, years, _encode_keys(keys))
+    print(f"Paper index written: {len(keys)} papers ({abstract_count} from abstracts), "
+          f"{path.stat().st_size / 1024 / 1024:.1f} MB at {path}")
+    return path
+
+
+def update_paper_index(db: Chroma, index_path: Path, paper_keys: Iterable[str],
+                       source: str = settings.PAPER_VECTOR_SOURCE) -> Path:
+    """
+    增量更新之后调用：只重新读取 paper_keys 中这些论文（新增、内容变化、删除或被写回重复块的论文）的文本块向量，
+    替换它们在索引中的向量；已没有任何文本块的论文从索引中去掉。索引文件不存在时退回到完整构建。
+    """
+    index = PaperIndex.load(index_path)
+    if index is None:
+        return build_paper_index(db, index_path, source)
+    paper_keys = sorted(set(paper_keys))
+    pages = (db._collection.get(where=paper_key_filter(paper_keys[i:i + _KEYS_PER_QUERY]),
+                                include=["embeddings", "metadatas"])
+             for i in range(0, len(paper_keys), _KEYS_PER_QUERY))
+    keys, vectors, years, _ = _aggregate_papers(pages, source)
+
+    keep = ~np.isin(index.keys, _encode_keys(paper_keys)) if len(index.keys) \
+        else np.zeros(0, dtype=bool)
+    all_keys = np.concatenate([index.keys[keep], _encode_keys(keys)])
+    if len(index.vectors) and len(vectors):
+        vectors = np.concatenate([index.vectors[keep], vectors])
+    elif len(index.vectors):
+        vectors = index.vectors[keep]
+    path = _save(index_path, vectors, np.concatenate([index.years[keep], years]), all_keys)
+    print(f"Paper index updated: {len(paper_keys)} papers refreshed, {len(all_keys)} in total")
+    return path
+
+
+def _encode_keys(keys: List[str]) -> np.ndarray:
+    return np.array([key.encode('utf-8') for key in keys], dtype=np.bytes_)
+
+
+def _save(index_path: Path, vectors: np.ndarray, years: np.ndarray, keys: np.ndarray) -> Path:
+    path = Path(index_path) / PAPER_INDEX_FILENAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, vectors=vectors.astype(np.float32), years=years.astype(np.int32), keys=keys)
+    os.replace(tmp_path, path)
+    return path
+
+
+class PaperIndex:
+    """
+    论文级索引：第一阶段用查询向量与每篇论文的向量做点积，选出最相关的若干篇论文；
+    第二阶段只从Chroma中取这些论文的文本块向量，用精确的余弦相似度打分排序。
+
+    检索开销取决于论文数和入选论文的文本块数，而不是整个库的文本块数；
+    结果集中在少数相关论文内，不会分散到许多只有个别句子相关的论文上。
+    """
+
+    def __init__(self, vectors: np.ndarray, keys: np.ndarray, years: np.ndarray):
+        self.vectors = vectors
+        self.keys = keys
+        self.years = years
+
+    @classmethod
+    def load(cls, index_path: Path) -> Optional["PaperIndex"]:
+        path = Path(index_path) / PAPER_INDEX_FILENAME
+        if not path.exists():
+            return None
+        with np.load(str(path)) as data:
+            return cls(data["vectors"], data["keys"], data["years"])
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.keys.nbytes + self.years.nbytes
+
+    def top_papers(self, query_vector, count: int, bounds: YearBounds = (None, None)) -> List[str]:
+        """返回年份在 bounds 范围内（含两端，None表示不限）、与查询最相关的 count 篇论文的 paper_key（按相关度降序）。"""
+        candidates = np.arange(len(self.keys))
+        low, high = bounds
+        if low is not None:
+            candidates = candidates[self.years[candidates] >= low]
+        if high is not None:
+            candidates = candidates[self.years[candidates] <= high]
+        if len(candidates) == 0:
+            return []
+        scores = self.vectors[candidates] @ np.asarray(query_vector, dtype=np.float32)
+        count = min(count, len(scores))
+        top = np.argpartition(-scores, count - 1)[:count]
+        return [self.keys[candidates[i]].decode('utf-8') for i in top[np.argsort(-scores[top], kind="stable")]]
+
+    def search(self, db: Chroma, query_vector: List[float], k: int,
+               top_n: int = settings.PAPER_PREFILTER_TOP_N,
+               filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """在最相关的 top_n 篇论文的文本块中精确检索，返回 (文档, 余弦相似度)；filter 为额外的元数据过滤条件。"""
+        paper_keys = self.top_papers(query_vector, top_n, year_bounds(filter))
+        if not paper_keys:
+            return []
+        where = paper_key_filter(paper_keys)
+        if filter:
+            where = {"$and": [filter, where]}
+        found = db._collection.get(where=where, include=["embeddings", "documents", "metadatas"])
+        if not found["ids"]:
+            return []
+        scores = np.asarray(found["embeddings"], dtype=np.float32) @ np.asarray(query_vector, dtype=np.float32)
+        order = np.argsort(-scores)[:k]
+        return [
+            (Document(page_content=found["documents"][i], metadata=found["metadatas"][i] or {}), float(scores[i]))
+            for i in order
+        ]
@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+from rag_system.config import settings
+from rag_system.ingestion.text_chunker import get_paper_key
+
+# 论文级字段只在侧表中保存一份，文本块的元数据里只保留这些字段
+CHUNK_METADATA_FIELDS = ("paper_key", "chunk_id", "start_index", "section", "year")
+PAPER_FIELDS = ("doi", "title", "year", "journal", "authors", "keywords", "filename", "local_path")
+
+# SQLite 单条语句中允许的参数数量有限，查询时按此大小分批
+_SQL_BATCH = 500
+
+
+def parse_year(value: Any) -> int:
+    """把 retrieved_year 之类的字段转换为整数年份，无法解析时返回0（Chroma的元数据不支持None）。"""
+    try:
+        return int(str(value).strip()[:4])
+    except (TypeError, ValueError):
+        return 0
+
+
+def slim_chunk_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留文本块自身的字段和用于过滤的年份，论文级字段通过 `paper_key` 到侧表中查询。"""
+    slim = {"paper_key": get_paper_key(metadata), "year": parse_year(metadata.get("year"))}
+    for field in ("chunk_id", "start_index", "section"):
+        if field in metadata:
+            slim[field] = metadata[field]
+    return slim
+
+
+class PaperStore:
+    """
+    论文元数据侧表，保存在 settings.SQLITE_DB_PATH（literature_materials.db）的 IndexedPapers 表中。
+
+    向量数据库的文本块元数据里只有 `paper_key` 等少量字段，标题、作者、关键词等论文级字段
+    每篇论文只在这里存一份，格式化检索结果时再按 `paper_key` 关联回来。
+    """
+
+    def __init__(self, db_path: Path = settings.SQLITE_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, tuple] = {}
+        # 构建时在流水线的切分线程中写入，检索时可能被多个线程读取
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS IndexedPapers (
+                paper_key TEXT PRIMARY KEY,
+                doi TEXT,
+                title TEXT,
+                year INTEGER,
+                journal TEXT,
+                authors TEXT,
+                keywords TEXT,
+                filename TEXT,
+                local_path TEXT,
+                updated_at REAL NOT NULL
+            );
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_indexed_papers_title ON IndexedPapers (title);")
+        self._conn.commit()
+
+    # --- 写入 ---
+
+    def add(self, metadata: Dict[str, Any]):
+        """登记一篇论文（传入其完整元数据），在 `flush` 时写入。"""
+        row = (get_paper_key(metadata),) + tuple(
+            parse_year(metadata.get(field)) if field == "year" else metadata.get(field, "N/A")
+            for field in PAPER_FIELDS
+        )
+        self._pending[row[0]] = row
+
+    def flush(self):
+        if not self._pending:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO IndexedPapers (paper_key, {', '.join(PAPER_FIELDS)}, updated_at) "
+                f"VALUES ({', '.join('?' * (len(PAPER_FIELDS) + 2))})",
+                [row + (now,) for row in self._pending.values()]
+            )
+            self._conn.commit()
+        self._pending.clear()
+
+    # --- 查询 ---
+
+    def get_papers(self, paper_keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        keys = list(set(paper_keys))
+        papers = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                part = keys[i:i + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT paper_key, {', '.join(PAPER_FIELDS)} FROM IndexedPapers "
+                    f"WHERE paper_key IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                for row in rows:
+                    papers[row[0]] = dict(zip(PAPER_FIELDS, row[1:]))
+        return papers
+
+    def find_paper_keys_by_title(self, title: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT paper_key FROM IndexedPapers WHERE title = ?", (title,)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+def attach_paper_metadata(documents: List[Document], store: Optional[PaperStore] = None) -> List[Document]:
+    """
+    把论文级字段从侧表关联回检索结果的元数据中（原地修改并返回）。
+    旧版索引的文本块本身就带有这些字段，不需要关联，会被直接跳过。
+    """
+    keys = {doc.metadata["paper_key"] for doc in documents
+            if "paper_key" in doc.metadata and "title" not in doc.metadata}
+    if not keys:
+        return documents
+    store = store or get_paper_store()
+    papers = store.get_papers(keys)
+    for doc in documents:
+        paper = papers.get(doc.metadata.get("paper_key"))
+        if paper and "title" not in doc.metadata:
+            doc.metadata.update({field: value for field, value in paper.items() if field != "year"})
+    return documents
+
+
+_default_store: Optional[PaperStore] = None
+
+
+def get_paper_store() -> PaperStore:
+    """返回进程内共享的侧表连接（检索时使用）。"""
+    global _default_store
+    if _default_store is None:
+        _default_store = PaperStore()
+    return _default_store
@@ -0,0 +1,257 @@
+import os
+import queue
+import resource
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_system.config import settings
+
+# 队列中的结束标记
+_DONE = object()
+
+
+def get_peak_rss_bytes() -> int:
+    """进程迄今为止的峰值常驻内存（字节）。"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上 ru_maxrss 的单位是字节，Linux 上是KB
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_rss_bytes() -> int:
+    """当前进程的常驻内存（字节）。Linux 读取 /proc；其他平台退回到峰值RSS。"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return get_peak_rss_bytes()
+
+
+class PipelineStats:
+    """
+    记录每个阶段的忙碌时间、处理量、活跃时间段和内存，用于找出整条流水线的瓶颈阶段。
+
+    各阶段并发运行，内存只能按进程统计：每处理完一项就采样一次进程RSS，
+    报告中的峰值内存是该阶段运行期间观察到的最大值。
+    """
+
+    def __init__(self, stage_names: List[str], concurrency: Optional[Dict[str, int]] = None):
+        self.stages = {
+            name: {"seconds": 0.0, "items": 0, "first": None, "last": None, "peak_rss": 0}
+            for name in stage_names
+        }
+        # 由多个线程并发执行的阶段，忙碌时间按线程数折算为单线程的等效时间
+        self.concurrency = concurrency or {}
+        self.wall_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, items: int):
+        now = time.perf_counter()
+        rss = get_rss_bytes()
+        with self._lock:
+            entry = self.stages[stage]
+            entry["seconds"] += seconds
+            entry["items"] += items
+            if entry["first"] is None:
+                entry["first"] = now - seconds
+            entry["last"] = now
+            entry["peak_rss"] = max(entry["peak_rss"], rss)
+
+    def busy_seconds(self, stage: str) -> float:
+        return self.stages[stage]["seconds"] / self.concurrency.get(stage, 1)
+
+    def active_seconds(self, stage: str) -> float:
+        """该阶段从处理第一项开始到处理完最后一项之间的墙钟时间。"""
+        entry = self.stages[stage]
+        return entry["last"] - entry["first"] if entry["first"] is not None else 0.0
+
+    def format_report(self) -> str:
+        lines = [
+            f"Pipeline wall time: {self.wall_seconds:.1f}s, peak RSS {get_peak_rss_bytes() / 1024 ** 2:.0f} MB",
+            f"  {'stage':<6} {'wall s':>9} {'busy s':>9} {'items':>9} {'items/s':>10} {'peak MB':>8}",
+        ]
+        for name, stage in self.stages.items():
+            seconds = self.busy_seconds(name)
+            rate = stage["items"] / seconds if seconds else 0.0
+            lanes = f"  x{self.concurrency[name]}" if self.concurrency.get(name, 1) > 1 else ""
+            lines.append(f"  {name:<6} {self.active_seconds(name):>9.1f} {seconds:>9.1f} {stage['items']:>9} "
+                         f"{rate:>10.1f} {stage['peak_rss'] / 1024 ** 2:>8.0f}{lanes}")
+        slowest = max(self.stages, key=self.busy_seconds)
+        lines.append(f"  Slowest stage: {slowest}")
+        return "\n".join(lines)
+
+
+class _Pipeline:
+    """内部实现：在线程之间传递数据，并在任一阶段出错时让所有阶段尽快退出。"""
+
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self.errors: List[BaseException] = []
+
+    def put(self, q: queue.Queue, item: Any):
+        # 带超时地循环写入，这样在下游出错时上游不会永远阻塞在一个已满的队列上
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def iter_queue(self, q: queue.Queue) -> Iterator[Any]:
+        while not self.stop_event.is_set():
+            try:
+                item = q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def run_stage(self, target: Callable[[], None], output: queue.Queue = None):
+        try:
+            target()
+        except BaseException as e:
+            self.errors.append(e)
+            self.stop_event.set()
+        finally:
+            if output is not None:
+                self.put(output, _DONE)
+
+
+def run_ingestion_pipeline(
+        documents: Iterable[Document],
+        chunk_batches: Callable[[Iterable[Document]], Iterator[List[Document]]],
+        embedding_function: Embeddings,
+        db: Chroma,
+        queue_size: int = settings.PIPELINE_QUEUE_SIZE,
+        on_batch_written: Optional[Callable[[List[Document]], None]] = None,
+        embed_threads: int = 1,
+        transform: Optional[Callable[[Document], Document]] = None,
+) -> PipelineStats:
+    """
+    以流水线方式执行 加载 -> (关联) -> 切分 -> 嵌入 -> 写入 各阶段。
+
+    每个阶段运行在独立线程中，阶段之间用有界队列连接：上游处理完一项就交给下游，
+    下游处理不过来时上游会被阻塞。因此各阶段可以并发执行，内存中只保留队列里的少量数据，
+    整体构建时间趋近于最慢阶段的耗时（嵌入模型推理和SQLite写入都会释放GIL）。
+
+    Args:
+        documents (Iterable[Document]): 文档的可迭代对象，通常是流式加载器返回的生成器。
+        chunk_batches (Callable): 把文档流切分为文本块批次的函数，例如 `iter_chunk_batches`；
+            每个文本块的元数据中必须带有 `chunk_id`。
+        embedding_function (Embeddings): 嵌入函数。
+        db (Chroma): 写入目标（也可以是按年份分片的 ShardedChroma）。
+        queue_size (int): 每个阶段间队列的最大长度（论文数或批次数）。
+        on_batch_written (Callable): 可选，每个批次写入Chroma之后在写入线程中调用，例如记录构建进度。
+        embed_threads (int): 同时调用嵌入函数的线程数。嵌入函数是多进程工作池（EmbeddingWorkerPool）时
+            设为其进程数，使多个批次同时在途，写入仍由同一个线程完成。
+        transform (Callable): 可选，在加载线程中对每篇文档调用，例如用SQLite中的权威标题替换元数据中的标题；
+            其耗时作为单独的 join 阶段统计。
+
+    Returns:
+        PipelineStats: 各阶段的耗时统计。
+    """
+    stage_names = ["load", "join", "chunk", "embed", "write"] if transform is not None \
+        else ["load", "chunk", "embed", "write"]
+    stats = PipelineStats(stage_names, concurrency={"embed": embed_threads})
+    pipeline = _Pipeline()
+    document_queue = queue.Queue(maxsize=queue_size)
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    vector_queue = queue.Queue(maxsize=queue_size)
+
+    def load():
+        iterator = iter(documents)
+        while not pipeline.stop_event.is_set():
+            start = time.perf_counter()
+            document = next(iterator, _DONE)
+            if document is _DONE:
+                return
+            stats.add("load", time.perf_counter() - start, 1)
+            if transform is not None:
+                start = time.perf_counter()
+                document = transform(document)
+                stats.add("join", time.perf_counter() - start, 1)
+            pipeline.put(document_queue, document)
+
+    def chunk():
+        waited = [0.0]
+
+        def timed_documents():
+            # 统计切分阶段等待上游文档的时间，以便从忙碌时间中扣除
+            upstream = pipeline.iter_queue(document_queue)
+            while True:
+                start = time.perf_counter()
+                document = next(upstream, _DONE)
+                waited[0] += time.perf_counter() - start
+                if document is _DONE:
+                    return
+                yield document
+
+        iterator = chunk_batches(timed_documents())
+        while not pipeline.stop_event.is_set():
+            start, waited_before = time.perf_counter(), waited[0]
+            batch = next(iterator, _DONE)
+            if batch is _DONE:
+                return
+            stats.add("chunk", time.perf_counter() - start - (waited[0] - waited_before), len(batch))
+            pipeline.put(chunk_queue, batch)
+
+    running_embedders = [embed_threads]
+    embedders_lock = threading.Lock()
+
+    def embed():
+        try:
+            for batch in pipeline.iter_queue(chunk_queue):
+                start = time.perf_counter()
+                vectors = embedding_function.embed_documents([doc.page_content for doc in batch])
+                stats.add("embed", time.perf_counter() - start, len(batch))
+                pipeline.put(vector_queue, (batch, vectors))
+        finally:
+            # 结束标记只有一个：放回队列让其他嵌入线程也能退出，最后一个退出的线程再通知写入阶段
+            pipeline.put(chunk_queue, _DONE)
+            with embedders_lock:
+                running_embedders[0] -= 1
+                last = running_embedders[0] == 0
+            if last:
+                pipeline.put(vector_queue, _DONE)
+
+    threads = [
+        threading.Thread(target=pipeline.run_stage, args=(load, document_queue), name="ingest-load", daemon=True),
+        threading.Thread(target=pipeline.run_stage, args=(chunk, chunk_queue), name="ingest-chunk", daemon=True),
+    ] + [
+        threading.Thread(target=pipeline.run_stage, args=(embed,), name=f"ingest-embed-{i}", daemon=True)
+        for i in range(embed_threads)
+    ]
+
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    # 写入阶段在主线程中执行，保证对Chroma的所有写操作都来自同一个线程
+    def write():
+        for batch, vectors in pipeline.iter_queue(vector_queue):
+            start = time.perf_counter()
+            db._collection.upsert(
+                ids=[doc.metadata["chunk_id"] for doc in batch],
+                embeddings=vectors,
+                metadatas=[doc.metadata for doc in batch],
+                documents=[doc.page_content for doc in batch],
+            )
+            stats.add("write", time.perf_counter() - start, len(batch))
+            if on_batch_written is not None:
+                on_batch_written(batch)
+
+    pipeline.run_stage(write)
+    pipeline.stop_event.set()
+    for thread in threads:
+        thread.join()
+    stats.wall_seconds = time.perf_counter() - wall_start
+
+    if pipeline.errors:
+        raise pipeline.errors[0]
+    return stats
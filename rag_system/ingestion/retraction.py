@@ -0,0 +1,327 @@
+import argparse
+import shutil
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_community.vectorstores import Chroma
+
+from rag_system.config import settings
+from rag_system.ingestion.binary_index import BINARY_INDEX_FILENAME, build_binary_index, update_binary_index
+from rag_system.ingestion.dedup import DEDUP_LINKS_FILENAME, readmit_linked_duplicates
+from rag_system.ingestion.dim_reduction import PROJECTION_FILENAME
+from rag_system.ingestion.index_versions import (
+    REVISION_FILENAME,
+    bump_index_revision,
+    create_staging_dir,
+    is_chroma_artifact,
+    publish_version,
+    resolve_active_path
+)
+from rag_system.ingestion.model_registry import INDEX_META_FILENAME
+from rag_system.ingestion.paper_index import (
+    PAPER_INDEX_FILENAME,
+    build_paper_index,
+    paper_key_filter,
+    update_paper_index
+)
+from rag_system.ingestion.shards import SHARD_MANIFEST_FILENAME, ShardedChroma, load_shard_manifest, open_vector_store
+from rag_system.ingestion.text_chunker import get_paper_key, paper_key_from_chunk_id
+
+# 从Chroma中分页读取/删除时每页的条目数
+_PAGE_SIZE = 5000
+# SQLite 单条语句中允许的参数数量有限，按此大小分批
+_SQL_BATCH = 500
+# 与Chroma文件放在同一个索引目录中的侧文件，压缩前后统计索引大小时计入
+_INDEX_SIDE_FILES = (PROJECTION_FILENAME, DEDUP_LINKS_FILENAME, INDEX_META_FILENAME, BINARY_INDEX_FILENAME,
+                     PAPER_INDEX_FILENAME, SHARD_MANIFEST_FILENAME, REVISION_FILENAME)
+
+
+class TombstoneStore:
+    """
+    论文撤回记录（墓碑），保存在 settings.SQLITE_DB_PATH 的 Tombstones 表中。
+
+    撤回分两步：先为要撤回的论文写入墓碑（很快，且持久化），再由 `apply_tombstones` 分批从
+    向量数据库和SQLite中删除其数据并标记为已生效。删除中途失败时，未生效的墓碑会在下一次执行时继续处理。
+    墓碑在生效后仍然保留：构建、增量更新和投递目录注入都会跳过被撤回的论文，即使它仍在源文件中。
+    """
+
+    def __init__(self, db_path: Path = settings.SQLITE_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path))
+        # Papers 表的子表依赖 ON DELETE CASCADE 级联删除，SQLite 默认不启用外键约束
+        self._conn.execute("PRAGMA foreign_keys = ON;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS Tombstones (
+                paper_key TEXT PRIMARY KEY,
+                reason TEXT,
+                created_at REAL NOT NULL,
+                applied_at REAL,
+                chunks_removed INTEGER
+            );
+        """)
+        self._conn.commit()
+
+    def add(self, paper_keys: Iterable[str], reason: str = "") -> int:
+        """为论文写入墓碑（已存在的墓碑会重新标记为未生效），返回写入的数量。"""
+        now = time.time()
+        rows = [(key.strip(), reason, now) for key in paper_keys if key and key.strip()]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO Tombstones (paper_key, reason, created_at, applied_at, chunks_removed) "
+            "VALUES (?, ?, ?, NULL, NULL)",
+            rows
+        )
+        self._conn.commit()
+        return len(rows)
+
+    def remove(self, paper_keys: Iterable[str]) -> int:
+        """删除墓碑，允许之后重新注入这些论文。"""
+        keys = list(paper_keys)
+        removed = 0
+        for i in range(0, len(keys), _SQL_BATCH):
+            part = keys[i:i + _SQL_BATCH]
+            removed += self._conn.execute(
+                f"DELETE FROM Tombstones WHERE paper_key IN ({','.join('?' * len(part))})", part
+            ).rowcount
+        self._conn.commit()
+        return removed
+
+    def pending(self, limit: Optional[int] = None) -> List[str]:
+        query = "SELECT paper_key FROM Tombstones WHERE applied_at IS NULL ORDER BY created_at"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return [row[0] for row in self._conn.execute(query).fetchall()]
+
+    def retracted_keys(self) -> Set[str]:
+        return {row[0] for row in self._conn.execute("SELECT paper_key FROM Tombstones").fetchall()}
+
+    def entries(self) -> List[tuple]:
+        return self._conn.execute(
+            "SELECT paper_key, reason, created_at, applied_at, chunks_removed FROM Tombstones ORDER BY created_at"
+        ).fetchall()
+
+    def delete_sqlite_rows(self, paper_keys: List[str]) -> int:
+        """从论文侧表和材料数据表（Papers 及其级联的子表）中删除这些论文，返回删除的论文行数。"""
+        tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        removed = 0
+        placeholders = ','.join('?' * len(paper_keys))
+        if "IndexedPapers" in tables:
+            removed += self._conn.execute(
+                f"DELETE FROM IndexedPapers WHERE paper_key IN ({placeholders})", paper_keys).rowcount
+        if "Papers" in tables:
+            # Materials / BasePolymers / Solvents / Performances / Applications 通过外键级联删除
+            removed += self._conn.execute(f"DELETE FROM Papers WHERE doi IN ({placeholders})", paper_keys).rowcount
+        return removed
+
+    def mark_applied(self, chunks_removed: Dict[str, int]):
+        now = time.time()
+        self._conn.executemany(
+            "UPDATE Tombstones SET applied_at = ?, chunks_removed = ? WHERE paper_key = ?",
+            [(now, count, key) for key, count in chunks_removed.items()]
+        )
+        self._conn.commit()
+
+    def vacuum(self):
+        self._conn.execute("VACUUM;")
+
+    def close(self):
+        self._conn.close()
+
+
+def get_retracted_keys() -> Set[str]:
+    """返回所有被撤回论文的标识，构建和增量注入时用来跳过这些论文。"""
+    if not settings.SQLITE_DB_PATH.exists():
+        return set()
+    store = TombstoneStore()
+    try:
+        return store.retracted_keys()
+    finally:
+        store.close()
+
+
+def _delete_chunks(db, index_path: Path, paper_keys: List[str]) -> Tuple[Dict[str, int], List[str], List[str]]:
+    """
+    删除这些论文的全部文本块，返回 (每篇论文删除的文本块数, 删除的文本块ID, 写回的文本块ID)。
+    其他论文中与被删除文本块近似重复、因此没有入库的文本块会先被写回（见 readmit_linked_duplicates）。
+    """
+    found = db._collection.get(where=paper_key_filter(paper_keys), include=["metadatas"])
+    readmitted_ids = readmit_linked_duplicates(db, index_path, found["ids"], set(paper_keys))
+    for i in range(0, len(found["ids"]), _PAGE_SIZE):
+        db._collection.delete(ids=found["ids"][i:i + _PAGE_SIZE])
+    counts = Counter(get_paper_key(metadata or {}) for metadata in found["metadatas"])
+    return {key: counts.get(key, 0) for key in paper_keys}, found["ids"], readmitted_ids
+
+
+def apply_tombstones(db_path: Path = settings.VECTOR_DB_PATH,
+                     batch_size: int = settings.TOMBSTONE_BATCH_SIZE) -> int:
+    """
+    分批执行未生效的墓碑：从当前发布版本的向量数据库中删除这些论文的文本块，
+    再删除其SQLite记录，最后标记墓碑已生效。返回删除的文本块总数。
+
+    删除只作用于当前版本；为回滚保留的旧版本不受影响，会在之后的发布中被清理。
+    """
+    index_path = resolve_active_path(db_path)
+    db = open_vector_store(index_path, None)
+    store = TombstoneStore()
+    total_chunks, total_papers = 0, 0
+    # 二值索引和论文级索引在全部批次执行完后只针对变化的部分更新一次
+    removed_ids, readmitted_ids, touched_paper_keys = [], [], set()
+    try:
+        while True:
+            paper_keys = store.pending(limit=batch_size)
+            if not paper_keys:
+                break
+            removed, batch_removed_ids, batch_readmitted_ids = _delete_chunks(db, index_path, paper_keys)
+            removed_ids.extend(batch_removed_ids)
+            readmitted_ids.extend(batch_readmitted_ids)
+            touched_paper_keys.update(paper_keys)
+            touched_paper_keys.update(paper_key_from_chunk_id(chunk_id) for chunk_id in batch_readmitted_ids)
+            chunks = sum(removed.values())
+            rows = store.delete_sqlite_rows(paper_keys)
+            store.mark_applied(removed)
+            total_chunks += chunks
+            total_papers += len(paper_keys)
+            print(f"Applied {len(paper_keys)} tombstones: {chunks} chunks and {rows} SQLite paper rows removed")
+    finally:
+        store.close()
+
+    if total_papers and settings.BINARY_INDEX_ENABLED:
+        update_binary_index(db, index_path, readmitted_ids, removed_ids)
+    if total_papers and settings.PAPER_INDEX_ENABLED:
+        update_paper_index(db, index_path, touched_paper_keys)
+    if total_papers:
+        bump_index_revision(index_path)
+    print(f"✅ 撤回完成：{total_papers} 篇论文，共删除 {total_chunks} 个文本块。")
+    return total_chunks
+
+
+def retract_papers(dois: Iterable[str], reason: str = "", apply: bool = True) -> int:
+    """按DOI撤回论文：写入墓碑，apply为True时立即执行。返回写入的墓碑数量。"""
+    store = TombstoneStore()
+    try:
+        count = store.add(dois, reason)
+    finally:
+        store.close()
+    print(f"已为 {count} 篇论文写入墓碑。")
+    if apply:
+        apply_tombstones()
+    return count
+
+
+def _directory_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def _index_size(index_path: Path) -> int:
+    """
+    索引本身占用的字节数：Chroma的文件加上同目录中的侧文件。旧版布局中索引直接位于 db_path 下，
+    同一目录中还有 versions/（其他版本和暂存目录）以及用户自己的文件，因此不能统计整个目录。
+    """
+    total = 0
+    for entry in Path(index_path).iterdir():
+        if is_chroma_artifact(entry):
+            total += _directory_size(entry) if entry.is_dir() else entry.stat().st_size
+        elif entry.name in _INDEX_SIDE_FILES and entry.is_file():
+            total += entry.stat().st_size
+    return total
+
+
+def compact_index(db_path: Path = settings.VECTOR_DB_PATH) -> Path:
+    """
+    压缩向量数据库：把当前版本中现存的向量、文本和元数据原样复制到一个新版本中（不重新嵌入），
+    然后发布新版本并清理旧版本。Chroma 删除条目后不会缩小其HNSW索引和数据文件，
+    只有这样重写一遍，撤回大量论文之后索引才会真正变小。
+
+    请在没有增量更新或投递目录注入正在写入时执行，否则复制开始之后写入的条目不会出现在新版本中。
+    """
+    source_path = resolve_active_path(db_path)
+    source = open_vector_store(source_path, None)
+    staging_path = create_staging_dir(db_path)
+    print(f"--- Compacting {source_path} into {staging_path} ---")
+    manifest = load_shard_manifest(source_path)
+    if manifest is not None:
+        target = ShardedChroma(staging_path, None, span=manifest["span"])
+    else:
+        target = Chroma(persist_directory=str(staging_path))
+    for filename in (PROJECTION_FILENAME, DEDUP_LINKS_FILENAME, INDEX_META_FILENAME):
+        if (source_path / filename).exists():
+            shutil.copy2(source_path / filename, staging_path / filename)
+
+    copied = 0
+    while True:
+        page = source._collection.get(include=["embeddings", "documents", "metadatas"],
+                                      limit=_PAGE_SIZE, offset=copied)
+        if not page["ids"]:
+            break
+        target._collection.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                                  metadatas=page["metadatas"], documents=page["documents"])
+        copied += len(page["ids"])
+
+    count = target._collection.count()
+    if count != copied:
+        raise RuntimeError(f"Compaction failed: copied {copied} vectors, found {count}.")
+    if settings.BINARY_INDEX_ENABLED:
+        build_binary_index(target, staging_path)
+    if settings.PAPER_INDEX_ENABLED:
+        build_paper_index(target, staging_path)
+    before, after = _index_size(source_path), _index_size(staging_path)
+    publish_version(db_path, staging_path)
+    print(f"✅ 向量数据库压缩完成：{copied} 个文本块，{before / 1024 / 1024:.1f} MB -> {after / 1024 / 1024:.1f} MB")
+    return resolve_active_path(db_path)
+
+
+def compact_sqlite(db_path: Path = settings.SQLITE_DB_PATH):
+    """对SQLite数据库执行 VACUUM，回收已删除行占用的空间。"""
+    before = db_path.stat().st_size
+    store = TombstoneStore(db_path)
+    try:
+        store.vacuum()
+    finally:
+        store.close()
+    after = db_path.stat().st_size
+    print(f"✅ SQLite压缩完成：{before / 1024 / 1024:.1f} MB -> {after / 1024 / 1024:.1f} MB")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="按DOI撤回论文、执行墓碑，以及压缩向量数据库和SQLite。")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    retract = subparsers.add_parser("retract", help="撤回论文（写入墓碑并立即执行）")
+    retract.add_argument("dois", nargs="*", help="要撤回的论文DOI")
+    retract.add_argument("--file", help="每行一个DOI的文本文件，用于批量撤回")
+    retract.add_argument("--reason", default="", help="撤回原因")
+    retract.add_argument("--defer", action="store_true", help="只写入墓碑，稍后用 apply 命令统一执行")
+    reinstate = subparsers.add_parser("reinstate", help="删除墓碑，允许之后重新注入这些论文")
+    reinstate.add_argument("dois", nargs="+")
+    subparsers.add_parser("apply", help="执行所有未生效的墓碑")
+    subparsers.add_parser("list", help="列出所有墓碑")
+    subparsers.add_parser("compact", help="压缩向量数据库和SQLite，回收已删除数据占用的空间")
+    args = parser.parse_args(argv)
+
+    if args.command == "retract":
+        dois = list(args.dois)
+        if args.file:
+            with open(args.file, "r", encoding="utf-8") as f:
+                dois.extend(line.strip() for line in f if line.strip())
+        retract_papers(dois, reason=args.reason, apply=not args.defer)
+    elif args.command == "reinstate":
+        tombstones = TombstoneStore()
+        print(f"已删除 {tombstones.remove(args.dois)} 条墓碑。")
+        tombstones.close()
+    elif args.command == "apply":
+        apply_tombstones()
+    elif args.command == "list":
+        tombstones = TombstoneStore()
+        for paper_key, reason, created_at, applied_at, chunks in tombstones.entries():
+            state = f"applied, {chunks} chunks" if applied_at else "pending"
+            print(f"{paper_key}\t{time.strftime('%Y-%m-%d %H:%M', time.localtime(created_at))}\t{state}\t{reason}")
+        tombstones.close()
+    else:
+        compact_index()
+        compact_sqlite()
+
+
+if __name__ == "__main__":
+    main()
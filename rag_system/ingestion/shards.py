@@ -0,0 +1,299 @@
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_system.ingestion.model_registry import check_index_model
+from rag_system.ingestion.paper_store import parse_year
+
+# 分片清单与各分片集合保存在同一个版本目录中；目录中没有清单时就是普通的单一集合索引
+SHARD_MANIFEST_FILENAME = "shards.json"
+# 年份无法解析（元数据中 year 为0）的文本块单独放在这个分片中
+UNKNOWN_YEAR_SHARD = "years-unknown"
+
+YearBounds = Tuple[Optional[int], Optional[int]]
+
+
+def year_filter(min_year: Optional[int] = None, max_year: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """按年份范围（含两端）构造Chroma的 where 条件，两端都为None时返回None。"""
+    conditions = []
+    if min_year is not None:
+        conditions.append({"year": {"$gte": int(min_year)}})
+    if max_year is not None:
+        conditions.append({"year": {"$lte": int(max_year)}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def year_bounds(where: Optional[Dict[str, Any]]) -> YearBounds:
+    """
+    从 where 条件中推出年份的下限和上限（含两端，None表示不限）。
+    只分析 year 字段上的 $eq/$gt/$gte/$lt/$lte/$in 及其 $and 组合；$or 等无法收窄的条件视为不限。
+    """
+    low, high = None, None
+    if not where:
+        return low, high
+    if "$and" in where:
+        for condition in where["$and"]:
+            sub_low, sub_high = year_bounds(condition)
+            if sub_low is not None:
+                low = sub_low if low is None else max(low, sub_low)
+            if sub_high is not None:
+                high = sub_high if high is None else min(high, sub_high)
+        return low, high
+    if "year" not in where:
+        return low, high
+    condition = where["year"]
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    for op, value in condition.items():
+        if op == "$eq":
+            low, high = int(value), int(value)
+        elif op == "$gte":
+            low = int(value)
+        elif op == "$gt":
+            low = int(value) + 1
+        elif op == "$lte":
+            high = int(value)
+        elif op == "$lt":
+            high = int(value) - 1
+        elif op == "$in" and value:
+            low, high = min(map(int, value)), max(map(int, value))
+    return low, high
+
+
+def shard_for_year(year: int, span: int) -> Dict[str, Any]:
+    """返回某个年份所属分片的描述：集合名和年份范围。span 为每个分片覆盖的年数。"""
+    if year <= 0:
+        return {"collection": UNKNOWN_YEAR_SHARD, "min_year": 0, "max_year": 0}
+    start = year - year % span if span > 1 else year
+    end = start + span - 1
+    name = f"years-{start}" if span == 1 else f"years-{start}-{end}"
+    return {"collection": name, "min_year": start, "max_year": end}
+
+
+def load_shard_manifest(index_path: Path) -> Optional[Dict[str, Any]]:
+    path = Path(index_path) / SHARD_MANIFEST_FILENAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _merge_results(results: List[Dict[str, Any]], keys: List[str]) -> Dict[str, Any]:
+    merged = {}
+    for key in keys:
+        values = [result.get(key) for result in results]
+        merged[key] = None if all(value is None for value in values) \
+            else [item for value in values if value is not None for item in value]
+    return merged
+
+
+class ShardedCollection:
+    """
+    按年份分片的集合，提供与 chromadb Collection 相同的 upsert/get/delete/count/query 接口，
+    构建流水线、二值索引等直接操作 `db._collection` 的代码因此无需区分是否分片。
+    """
+
+    _GET_KEYS = ["ids", "embeddings", "documents", "metadatas"]
+
+    def __init__(self, store: "ShardedChroma"):
+        self.store = store
+
+    def upsert(self, ids: List[str], embeddings=None, metadatas: Optional[List[Dict[str, Any]]] = None,
+               documents: Optional[List[str]] = None):
+        groups = defaultdict(list)
+        for i, metadata in enumerate(metadatas or [{}] * len(ids)):
+            groups[self.store.shard_for_metadata(metadata)].append(i)
+        for shard, positions in groups.items():
+            shard._collection.upsert(
+                ids=[ids[i] for i in positions],
+                embeddings=[embeddings[i] for i in positions] if embeddings is not None else None,
+                metadatas=[metadatas[i] for i in positions] if metadatas is not None else None,
+                documents=[documents[i] for i in positions] if documents is not None else None,
+            )
+
+    def count(self) -> int:
+        return sum(shard._collection.count() for shard in self.store.shards())
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        # 文本块ID中不含年份，只能在每个分片中各删一次（不存在的ID会被忽略）
+        for shard in self.store.shards(year_bounds(where)):
+            shard._collection.delete(ids=ids, where=where)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None, **kwargs: Any) -> Dict[str, Any]:
+        shards = self.store.shards(year_bounds(where))
+        if ids is not None or where is not None or (limit is None and not offset):
+            merged = _merge_results([shard._collection.get(ids=ids, where=where, **kwargs) for shard in shards],
+                                    self._GET_KEYS)
+            if limit is None and not offset:
+                return merged
+            end = None if limit is None else (offset or 0) + limit
+            return {key: value[offset or 0:end] if value is not None else None for key, value in merged.items()}
+
+        # 无过滤条件的分页读取：按各分片的条目数跳过整片，避免每一页都把前面的分片从头读一遍
+        results, skip, remaining = [], offset or 0, limit
+        for shard in shards:
+            if remaining is not None and remaining <= 0:
+                break
+            size = shard._collection.count()
+            if skip >= size:
+                skip -= size
+                continue
+            result = shard._collection.get(limit=remaining, offset=skip, **kwargs)
+            skip = 0
+            results.append(result)
+            if remaining is not None:
+                remaining -= len(result["ids"])
+        return _merge_results(results, self._GET_KEYS)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Optional[List[str]] = None,
+              **kwargs: Any) -> Dict[str, Any]:
+        include = ["metadatas", "documents", "distances"] if include is None else list(include)
+        fields = [field for field in ("embeddings", "documents", "metadatas") if field in include]
+        shards = self.store.shards(year_bounds(where))
+        merged = {key: [] for key in ["ids", "distances"] + fields}
+        for query_embedding in query_embeddings:
+            rows = []
+            for shard in shards:
+                result = shard._collection.query(query_embeddings=[query_embedding], n_results=n_results,
+                                                 where=where, include=sorted(set(fields) | {"distances"}), **kwargs)
+                for i, chunk_id in enumerate(result["ids"][0]):
+                    rows.append((result["distances"][0][i], chunk_id,
+                                 {field: result[field][0][i] for field in fields}))
+            rows.sort(key=lambda row: row[0])
+            rows = rows[:n_results]
+            merged["ids"].append([row[1] for row in rows])
+            merged["distances"].append([row[0] for row in rows])
+            for field in fields:
+                merged[field].append([row[2][field] for row in rows])
+        if "distances" not in include:
+            merged["distances"] = None
+        return merged
+
+
+class ShardedChroma:
+    """
+    把文本块按发表年份（或年份区间）分到同一目录下的多个Chroma集合中。
+
+    分片清单 shards.json 记录每个集合覆盖的年份范围。带年份过滤条件的检索只查询范围相交的分片，
+    再按相关度合并各分片的结果；不带年份条件时查询全部分片。时间受限的查询因此只需扫描一部分索引。
+    """
+
+    def __init__(self, persist_directory: Union[str, Path], embedding_function: Embeddings,
+                 span: Optional[int] = None):
+        self.persist_directory = Path(persist_directory)
+        self.embedding_function = embedding_function
+        manifest = load_shard_manifest(self.persist_directory)
+        if manifest is None:
+            if not span:
+                raise ValueError(f"{self.persist_directory} 中没有分片清单，新建分片索引需要指定 span。")
+            manifest = {"key": "year", "span": int(span), "shards": []}
+            self._write_manifest(manifest)
+        self.span = manifest["span"]
+        self._manifest = manifest
+        self._stores: Dict[str, Chroma] = {}
+        self._collection = ShardedCollection(self)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    # --- 分片管理 ---
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        path = self.persist_directory / SHARD_MANIFEST_FILENAME
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _open(self, name: str) -> Chroma:
+        if name not in self._stores:
+            self._stores[name] = Chroma(collection_name=name, persist_directory=str(self.persist_directory),
+                                        embedding_function=self.embedding_function)
+        return self._stores[name]
+
+    def shard_for_metadata(self, metadata: Dict[str, Any]) -> Chroma:
+        """返回文本块应写入的分片，第一次遇到某个年份范围时创建分片并登记到清单中。"""
+        shard = shard_for_year(parse_year(metadata.get("year")), self.span)
+        if all(entry["collection"] != shard["collection"] for entry in self._manifest["shards"]):
+            self._manifest["shards"].append(shard)
+            self._manifest["shards"].sort(key=lambda entry: entry["min_year"])
+            self._write_manifest(self._manifest)
+        return self._open(shard["collection"])
+
+    def shards(self, bounds: YearBounds = (None, None)) -> List[Chroma]:
+        """返回年份范围与 bounds 相交的分片（按年份升序）。"""
+        low, high = bounds
+        return [
+            self._open(entry["collection"]) for entry in self._manifest["shards"]
+            if (low is None or entry["max_year"] >= low) and (high is None or entry["min_year"] <= high)
+        ]
+
+    # --- 与 langchain Chroma 相同的读写接口 ---
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        ids = ids or [doc.metadata["chunk_id"] for doc in documents]
+        self._collection.upsert(
+            ids=ids,
+            embeddings=self.embedding_function.embed_documents([doc.page_content for doc in documents]),
+            metadatas=[doc.metadata for doc in documents],
+            documents=[doc.page_content for doc in documents],
+        )
+        return ids
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None, **kwargs: Any) -> Dict[str, Any]:
+        return self._collection.get(ids=ids, where=where, limit=limit, offset=offset, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any):
+        self._collection.delete(ids=ids, where=kwargs.get("where"))
+
+    def persist(self):
+        # 新版Chroma会自动持久化；保留此方法以兼容旧版的调用方式
+        for store in self._stores.values():
+            if hasattr(store, "persist"):
+                store.persist()
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4,
+                                                filter: Optional[Dict[str, Any]] = None,
+                                                **kwargs: Any) -> List[Tuple[Document, float]]:
+        shards = self.shards(year_bounds(filter))
+        if not shards:
+            return []
+        # 查询向量只计算一次，各分片按相同的距离→相关度换算后合并
+        query_vector = self.embedding_function.embed_query(query)
+        results = []
+        for shard in shards:
+            to_relevance = shard._select_relevance_score_fn()
+            results.extend(
+                (doc, to_relevance(distance))
+                for doc, distance in shard.similarity_search_by_vector_with_relevance_scores(
+                    query_vector, k=k, filter=filter, **kwargs)
+            )
+        return sorted(results, key=lambda pair: pair[1], reverse=True)[:k]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, filter=filter, **kwargs)]
+
+
+def open_vector_store(index_path: Path, embedding_function: Embeddings) -> Union[Chroma, ShardedChroma]:
+    """
+    打开一个索引目录：有分片清单时返回 ShardedChroma，否则返回普通的Chroma。
+    传入嵌入函数时先检查它的模型与索引构建时的模型一致（见 check_index_model），不一致则拒绝打开。
+    """
+    if embedding_function is not None:
+        check_index_model(index_path, embedding_function)
+    if load_shard_manifest(index_path) is not None:
+        return ShardedChroma(index_path, embedding_function)
+    return Chroma(persist_directory=str(index_path), embedding_function=embedding_function)
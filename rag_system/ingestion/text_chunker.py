@@ -1,30 +1,323 @@
-from typing import List
+import hashlib
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AbstractSet, Iterable, Iterator, List, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from rag_system.config import settings
 
 
-def chunk_documents(documents: List[Document]) -> List[Document]:
+# make_chunk_id 生成的ID：论文标识、起始位置（缺失时为-1）和16位十六进制的文本哈希
+_CHUNK_ID = re.compile(r".+:-?\d+:[0-9a-f]{16}")
+
+
+def get_paper_key(metadata: dict) -> str:
+    """
+    返回论文的稳定标识：优先使用DOI，缺失时依次退回到 local_path 和 filename。
+    精简后的文本块元数据中已经带有 `paper_key`，直接使用。
+    """
+    if metadata.get("paper_key"):
+        return str(metadata["paper_key"])
+    for field in ("doi", "local_path", "filename"):
+        value = metadata.get(field)
+        if value and value != "N/A":
+            return str(value)
+    return "unknown"
+
+
+def make_chunk_id(paper_key: str, start_index: int, text: str) -> str:
+    """
+    根据论文标识、块起始位置和块文本的哈希生成确定性的文本块ID。
+
+    同一篇论文的同一段文本无论构建多少次都会得到相同的ID；文本一旦变化，ID也随之变化。
+    这使得增量同步只需比较ID集合即可判断哪些块需要新增或删除。
+    """
+    text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+    return f"{paper_key}:{start_index}:{text_hash}"
+
+
+def paper_key_from_chunk_id(chunk_id: str) -> str:
+    """从 `make_chunk_id` 生成的ID中还原论文标识（DOI本身可能包含冒号，因此从右侧切分）。"""
+    return chunk_id.rsplit(":", 2)[0]
+
+
+def is_content_addressed_id(chunk_id: str) -> bool:
+    """是否为 `make_chunk_id` 生成的ID。旧版本构建的索引使用随机UUID，无法从ID中还原论文标识。"""
+    return _CHUNK_ID.fullmatch(chunk_id) is not None
+
+
+def assign_chunk_ids(chunks: List[Document]) -> List[str]:
+    """
+    为每个文本块计算内容寻址ID，写入其元数据的 `chunk_id` 字段，并按顺序返回这些ID。
+    """
+    ids = []
+    for chunk in chunks:
+        chunk_id = make_chunk_id(
+            get_paper_key(chunk.metadata),
+            chunk.metadata.get("start_index", -1),
+            chunk.page_content
+        )
+        chunk.metadata["chunk_id"] = chunk_id
+        ids.append(chunk_id)
+    return ids
+
+
+# --- 切分器 ---
+
+@lru_cache(maxsize=1)
+def get_embedding_tokenizer():
+    """加载嵌入模型自己的分词器（每个进程只加载一次），用于按token计算文本块长度。"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL_NAME)
+
+
+def get_chunk_sizes(length_unit: str = settings.CHUNK_LENGTH_UNIT) -> Tuple[int, int]:
+    """返回该计量单位下的 (文本块大小, 重叠大小)。"""
+    if length_unit == "chars":
+        return settings.CHUNK_SIZE, settings.CHUNK_OVERLAP
+    if length_unit == "tokens":
+        return settings.CHUNK_SIZE_TOKENS, settings.CHUNK_OVERLAP_TOKENS
+    raise ValueError(f"未知的文本块长度单位: {length_unit}，可选值为 chars / tokens")
+
+
+def make_text_splitter(chunk_size: int, chunk_overlap: int,
+                       length_unit: str = settings.CHUNK_LENGTH_UNIT) -> RecursiveCharacterTextSplitter:
+    """
+    构建文本切分器。length_unit 为 "tokens" 时用嵌入模型的分词器计算长度，
+    按token预算把文本块填满到 chunk_size，既不会超出模型窗口被截断，也不会浪费窗口。
+    """
+    get_chunk_sizes(length_unit)  # 校验单位
+    if length_unit == "tokens":
+        return RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+            get_embedding_tokenizer(),
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True
+        )
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True
+    )
+
+
+# --- 章节识别 ---
+# 全文由数据处理脚本生成，格式为 "Title: ...\n...\n\nAbstract:\n<摘要>\n\nMain Content:\n<正文>"，
+# 正文是一整段文本，章节标题以 "3. Results and discussion" 的形式内嵌其中。
+_ABSTRACT_MARKER = "\n\nAbstract:\n"
+_MAIN_CONTENT_MARKER = "\n\nMain Content:\n"
+
+# 带编号的一级章节标题，按标题的第一个词归类
+_NUMBERED_HEADING = re.compile(
+    r"(?<![\w.,])(?P<number>[1-9]\d?)\.?\s+(?P<title>Introduction|Background|Theory|Theoretical|"
+    r"Materials?|Methods?|Methodology|Experimental|Experiments?|Results?|Discussion|"
+    r"Conclusions?|Concluding|Summary|Outlook)\b"
+)
+_HEADING_SECTIONS = {
+    "Introduction": "introduction", "Background": "introduction",
+    "Material": "methods", "Materials": "methods", "Method": "methods", "Methods": "methods",
+    "Methodology": "methods", "Experimental": "methods", "Experiment": "methods", "Experiments": "methods",
+    "Result": "results", "Results": "results", "Discussion": "discussion",
+    "Conclusion": "conclusions", "Conclusions": "conclusions", "Concluding": "conclusions",
+    "Summary": "conclusions", "Outlook": "conclusions",
+}
+# 图表标题、交叉引用中的编号（如 "Figure 3. Results of ..."）不是章节标题
+_NOT_A_HEADING = re.compile(r"(?:Fig\.?|Figure|Table|Scheme|Section|Eq\.?|Equation|and|to|of)\s*$")
+
+# 正文之后的附属部分：利益声明、作者贡献、致谢、基金、附录、参考文献等
+_BACK_MATTER = re.compile(
+    r"(?<!\w)(?:Declaration of [Cc]ompeting [Ii]nterests?|CRediT authorship contribution statement|"
+    r"Acknowledge?ments?\b|Author Contributions:|Funding:|Con(?:fl|\ufb02)icts? of Interest|"
+    r"Data [Aa]vailability|Supplementary Materials:|Appendix [A-Z]\.)"
+)
+_REFERENCES = re.compile(r"(?<!\w)(?:References|Bibliography)(?=\s*(?:\[1\]|\(1\)|1\.\s|[A-Z][a-z]+,))")
+
+
+def detect_sections(text: str) -> List[Tuple[str, int, int]]:
+    """
+    识别论文全文的章节结构。
+
+    返回按位置排列的 (章节名, 起始位置, 结束位置) 列表，覆盖整个文本。章节名取值为
+    header / abstract / front_matter / introduction / methods / results / discussion / conclusions /
+    body / back_matter / references。正文中没有识别出任何章节标题时，整个正文记为 body。
+
+    带编号的标题必须按编号递增出现，以排除图表标题和正文中的编号列表；
+    附属部分和参考文献只在全文后半部分识别，并且一旦进入就不再回到正文章节。
+    """
+    boundaries: List[Tuple[int, str]] = []
+    body_start = 0
+    abstract_at = text.find(_ABSTRACT_MARKER)
+    main_at = text.find(_MAIN_CONTENT_MARKER)
+    if abstract_at != -1:
+        boundaries.append((0, "header"))
+        boundaries.append((abstract_at, "abstract"))
+        body_start = abstract_at + len(_ABSTRACT_MARKER)
+    if main_at != -1 and main_at >= body_start:
+        body_start = main_at + len(_MAIN_CONTENT_MARKER)
+
+    headings = []
+    last_number = 0
+    for match in _NUMBERED_HEADING.finditer(text, body_start):
+        number = int(match.group("number"))
+        if not last_number < number <= last_number + 2:
+            continue
+        if _NOT_A_HEADING.search(text[max(0, match.start() - 10):match.start()]):
+            continue
+        headings.append((match.start(), _HEADING_SECTIONS[match.group("title")]))
+        last_number = number
+
+    tail_start = max(body_start, len(text) // 2)
+    back_matter = _BACK_MATTER.search(text, tail_start)
+    references = _REFERENCES.search(text, tail_start)
+    body_end = min(m.start() for m in (back_matter, references, None) if m is not None) \
+        if back_matter or references else len(text)
+    headings = [heading for heading in headings if heading[0] < body_end]
+
+    if headings:
+        boundaries.append((body_start, "front_matter"))
+        boundaries.extend(headings)
+    else:
+        boundaries.append((body_start, "body"))
+    if back_matter and (not references or back_matter.start() < references.start()):
+        boundaries.append((back_matter.start(), "back_matter"))
+    if references:
+        boundaries.append((references.start(), "references"))
+
+    sections = []
+    for i, (start, label) in enumerate(boundaries):
+        end = boundaries[i + 1][0] if i + 1 < len(boundaries) else len(text)
+        if end <= start:
+            continue
+        if sections and sections[-1][0] == label:
+            sections[-1] = (label, sections[-1][1], end)
+        else:
+            sections.append((label, start, end))
+    return sections
+
+
+def split_document(
+        text_splitter: RecursiveCharacterTextSplitter,
+        document: Document,
+        section_aware: bool = settings.SECTION_AWARE_CHUNKING,
+        drop_sections: AbstractSet[str] = frozenset(settings.SECTION_DROP),
+) -> List[Document]:
+    """
+    切分单篇文档。section_aware 为True时先按章节分段，文本块不会跨越章节边界，
+    章节名写入元数据 `section`，drop_sections 中的章节直接跳过；`start_index` 始终相对于全文。
+    """
+    if not section_aware:
+        return text_splitter.split_documents([document])
+
+    text = document.page_content
+    chunks = []
+    for label, start, end in detect_sections(text):
+        if label in drop_sections:
+            continue
+        section = Document(page_content=text[start:end], metadata={**document.metadata, "section": label})
+        for chunk in text_splitter.split_documents([section]):
+            chunk.metadata["start_index"] += start
+            chunks.append(chunk)
+    return chunks
+
+
+def chunk_documents(documents: List[Document], workers: int = settings.CHUNK_WORKERS) -> List[Document]:
     """
     将文档列表切分成更小的文本块。
 
     Args:
         documents (List[Document]): A list of documents to be chunked.
+        workers (int): 并行切分的进程数，为1时在当前进程中串行切分。
 
     Returns:
         List[Document]: A list of smaller document chunks.
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.CHUNK_SIZE,
-        chunk_overlap=settings.CHUNK_OVERLAP,
-        add_start_index=True  # 在元数据中添加块的起始位置，便于追溯
-    )
-
-    chunked_documents = text_splitter.split_documents(documents)
+    chunked_documents = [
+        chunk
+        for chunks in iter_split_documents(documents, workers=workers)
+        for chunk in chunks
+    ]
     print(f"成功将 {len(documents)} 个文档切分为 {len(chunked_documents)} 个文本块。")
     return chunked_documents
 
 
+# --- 多进程切分 ---
+# 每个工作进程只构建一次切分器，由进程池的 initializer 设置
+_worker_splitter = None
+_worker_section_aware = False
+
+
+def _init_chunk_worker(chunk_size: int, chunk_overlap: int, length_unit: str, section_aware: bool):
+    global _worker_splitter, _worker_section_aware
+    _worker_splitter = make_text_splitter(chunk_size, chunk_overlap, length_unit)
+    _worker_section_aware = section_aware
+
+
+def _split_in_worker(documents: List[Document]) -> List[List[Document]]:
+    return [split_document(_worker_splitter, document, _worker_section_aware) for document in documents]
+
+
+def iter_split_documents(
+        documents: Iterable[Document],
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        workers: int = settings.CHUNK_WORKERS,
+        papers_per_task: int = settings.CHUNK_PAPERS_PER_TASK,
+        section_aware: bool = settings.SECTION_AWARE_CHUNKING,
+        length_unit: str = settings.CHUNK_LENGTH_UNIT,
+) -> Iterator[List[Document]]:
+    """
+    逐篇切分文档，并按输入顺序产出每篇文档的文本块列表。
+
+    workers > 1 时，文档被分成每组 papers_per_task 篇的任务，分发到多个工作进程中切分。
+    同时在途的任务数量有上限，因此输入可以是流式生成器，内存占用不会随语料规模增长；
+    结果严格按提交顺序返回，所以输出与串行切分完全一致（顺序确定）。
+
+    Args:
+        documents (Iterable[Document]): 文档的可迭代对象（可以是生成器）。
+        chunk_size (Optional[int]): 文本块大小，单位由 length_unit 决定；None 时使用 settings 中对应单位的配置。
+        chunk_overlap (Optional[int]): 相邻文本块的重叠大小，同上。
+        workers (int): 工作进程数。
+        papers_per_task (int): 每个任务包含的文档数，用于摊薄进程间通信的开销。
+        section_aware (bool): 是否按章节切分（见 `split_document`）。
+        length_unit (str): 长度计量单位，"chars" 或 "tokens"（见 `make_text_splitter`）。
+
+    Yields:
+        List[Document]: 每篇文档对应的文本块列表。
+    """
+    default_size, default_overlap = get_chunk_sizes(length_unit)
+    chunk_size = default_size if chunk_size is None else chunk_size
+    chunk_overlap = default_overlap if chunk_overlap is None else chunk_overlap
+
+    if workers <= 1:
+        text_splitter = make_text_splitter(chunk_size, chunk_overlap, length_unit)
+        for document in documents:
+            yield split_document(text_splitter, document, section_aware)
+        return
+
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_chunk_worker,
+            initargs=(chunk_size, chunk_overlap, length_unit, section_aware)
+    ) as executor:
+        pending = deque()
+        task = []
+        for document in documents:
+            task.append(document)
+            if len(task) < papers_per_task:
+                continue
+            pending.append(executor.submit(_split_in_worker, task))
+            task = []
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        if task:
+            pending.append(executor.submit(_split_in_worker, task))
+        while pending:
+            yield from pending.popleft().result()
+
+
 if __name__ == '__main__':
     # 用于直接测试该模块
     from rag_system.ingestion.document_loader import load_json_documents
@@ -2,20 +2,50 @@ import os
 import shutil
 import argparse
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Set
 
 from tqdm import tqdm
 
 # 从统一的配置文件中导入所有设置
 from rag_system.config import settings
 from rag_system.ingestion.build_vectordb import (
-    load_and_prepare_documents,  # 我们复用之前的函数
-    chunk_documents,
-    get_embedding_function
+    BATCH_SIZE,
+    iter_chunk_batches,  # 我们复用之前的函数
+    get_embedding_function,
+    get_title_join,
+    load_and_prepare_documents,
+    prepare_document
 )
+from rag_system.ingestion.binary_index import update_binary_index
+from rag_system.ingestion.dedup import DEDUP_LINKS_FILENAME, get_deduplicator
+from rag_system.ingestion.dim_reduction import wrap_for_index
+from rag_system.ingestion.document_loader import iter_json_records
+from rag_system.ingestion.embedding import close_embedding_function, report_embedding_stats
+from rag_system.ingestion.index_versions import bump_index_revision, resolve_active_path
+from rag_system.ingestion.paper_index import build_paper_index, update_paper_index
+from rag_system.ingestion.paper_store import PaperStore
+from rag_system.ingestion.retraction import get_retracted_keys
+from rag_system.ingestion.shards import open_vector_store
+from rag_system.ingestion.text_chunker import get_paper_key, is_content_addressed_id, paper_key_from_chunk_id
 
-from langchain_community.vectorstores import Chroma
-from langchain_core.documents import Document
+# 从Chroma中分页读取元数据时每页的条目数
+_PAGE_SIZE = 5000
+
+
+def get_existing_paper_keys(db) -> Set[str]:
+    """
+    返回向量数据库中已入库论文的标识。内容寻址的文本块ID中包含论文标识，只取ID即可；
+    旧版本构建的索引使用随机ID，这些文本块改为从元数据（DOI，缺失时为 local_path）中取论文标识。
+    """
+    chunk_ids = db.get(include=[])["ids"]
+    paper_keys = {paper_key_from_chunk_id(chunk_id) for chunk_id in chunk_ids if is_content_addressed_id(chunk_id)}
+    legacy_ids = [chunk_id for chunk_id in chunk_ids if not is_content_addressed_id(chunk_id)]
+    for i in range(0, len(legacy_ids), _PAGE_SIZE):
+        found = db.get(ids=legacy_ids[i:i + _PAGE_SIZE], include=["metadatas"])
+        paper_keys.update(get_paper_key(metadata or {}) for metadata in found["metadatas"])
+    if legacy_ids:
+        print(f"其中 {len(legacy_ids)} 个文本块由旧版本构建（随机ID），已按元数据识别其论文。")
+    return paper_keys
 
 
 def update_database():
@@ -27,77 +57,208 @@ def update_database():
     os.environ["HF_ENDPOINT"] = "https://hf-mirror.com"
 
     source_path = settings.SOURCE_DATA_PATH
-    db_path = settings.VECTOR_DB_PATH
+    # 增量更新直接写入当前发布的版本目录
+    db_path = resolve_active_path(settings.VECTOR_DB_PATH)
 
-    # --- 1. 加载所有源文档的“预期”状态 ---
-    print(f"--- [Step 1/3] 正在从 {source_path} 加载源文档信息... ---")
+    # --- 1. 检查源文件 ---
+    # 源文件会在第3步中被流式读取，这里不再一次性 json.load 整个文件
+    print(f"--- [Step 1/3] 正在检查源文件 {source_path}... ---")
     if not source_path.exists():
         print(f"错误：源数据文件未找到: {source_path}")
         return
 
-    # 我们这里不直接创建Document对象，而是先加载原始JSON数据
-    with open(source_path, 'r', encoding='utf-8') as f:
-        all_source_papers = json.load(f)
-    print(f"在源文件中找到 {len(all_source_papers)} 篇论文。")
-
     # --- 2. 连接到现有数据库并获取所有已存在的文档ID ---
     print(f"--- [Step 2/3] 正在连接到数据库 {db_path} 并检查现有文档... ---")
     embedding_function = get_embedding_function()  # 需要嵌入函数来连接
+    try:
+        # 连接到现有数据库，如果不存在会自动创建
+        # 降维索引需使用其保存的投影；按年份分片的索引会按每个文本块的年份写入对应分片
+        db = open_vector_store(db_path, wrap_for_index(embedding_function, db_path))
+
+        existing_paper_keys = get_existing_paper_keys(db)
+        print(f"数据库中已存在 {len(existing_paper_keys)} 篇唯一论文。")
+
+        # --- 3. 流式筛选、处理并添加新文档 ---
+        print("--- [Step 3/3] 正在流式筛选并添加新文档... ---")
+        stats = {"papers": 0, "new_papers": 0}
+        # 已撤回的论文即使仍在源文件中也不再加入
+        skipped_paper_keys = existing_paper_keys | get_retracted_keys()
+        # 与完整构建一样使用SQLite中的权威标题，否则写入论文侧表时会用JSON中的标题覆盖它们
+        title_join = get_title_join()
+
+        def iter_new_documents():
+            for paper in iter_json_records(source_path):
+                stats["papers"] += 1
+                document = prepare_document(paper)
+                # 与文本块ID使用同一个论文标识（DOI，缺失时退回到路径）
+                if document is None or get_paper_key(document.metadata) in skipped_paper_keys:
+                    continue
+                stats["new_papers"] += 1
+                yield document if title_join is None else title_join(document)
+
+        # 逐篇切分，并按批次嵌入、写入数据库
+        # 这里只在新论文之间去重；与库中已有文本块的重复要等下一次 --sync 或重建时才会被发现
+        deduplicator = get_deduplicator()
+        if deduplicator is not None:
+            deduplicator.open_links(db_path / DEDUP_LINKS_FILENAME, append=True)
+        paper_store = PaperStore()
+        # 新写入的文本块ID和论文标识，用来增量更新二值索引和论文级索引
+        added_ids = []
+        added_paper_keys = set()
+        try:
+            for batch in tqdm(iter_chunk_batches(iter_new_documents(), deduplicator=deduplicator,
+                                                 paper_store=paper_store),
+                              desc="嵌入并存储新文本块"):
+                batch_ids = [doc.metadata["chunk_id"] for doc in batch]
+                db.add_documents(documents=batch, ids=batch_ids)
+                added_ids.extend(batch_ids)
+                added_paper_keys.update(get_paper_key(doc.metadata) for doc in batch)
+        finally:
+            paper_store.close()
+            if deduplicator is not None:
+                deduplicator.close()
+
+        print(f"在源文件中找到 {stats['papers']} 篇论文。")
+        if not stats["new_papers"]:
+            print("数据库已是最新，无需添加新文档。")
+            return
+
+        # 确保数据持久化
+        db.persist()
+        print(f"\n✅ 数据库更新完成！成功添加了 {stats['new_papers']} 篇新论文（{len(added_ids)} 个文本块）。")
+        if deduplicator is not None:
+            print(deduplicator.format_stats())
+        print(f"数据库当前总条目数: {db._collection.count()}")
+        if settings.BINARY_INDEX_ENABLED:
+            update_binary_index(db, db_path, added_ids, [])
+        if settings.PAPER_INDEX_ENABLED:
+            update_paper_index(db, db_path, added_paper_keys)
+        bump_index_revision(db_path)
+        report_embedding_stats(embedding_function)
+    finally:
+        # 多进程嵌入（EMBEDDING_WORKERS > 1）时关闭工作进程
+        close_embedding_function(embedding_function)
+
+
+def sync_database(dry_run: bool = False):
+    """
+    对向量数据库执行真正的增量同步（delta sync）。
 
-    # 连接到现有数据库，如果不存在会自动创建
-    db = Chroma(
-        persist_directory=str(db_path),
-        embedding_function=embedding_function
-    )
-
-    # 获取数据库中所有条目的元数据，我们只关心 local_path
-    # .get()方法在数据量大时可能较慢，但对于几千篇论文是可行的
-    existing_items = db.get(include=["metadatas"])
-    existing_paths = {meta['local_path'] for meta in existing_items['metadatas'] if 'local_path' in meta}
-    print(f"数据库中已存在 {len(existing_paths)} 篇唯一论文。")
-
-    # --- 3. 筛选、处理并添加新文档 ---
-    print("--- [Step 3/3] 正在筛选并添加新文档... ---")
-    new_papers_to_add = []
-    for paper in all_source_papers:
-        # 使用 local_path 作为唯一标识符
-        if paper.get('local_path') not in existing_paths:
-            new_papers_to_add.append(paper)
-
-    if not new_papers_to_add:
-        print("数据库已是最新，无需添加新文档。")
+    源文件中的每个文本块都有一个由 DOI、start_index 和文本哈希组成的确定性ID，
+    因此只需比较“源文件应有的ID集合”与“数据库现有的ID集合”：
+    - 源中有、库中无的块：新增或内容已变化，需要嵌入并写入；
+    - 库中有、源中无的块：论文已删除或内容已变化，需要从库中删除；
+    - 两边都有的块：保持不变，不做任何嵌入。
+
+    “源文件应有的ID集合”也包括投递目录注入的论文（见 watch_log.iter_source_records），它们不会被同步删除。
+
+    注意：由旧版本构建（随机ID）的条目在第一次同步时会被全部替换为内容寻址的条目。
+
+    Args:
+        dry_run (bool): 为True时只统计差异，不写入也不删除。
+    """
+    os.environ["HF_ENDPOINT"] = "https://hf-mirror.com"
+
+    source_path = settings.SOURCE_DATA_PATH
+    # 增量更新直接写入当前发布的版本目录
+    db_path = resolve_active_path(settings.VECTOR_DB_PATH)
+
+    print(f"--- [Step 1/4] 正在检查源文件 {source_path}... ---")
+    if not source_path.exists():
+        print(f"错误：源数据文件未找到: {source_path}")
         return
 
-    print(f"发现 {len(new_papers_to_add)} 篇新论文，准备进行处理...")
+    print(f"--- [Step 2/4] 正在连接到数据库 {db_path} 并读取现有文本块ID... ---")
+    embedding_function = get_embedding_function()
+    try:
+        # 降维索引需使用其保存的投影；按年份分片的索引会按每个文本块的年份写入对应分片
+        db = open_vector_store(db_path, wrap_for_index(embedding_function, db_path))
+        # 只取ID，不取文档和元数据，数据量大时也很轻量
+        existing_ids = set(db.get(include=[])["ids"])
+        print(f"数据库中已存在 {len(existing_ids)} 个文本块。")
 
-    # 将筛选出的新论文数据转换为LangChain Document对象
-    new_documents = []
-    for paper in tqdm(new_papers_to_add, desc="准备新文档"):
-        page_content = paper.get("llm_ready_fulltext_cleaned", "")
-        if not page_content: continue
-        metadata = {k: v for k, v in paper.items() if k != "llm_ready_fulltext_cleaned"}
-        new_documents.append(Document(page_content=page_content, metadata=metadata))
+        print("--- [Step 3/4] 正在流式切分源文档并写入新增/变化的文本块... ---")
+        # 与完整构建使用同样的去重规则，源文件应有的ID集合才与重建结果一致；重复块也因此不会进入库中
+        deduplicator = get_deduplicator()
+        if deduplicator is not None and not dry_run:
+            deduplicator.open_links(db_path / DEDUP_LINKS_FILENAME)
+        # 论文级字段写入侧表，文本块只带精简的元数据；dry run 时不写侧表
+        paper_store = None if dry_run else PaperStore()
+        desired_ids = set()
+        touched_paper_keys = set()
+        added_ids = []
+        try:
+            documents = load_and_prepare_documents(source_path, settings.WATCH_LOG_PATH)
+            # 与完整构建一样使用SQLite中的权威标题，否则写入论文侧表时会用JSON中的标题覆盖它们
+            title_join = get_title_join()
+            if title_join is not None:
+                documents = map(title_join, documents)
+            for batch in tqdm(iter_chunk_batches(documents, deduplicator=deduplicator, paper_store=paper_store),
+                              desc="同步文本块"):
+                desired_ids.update(doc.metadata["chunk_id"] for doc in batch)
+                new_docs = [doc for doc in batch if doc.metadata["chunk_id"] not in existing_ids]
+                if not new_docs:
+                    continue
+                touched_paper_keys.update(get_paper_key(doc.metadata) for doc in new_docs)
+                added_ids.extend(doc.metadata["chunk_id"] for doc in new_docs)
+                if not dry_run:
+                    db.add_documents(documents=new_docs, ids=[doc.metadata["chunk_id"] for doc in new_docs])
+        finally:
+            if paper_store is not None:
+                paper_store.close()
+            if deduplicator is not None:
+                deduplicator.close()
 
-    # 对新文档进行切分
-    chunked_new_docs = chunk_documents(new_documents)
+        print("--- [Step 4/4] 正在删除已移除/已变化的旧文本块... ---")
+        removed_ids = sorted(existing_ids - desired_ids)
+        if not dry_run:
+            for i in tqdm(range(0, len(removed_ids), BATCH_SIZE), desc="删除旧文本块"):
+                db.delete(ids=removed_ids[i:i + BATCH_SIZE])
 
-    # 将切分好的新文档块添加到数据库
-    if chunked_new_docs:
-        print(f"正在将 {len(chunked_new_docs)} 个新文本块添加到数据库...")
-        # 定义批处理大小以显示进度
-        batch_size = 128
-        batches = [chunked_new_docs[i:i + batch_size] for i in range(0, len(chunked_new_docs), batch_size)]
+        existing_paper_keys = {paper_key_from_chunk_id(chunk_id) for chunk_id in existing_ids}
+        desired_paper_keys = {paper_key_from_chunk_id(chunk_id) for chunk_id in desired_ids}
+        removed_paper_keys = {paper_key_from_chunk_id(chunk_id) for chunk_id in removed_ids}
+        added_papers = touched_paper_keys - existing_paper_keys
+        changed_papers = (touched_paper_keys & existing_paper_keys) | (removed_paper_keys & desired_paper_keys)
+        removed_papers = removed_paper_keys - desired_paper_keys
 
-        for batch in tqdm(batches, desc="嵌入并存储新文本块"):
-            db.add_documents(documents=batch)
+        prefix = "[Dry run] " if dry_run else ""
+        print(f"\n✅ {prefix}同步完成！")
+        print(f"   论文: 新增 {len(added_papers)} 篇，变化 {len(changed_papers)} 篇，删除 {len(removed_papers)} 篇。")
+        print(f"   文本块: 嵌入 {len(added_ids)} 个，删除 {len(removed_ids)} 个，"
+              f"未变化 {len(existing_ids & desired_ids)} 个。")
+        if deduplicator is not None:
+            print(f"   {deduplicator.format_stats()}")
+        if not dry_run:
+            print(f"数据库当前总条目数: {db._collection.count()}")
+            if settings.BINARY_INDEX_ENABLED and (added_ids or removed_ids):
+                update_binary_index(db, db_path, added_ids, removed_ids)
+            if settings.PAPER_INDEX_ENABLED and (added_ids or removed_ids):
+                if all(is_content_addressed_id(chunk_id) for chunk_id in removed_ids):
+                    update_paper_index(db, db_path, touched_paper_keys | removed_paper_keys)
+                else:
+                    # 旧版本构建的随机ID无法对应到论文，第一次同步时整库替换，直接重建论文级索引
+                    build_paper_index(db, db_path)
+            if added_ids or removed_ids:
+                bump_index_revision(db_path)
+        report_embedding_stats(embedding_function)
+    finally:
+        # 多进程嵌入（EMBEDDING_WORKERS > 1）时关闭工作进程
+        close_embedding_function(embedding_function)
 
-    # 确保数据持久化
-    db.persist()
-    print(f"\n✅ 数据库更新完成！成功添加了 {len(new_papers_to_add)} 篇新论文。")
-    print(f"数据库当前总条目数: {db._collection.count()}")
 
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="增量更新Chroma向量数据库。")
+    parser.add_argument("--sync", action="store_true",
+                        help="执行完整的增量同步：新增、重新嵌入变化的论文，并删除已移除的论文。")
+    parser.add_argument("--dry-run", action="store_true", help="与 --sync 一起使用，只统计差异，不修改数据库。")
+    args = parser.parse_args(argv)
+
+    if args.sync:
+        sync_database(dry_run=args.dry_run)
+    else:
+        update_database()
 
-if __name__ == "__main__":
-    import json
 
-    update_database()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
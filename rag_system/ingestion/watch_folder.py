@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag_system.config import settings
+from rag_system.ingestion.binary_index import update_binary_index
+from rag_system.ingestion.build_vectordb import (
+    get_embedding_function,
+    get_title_join,
+    iter_chunk_batches,
+    prepare_document
+)
+from rag_system.ingestion.dedup import DEDUP_LINKS_FILENAME, get_deduplicator, readmit_linked_duplicates
+from rag_system.ingestion.dim_reduction import wrap_for_index
+from rag_system.ingestion.embedding import close_embedding_function
+from rag_system.ingestion.index_versions import bump_index_revision, resolve_active_path
+from rag_system.ingestion.paper_index import paper_key_filter, update_paper_index
+from rag_system.ingestion.paper_store import PaperStore
+from rag_system.ingestion.retraction import get_retracted_keys
+from rag_system.ingestion.shards import open_vector_store
+from rag_system.ingestion.text_chunker import get_paper_key, paper_key_from_chunk_id
+from rag_system.ingestion.watch_log import append_watch_records
+
+# 投递目录下的子目录：处理成功和失败的文件分别移入其中，便于核对和重新投递
+PROCESSED_DIRNAME = "processed"
+FAILED_DIRNAME = "failed"
+
+
+class IngestionCounters:
+    """
+    持续注入的计数器：处理量、吞吐量，以及论文从投递到可被检索的延迟（lag）。
+
+    延迟以文件的修改时间为到达时间，以其所在批次写入完成的时间为可检索时间。
+    """
+
+    def __init__(self, lag_window: int = 1000):
+        self.started = time.time()
+        self.batches = 0
+        self.files = 0
+        self.failed_files = 0
+        self.papers = 0
+        self.structured_records = 0
+        self.chunks_written = 0
+        self.chunks_unchanged = 0
+        self.chunks_removed = 0
+        self.busy_seconds = 0.0
+        self.pending_files = 0
+        self.oldest_pending_seconds = 0.0
+        self.last_batch: Optional[Dict[str, Any]] = None
+        self._lags = deque(maxlen=lag_window)
+
+    def record_batch(self, files: int, failed: int, papers: int, records: int, written: int, unchanged: int,
+                     removed: int, seconds: float, lags: List[float]):
+        self.batches += 1
+        self.files += files
+        self.failed_files += failed
+        self.papers += papers
+        self.structured_records += records
+        self.chunks_written += written
+        self.chunks_unchanged += unchanged
+        self.chunks_removed += removed
+        self.busy_seconds += seconds
+        self._lags.extend(lags)
+        self.last_batch = {
+            "finished": time.time(), "files": files, "failed": failed, "papers": papers, "chunks_written": written,
+            "seconds": round(seconds, 2), "chunks_per_second": round(written / seconds, 1) if seconds else 0.0,
+            "max_lag_seconds": round(max(lags), 1) if lags else None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        lags = np.asarray(self._lags) if self._lags else None
+        return {
+            "updated": time.time(),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "batches": self.batches,
+            "files": self.files,
+            "failed_files": self.failed_files,
+            "papers": self.papers,
+            "structured_records": self.structured_records,
+            "chunks_written": self.chunks_written,
+            "chunks_unchanged": self.chunks_unchanged,
+            "chunks_removed": self.chunks_removed,
+            "chunks_per_busy_second": round(self.chunks_written / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            "pending_files": self.pending_files,
+            "oldest_pending_seconds": round(self.oldest_pending_seconds, 1),
+            "lag_p50_seconds": round(float(np.percentile(lags, 50)), 1) if lags is not None else None,
+            "lag_p95_seconds": round(float(np.percentile(lags, 95)), 1) if lags is not None else None,
+            "last_batch": self.last_batch,
+        }
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def format_stats(self) -> str:
+        stats = self.to_dict()
+        return (
+            f"Watch folder: {stats['papers']} papers / {stats['chunks_written']} chunks in {stats['batches']} batches, "
+            f"{stats['chunks_per_busy_second']} chunks/s, lag p50 {stats['lag_p50_seconds']}s "
+            f"p95 {stats['lag_p95_seconds']}s, {stats['pending_files']} files pending, "
+            f"{stats['failed_files']} failed"
+        )
+
+
+class WatchFolderIngestor:
+    """
+    投递目录持续注入服务。
+
+    轮询投递目录中的单篇论文JSON文件（一个对象或一个对象数组），把最早到达的文件等待
+    settings.WATCH_BATCH_WINDOW_SECONDS 秒（或攒够 WATCH_MAX_BATCH_FILES 个文件）后，
+    连同期间到达的文件作为一个批次处理：
+    - 带全文（llm_ready_fulltext_cleaned）的论文记录：切分、嵌入并增量写入当前版本的向量数据库，
+      论文级字段写入论文侧表；重新投递的论文会替换其旧文本块，内容未变的文本块不会重新嵌入。
+      论文记录同时追加到注入日志（settings.WATCH_LOG_PATH），之后的 --sync 和完整重建会保留这些论文；
+    - 结构化抽取记录（meta_source_paper + extracted_material_data）：写入 json_to_sqlite 使用的材料数据表。
+
+    嵌入模型只在启动时加载一次；每个批次都重新解析 CURRENT 指针，因此完整重建发布新版本后会自动写入新版本。
+    """
+
+    def __init__(self, drop_dir: Path = settings.WATCH_DROP_DIR, db_path: Path = settings.VECTOR_DB_PATH,
+                 status_path: Path = settings.WATCH_STATUS_PATH, log_path: Path = settings.WATCH_LOG_PATH):
+        self.drop_dir = Path(drop_dir)
+        self.db_path = Path(db_path)
+        self.status_path = Path(status_path)
+        self.log_path = Path(log_path)
+        for directory in (self.drop_dir, self.drop_dir / PROCESSED_DIRNAME, self.drop_dir / FAILED_DIRNAME):
+            directory.mkdir(parents=True, exist_ok=True)
+        self.embedding_function = get_embedding_function()
+        self.paper_store = PaperStore()
+        self.counters = IngestionCounters()
+        self._sqlite_conn = None
+
+    # --- 轮询 ---
+
+    def scan(self) -> List[Tuple[Path, float]]:
+        """返回已写入完成的待处理文件及其到达时间，按到达时间排序。"""
+        now = time.time()
+        files = []
+        for path in self.drop_dir.glob("*.json"):
+            if path.name.startswith((".", "_")):
+                continue
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if now - mtime >= settings.WATCH_SETTLE_SECONDS:
+                files.append((path, mtime))
+        return sorted(files, key=lambda item: item[1])
+
+    def poll(self) -> bool:
+        """检查一次投递目录，批次窗口已到或文件数已满时处理一个批次。返回是否处理了批次。"""
+        pending = self.scan()
+        self.counters.pending_files = len(pending)
+        self.counters.oldest_pending_seconds = time.time() - pending[0][1] if pending else 0.0
+        if not pending:
+            return False
+        if (self.counters.oldest_pending_seconds < settings.WATCH_BATCH_WINDOW_SECONDS
+                and len(pending) < settings.WATCH_MAX_BATCH_FILES):
+            return False
+        self.ingest(pending[:settings.WATCH_MAX_BATCH_FILES])
+        return True
+
+    def run_forever(self):
+        print(f"--- Watching {self.drop_dir} (poll every {settings.WATCH_POLL_SECONDS}s, "
+              f"batch window {settings.WATCH_BATCH_WINDOW_SECONDS}s) ---")
+        try:
+            while True:
+                if not self.poll():
+                    self.counters.save(self.status_path)
+                    time.sleep(settings.WATCH_POLL_SECONDS)
+        except KeyboardInterrupt:
+            print("\n--- Watch folder stopped ---")
+        finally:
+            self.close()
+
+    # --- 批次处理 ---
+
+    def ingest(self, files: List[Tuple[Path, float]]):
+        start = time.perf_counter()
+        papers, structured, arrivals, parsed, failed = [], [], [], [], []
+        for path, mtime in files:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"❌ 无法读取 {path.name}: {e}")
+                failed.append(path)
+                continue
+            for record in data if isinstance(data, list) else [data]:
+                if not isinstance(record, dict):
+                    continue
+                if "meta_source_paper" in record:
+                    structured.append(record)
+                    continue
+                document = prepare_document(record)
+                if document is not None:
+                    papers.append((record, document))
+            parsed.append(path)
+            arrivals.append(mtime)
+
+        # 已撤回的论文不再注入，需先用 retraction reinstate 删除其墓碑
+        retracted = get_retracted_keys()
+        papers = [(record, doc) for record, doc in papers if get_paper_key(doc.metadata) not in retracted]
+        documents = [doc for _, doc in papers]
+        written = unchanged = removed = 0
+        try:
+            if documents:
+                written, unchanged, removed = self._ingest_documents(documents)
+                # 写入向量数据库之后再记入注入日志；两步之间中断时文件仍留在投递目录中，重启后会重新投递
+                append_watch_records([record for record, _ in papers], self.log_path)
+            if structured:
+                self._ingest_structured(structured)
+        except Exception as e:
+            print(f"❌ 批次处理失败，{len(parsed)} 个文件已移入 {FAILED_DIRNAME}/: {e}")
+            failed.extend(parsed)
+            parsed = []
+
+        for path in parsed:
+            shutil.move(str(path), str(self.drop_dir / PROCESSED_DIRNAME / path.name))
+        for path in failed:
+            shutil.move(str(path), str(self.drop_dir / FAILED_DIRNAME / path.name))
+
+        finished = time.time()
+        self.counters.record_batch(
+            files=len(files), failed=len(failed), papers=len(documents) if parsed else 0,
+            records=len(structured) if parsed else 0, written=written, unchanged=unchanged, removed=removed,
+            seconds=time.perf_counter() - start, lags=[finished - mtime for mtime in arrivals] if parsed else []
+        )
+        self.counters.pending_files = max(self.counters.pending_files - len(files), 0)
+        if not self.counters.pending_files:
+            self.counters.oldest_pending_seconds = 0.0
+        self.counters.save(self.status_path)
+        print(f"✅ {self.counters.format_stats()}")
+
+    def _ingest_documents(self, documents: List[Document]) -> Tuple[int, int, int]:
+        """切分、嵌入并写入一批论文，返回 (新写入, 未变化, 删除) 的文本块数。"""
+        db_path = resolve_active_path(self.db_path)
+        # 降维索引需使用其保存的投影；按年份分片的索引会按每个文本块的年份写入对应分片
+        db = open_vector_store(db_path, wrap_for_index(self.embedding_function, db_path))
+
+        # 同一批次中重复投递的论文只保留最后一份
+        documents = list({get_paper_key(doc.metadata): doc for doc in documents}.values())
+        # 与完整构建一样使用SQLite中的权威标题（只读取本批论文的标题），否则写入论文侧表时会用JSON中的标题覆盖它们
+        title_join = get_title_join(dois=[doc.metadata["doi"] for doc in documents])
+        if title_join is not None:
+            documents = [title_join(doc) for doc in documents]
+        paper_keys = [get_paper_key(doc.metadata) for doc in documents]
+        # 旧版本构建的文本块没有 paper_key，按 doi / local_path 匹配；它们的随机ID会作为旧文本块被替换
+        existing_ids = set(db.get(where=paper_key_filter(paper_keys), include=[])["ids"])
+
+        # 这里只在本批次的新论文之间去重；与库中已有文本块的重复要等下一次 --sync 或重建时才会被发现
+        deduplicator = get_deduplicator()
+        if deduplicator is not None:
+            deduplicator.open_links(db_path / DEDUP_LINKS_FILENAME, append=True)
+        desired_ids = set()
+        written_ids = []
+        try:
+            for batch in iter_chunk_batches(documents, workers=1, deduplicator=deduplicator,
+                                            paper_store=self.paper_store):
+                desired_ids.update(doc.metadata["chunk_id"] for doc in batch)
+                new_docs = [doc for doc in batch if doc.metadata["chunk_id"] not in existing_ids]
+                if new_docs:
+                    db.add_documents(documents=new_docs, ids=[doc.metadata["chunk_id"] for doc in new_docs])
+                    written_ids.extend(doc.metadata["chunk_id"] for doc in new_docs)
+        finally:
+            if deduplicator is not None:
+                deduplicator.close()
+
+        # 重新投递的论文：删除其旧版本中已不存在的文本块
+        stale_ids = sorted(existing_ids - desired_ids)
+        readmitted_ids = []
+        if stale_ids:
+            # 其他论文中链接到这些旧文本块的重复块先写回；本批论文自己的旧重复块已被新的切分结果取代
+            readmitted_ids = readmit_linked_duplicates(db, db_path, stale_ids, set(paper_keys))
+            db.delete(ids=stale_ids)
+        # 二值索引和论文级索引只更新本批次涉及的文本块和论文
+        if settings.BINARY_INDEX_ENABLED and (written_ids or stale_ids):
+            update_binary_index(db, db_path, written_ids + readmitted_ids, stale_ids)
+        if settings.PAPER_INDEX_ENABLED and (written_ids or stale_ids):
+            update_paper_index(db, db_path,
+                               set(paper_keys) | {paper_key_from_chunk_id(chunk_id) for chunk_id in readmitted_ids})
+        if written_ids or stale_ids:
+            bump_index_revision(db_path)
+        return len(written_ids), len(existing_ids & desired_ids), len(stale_ids)
+
+    def _ingest_structured(self, records: List[Dict[str, Any]]):
+        # 与 create_database/json_to_sqlite.py 使用同一套表结构和写入逻辑
+        from create_database.json_to_sqlite import create_connection, create_tables, insert_structured_data
+
+        if self._sqlite_conn is None:
+            self._sqlite_conn = create_connection(str(settings.SQLITE_DB_PATH))
+            if self._sqlite_conn is None:
+                raise RuntimeError(f"无法连接到SQLite数据库: {settings.SQLITE_DB_PATH}")
+            create_tables(self._sqlite_conn)
+        insert_structured_data(self._sqlite_conn, records)
+
+    def close(self):
+        self.paper_store.close()
+        close_embedding_function(self.embedding_function)
+        if self._sqlite_conn is not None:
+            self._sqlite_conn.close()
+        self.counters.save(self.status_path)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="持续监视投递目录，把新到达的论文增量写入向量数据库和SQLite。")
+    parser.add_argument("--drop-dir", default=str(settings.WATCH_DROP_DIR), help="投递目录")
+    parser.add_argument("--once", action="store_true", help="立即处理目录中现有的文件后退出，不等待批次窗口")
+    args = parser.parse_args(argv)
+
+    ingestor = WatchFolderIngestor(drop_dir=Path(args.drop_dir))
+    if args.once:
+        pending = ingestor.scan()
+        for i in range(0, len(pending), settings.WATCH_MAX_BATCH_FILES):
+            ingestor.ingest(pending[i:i + settings.WATCH_MAX_BATCH_FILES])
+        ingestor.close()
+    else:
+        ingestor.run_forever()
+
+
+if __name__ == "__main__":
+    main()
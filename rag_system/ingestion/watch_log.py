@@ -0,0 +1,68 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+from rag_system.config import settings
+from rag_system.ingestion.document_loader import iter_json_records
+from rag_system.ingestion.text_chunker import get_paper_key
+
+
+def append_watch_records(records: Iterable[Dict[str, Any]], log_path: Path = settings.WATCH_LOG_PATH):
+    """
+    把投递目录注入的论文记录追加到注入日志（每行一条JSON，带论文标识和注入时间），写入后立即落盘。
+    注入日志与 SOURCE_DATA_PATH 一起构成构建和 --sync 读取的语料（见 iter_source_records）。
+    """
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    ingested_at = time.time()
+    with open(log_path, "a", encoding="utf-8") as f:
+        for record in records:
+            entry = {"paper_key": get_paper_key(record), "ingested_at": ingested_at, "record": record}
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _iter_log(log_path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    if not log_path.exists():
+        return
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError:
+                # 追加最后一行时进程被杀死，留下不完整的行
+                continue
+
+
+def iter_source_records(source_path: Path, log_path: Path = settings.WATCH_LOG_PATH) -> Iterator[Any]:
+    """
+    依次产出源文件和注入日志中的论文记录。构建和 --sync 都通过它读取语料，投递注入的论文因此不会被同步删除，
+    重建时也不会丢失。
+
+    注入日志中同一篇论文只取最后一次投递。注入时间晚于源文件修改时间的投递覆盖源文件中的同一篇论文；
+    更早的投递说明源文件之后重新生成过，只在源文件中没有这篇论文时才使用。
+    先扫描一遍注入日志，只记录每篇论文最后一次投递的位置，内存与投递的论文数成正比，与语料规模无关。
+    """
+    log_path = Path(log_path)
+    latest: Dict[str, Tuple[int, float]] = {}
+    for line_no, entry in _iter_log(log_path):
+        latest[entry["paper_key"]] = (line_no, entry["ingested_at"])
+    source_mtime = Path(source_path).stat().st_mtime
+    overriding = {key for key, (_, ingested_at) in latest.items() if ingested_at > source_mtime}
+
+    in_source = set()
+    for record in iter_json_records(source_path):
+        key = get_paper_key(record) if isinstance(record, dict) else None
+        if key in latest:
+            if key in overriding:
+                continue
+            in_source.add(key)
+        yield record
+
+    for line_no, entry in _iter_log(log_path):
+        key = entry["paper_key"]
+        if latest[key][0] == line_no and key not in in_source:
+            yield entry["record"]
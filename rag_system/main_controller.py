@@ -10,8 +10,8 @@ from rag_system.planner.planner import Planner
 from rag_system.executor.executor import Executor
 from rag_system.reflector.reflector import Reflector
 from rag_system.decider.decider import Decider
+from rag_system.resources import get_shared_llm
 
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
@@ -45,7 +45,7 @@ class MainController:
         self.decider = Decider()  # <-- 实例化我们基于规则的Decider
         self.max_loops = max_loops
 
-        self.llm = ChatOllama(model=settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
+        self.llm = get_shared_llm(settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
         router_prompt = PromptTemplate.from_template(ROUTER_PROMPT_TEMPLATE)
         self.router_chain = router_prompt | self.llm | StrOutputParser()
         chat_prompt = PromptTemplate.from_template(
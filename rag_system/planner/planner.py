@@ -3,7 +3,6 @@
 import json
 import re
 from typing import List
-from langchain_community.chat_models import ChatOllama
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.messages import BaseMessage
@@ -12,6 +11,7 @@ from langchain_core.tools import BaseTool
 from rag_system.graph_state import GraphState, Plan, Step, Reflection
 from rag_system.config import settings
 from rag_system.planner.prompt import PROMPT_TEMPLATE
+from rag_system.resources import get_shared_llm
 
 
 def _format_tools_description(tools: List[BaseTool]) -> str:
@@ -38,7 +38,7 @@ def _format_tools_description(tools: List[BaseTool]) -> str:
 
 class Planner:
     def __init__(self, tools: List[BaseTool]):
-        self.llm = ChatOllama(model=settings.LOCAL_LLM_MODEL_NAME, temperature=0.0)
+        self.llm = get_shared_llm(settings.LOCAL_LLM_MODEL_NAME, temperature=0.0)
         self.output_parser = PydanticOutputParser(pydantic_object=Plan)
 
         # 🚀 [关键修复] 增加 query 和 context 两个输入变量
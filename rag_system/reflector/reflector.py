@@ -4,13 +4,13 @@ import json
 import re
 from pydantic import BaseModel, Field
 
-from langchain_community.chat_models import ChatOllama
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 
 from rag_system.graph_state import GraphState, Step, Reflection, Plan
 from rag_system.config import settings
 from rag_system.reflector.prompt import PROMPT_TEMPLATE
+from rag_system.resources import get_shared_llm
 
 
 class ReflectionOutput(BaseModel):
@@ -23,7 +23,7 @@ class ReflectionOutput(BaseModel):
 
 class Reflector:
     def __init__(self):
-        self.llm = ChatOllama(model=settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
+        self.llm = get_shared_llm(settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
         self.output_parser = PydanticOutputParser(pydantic_object=ReflectionOutput)
 
         # ================== [ 关 键 修 复 ] ==================
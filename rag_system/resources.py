@@ -0,0 +1,140 @@
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from rag_system.config import settings
+from rag_system.ingestion.pipeline import get_rss_bytes
+
+
+class ResourceRegistry:
+    """
+    进程内共享资源注册表：嵌入模型、向量数据库句柄、LLM客户端等按键懒加载，每个键在进程中只创建一次。
+
+    检索引擎、Agent工具、规划器、反思器和诊断脚本在同一进程中运行时，通过这里拿到的是同一个实例，
+    不会重复加载1GB以上的嵌入模型，也不会重复预热。创建过程持有一把可重入锁，多个线程同时请求
+    同一资源时只有一个线程真正创建；已创建的资源直接返回，不加锁。
+
+    每个资源记录创建耗时和创建前后的进程RSS增量。资源的创建过程中又创建了其他资源时
+    （例如向量数据库句柄需要嵌入模型），内层资源的内存只计入内层，不重复计入外层。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources: Dict[Hashable, Any] = {}
+        self._info: Dict[Hashable, Dict[str, Any]] = {}
+        # 正在创建的资源的嵌套栈，每项记录其内层资源已占用的内存
+        self._loading: List[Dict[str, int]] = []
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        resource = self._resources.get(key)
+        if resource is not None:
+            return resource
+        with self._lock:
+            if key in self._resources:
+                return self._resources[key]
+            frame = {"child_bytes": 0}
+            self._loading.append(frame)
+            rss_before = get_rss_bytes()
+            start = time.perf_counter()
+            try:
+                resource = factory()
+            finally:
+                self._loading.pop()
+            seconds = time.perf_counter() - start
+            delta = max(get_rss_bytes() - rss_before, 0)
+            if self._loading:
+                self._loading[-1]["child_bytes"] += delta
+            self._resources[key] = resource
+            self._info[key] = {
+                "seconds": seconds,
+                "bytes": max(delta - frame["child_bytes"], 0),
+                "loaded_at": time.time(),
+            }
+            return resource
+
+    def loaded(self) -> List[Tuple[Hashable, Dict[str, Any]]]:
+        """已创建的资源及其创建耗时、内存增量，按创建顺序排列。"""
+        return list(self._info.items())
+
+    def clear(self):
+        """丢弃所有资源的引用（主要用于测试），之后的请求会重新创建。"""
+        with self._lock:
+            for resource in self._resources.values():
+                if hasattr(resource, "close"):
+                    resource.close()
+            self._resources.clear()
+            self._info.clear()
+
+    def format_report(self) -> str:
+        lines = [f"Shared resources: {len(self._info)} loaded, process RSS {get_rss_bytes() / 1024 ** 2:.0f} MB"]
+        for key, info in self._info.items():
+            kind, *details = key
+            lines.append(f"  {kind:<10} {' '.join(str(detail) for detail in details):<60} "
+                         f"{info['bytes'] / 1024 ** 2:>8.0f} MB {info['seconds']:>7.1f}s")
+            # 例如查询向量缓存的命中统计
+            if hasattr(self._resources[key], "format_stats"):
+                lines.append(f"    {self._resources[key].format_stats()}")
+        return "\n".join(lines)
+
+
+_registry = ResourceRegistry()
+
+
+def get_registry() -> ResourceRegistry:
+    return _registry
+
+
+def get_shared_embedding_function(backend: str = settings.EMBEDDING_BACKEND,
+                                  model_name: str = settings.EMBEDDING_MODEL_NAME) -> Embeddings:
+    """
+    查询阶段共享的嵌入函数。查询只会调用 embed_query，不需要持久化嵌入缓存，
+    但会套上查询向量的内存LRU缓存（settings.QUERY_EMBEDDING_CACHE_SIZE 为0时不套）。
+    构建和增量更新仍各自创建带缓存（或多进程）的嵌入函数，不经过这里。
+    """
+    from rag_system.ingestion.embedding import get_embedding_function
+    from rag_system.ingestion.embedding_cache import QueryEmbeddingCache
+
+    def create():
+        embeddings = get_embedding_function(use_cache=False, backend=backend, model_name=model_name)
+        if settings.QUERY_EMBEDDING_CACHE_SIZE > 0:
+            embeddings = QueryEmbeddingCache(embeddings)
+        return embeddings
+
+    return _registry.get_or_create(("embedding", model_name, backend), create)
+
+
+def get_shared_vector_store(db_path: Path = settings.VECTOR_DB_PATH, mode: str = settings.RETRIEVAL_MODE):
+    """
+    每个向量数据库路径（和检索模式）共享一个跟随 CURRENT 指针的 LiveVectorStore，
+    重建或更新发布新版本后自动切换，使用方无需重新获取。
+    settings.RETRIEVAL_CACHE_ENABLED 为True时，检索结果按索引修订缓存。
+    """
+    from rag_system.retrieval.live_store import LiveVectorStore
+    from rag_system.retrieval.result_cache import RetrievalResultCache
+
+    def create():
+        result_cache = RetrievalResultCache() if settings.RETRIEVAL_CACHE_ENABLED else None
+        store = LiveVectorStore(db_path, get_shared_embedding_function(), mode=mode, result_cache=result_cache)
+        store.current()  # 立即打开当前版本，路径或模型不匹配时在这里就报错
+        return store
+
+    return _registry.get_or_create(("vector_db", str(Path(db_path).resolve()), mode), create)
+
+
+def get_shared_llm(model_name: str = settings.LOCAL_LLM_MODEL_NAME, temperature: Optional[float] = None):
+    """按 (模型名称, temperature) 共享的 ChatOllama 客户端；temperature 为None时使用模型的默认值。"""
+    from langchain_ollama import ChatOllama
+
+    def create():
+        if temperature is None:
+            return ChatOllama(model=model_name)
+        return ChatOllama(model=model_name, temperature=temperature)
+
+    return _registry.get_or_create(("llm", model_name, temperature), create)
+
+
+def format_resource_report() -> str:
+    return _registry.format_report()
@@ -0,0 +1,163 @@
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from rag_system.config import settings
+from rag_system.ingestion.binary_index import BINARY_INDEX_FILENAME, BinaryIndex
+from rag_system.ingestion.dim_reduction import wrap_for_index
+from rag_system.ingestion.index_versions import get_active_version, get_index_revision, resolve_active_path
+from rag_system.ingestion.paper_index import PAPER_INDEX_FILENAME, PaperIndex
+from rag_system.ingestion.shards import open_vector_store
+from rag_system.retrieval.result_cache import RetrievalResultCache, make_cache_key
+from rag_system.retrieval.section_rerank import section_weighted_search
+
+
+class LiveVectorStore:
+    """
+    跟随 CURRENT 指针自动切换版本的Chroma只读句柄。
+
+    每次取用时读取一次指针文件（只有几十字节），发现构建脚本发布了新版本后，
+    就在新版本目录上重新打开Chroma；正在进行中的查询仍使用旧句柄完成。
+    因此重建向量数据库时检索服务无需重启，也不会读到构建到一半的数据。
+
+    mode="binary" 时，相似度检索先用版本目录中的二值索引粗筛、再精确重排（见 BinaryIndex）；
+    二值索引不存在或检索带有元数据过滤条件时，退回到Chroma自身的检索。
+
+    mode="paper" 时为两阶段检索：先用论文级索引选出最相关的若干篇论文，再只在它们的文本块中精确检索
+    （见 PaperIndex），元数据过滤条件同时作用于两个阶段；论文级索引不存在时退回到Chroma自身的检索。
+
+    传入 result_cache 时，相似度检索的结果按 (查询, k, 过滤条件, 索引修订) 缓存，
+    发布新版本或增量更新修改了当前版本后，旧结果自动失效（见 RetrievalResultCache）。
+    """
+
+    # 各模式使用的附加索引：(文件名, 加载类)
+    _SIDE_INDEXES = {
+        "binary": (BINARY_INDEX_FILENAME, BinaryIndex),
+        "paper": (PAPER_INDEX_FILENAME, PaperIndex),
+    }
+
+    def __init__(self, db_path: Path, embedding_function: Embeddings, mode: str = settings.RETRIEVAL_MODE,
+                 result_cache: Optional[RetrievalResultCache] = None):
+        if mode not in ("chroma", "binary", "paper"):
+            raise ValueError(f"未知的检索模式: {mode}，可选值为 chroma / binary / paper")
+        self.db_path = Path(db_path)
+        self.embedding_function = embedding_function
+        self.mode = mode
+        self.result_cache = result_cache
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._store: Optional[Chroma] = None
+        self._side_index: Optional[Union[BinaryIndex, PaperIndex]] = None
+        self._side_mtime: Optional[float] = None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    def current(self) -> Chroma:
+        """返回当前发布版本的Chroma实例，必要时重新打开。"""
+        return self._snapshot()[0]
+
+    def _snapshot(self) -> Tuple[Chroma, Optional[Union[BinaryIndex, PaperIndex]]]:
+        version = get_active_version(self.db_path)
+        with self._lock:
+            if self._store is None or version != self._version:
+                path = resolve_active_path(self.db_path)
+                # 降维索引的版本目录中保存着投影，查询向量需经过同样的投影；
+                # 按年份分片的索引返回 ShardedChroma，带年份过滤的检索只查询相交的分片
+                self._store = open_vector_store(path, wrap_for_index(self.embedding_function, path))
+                if self._version is not None:
+                    print(f"--- 向量数据库已切换到新版本 {version} ---")
+                self._version = version
+                self._side_mtime = None
+            if self.mode in self._SIDE_INDEXES:
+                self._refresh_side_index()
+            return self._store, self._side_index
+
+    def _refresh_side_index(self):
+        # 增量更新会在同一版本目录中重写二值索引和论文级索引，因此除了版本号还要比较文件的修改时间
+        filename, index_class = self._SIDE_INDEXES[self.mode]
+        path = resolve_active_path(self.db_path) / filename
+        mtime = path.stat().st_mtime if path.exists() else None
+        if mtime != self._side_mtime:
+            self._side_index = index_class.load(path.parent) if mtime is not None else None
+            self._side_mtime = mtime
+            if self._side_index is None:
+                print(f"⚠️ 当前版本没有 {filename}，检索将退回到Chroma。")
+
+    def _side_search(self, store: Chroma, side_index: Union[BinaryIndex, PaperIndex], query: str, k: int,
+                     kwargs: Dict[str, Any]) -> Optional[List[Tuple[Document, float]]]:
+        """用附加索引检索；该模式不支持这些检索参数时返回None，由调用方退回到Chroma。"""
+        if isinstance(side_index, PaperIndex) and set(kwargs) <= {"filter"}:
+            return side_index.search(store, store.embeddings.embed_query(query), k, filter=kwargs.get("filter"))
+        if isinstance(side_index, BinaryIndex) and not kwargs:
+            return side_index.search(store, store.embeddings.embed_query(query), k)
+        return None
+
+    def format_stats(self) -> str:
+        # 供共享资源报告显示检索结果缓存的命中统计
+        if self.result_cache is None:
+            return f"Retrieval result cache: disabled, version {self._version}"
+        return self.result_cache.format_stats()
+
+    def close(self):
+        if self.result_cache is not None:
+            self.result_cache.close()
+
+    def _cached(self, method: str, query: str, k: int, kwargs: Dict[str, Any], search):
+        if self.result_cache is None:
+            return search()
+        revision = get_index_revision(self.db_path)
+        # 不同检索模式的结果不同，模式也是键的一部分
+        key = make_cache_key(f"{self.mode}:{method}", query, k, kwargs)
+        results = self.result_cache.get(revision, key)
+        if results is None:
+            results = search()
+            self.result_cache.put(revision, key, results)
+        return results
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        if self.result_cache is None:
+            return self._similarity_search(query, k, kwargs)
+        results = self._cached("docs", query, k, kwargs,
+                               lambda: [(doc, None) for doc in self._similarity_search(query, k, kwargs)])
+        return [doc for doc, _ in results]
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4,
+                                                **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._cached("scores", query, k, kwargs,
+                            lambda: self._similarity_search_with_relevance_scores(query, k, kwargs))
+
+    def _similarity_search(self, query: str, k: int, kwargs: Dict[str, Any]) -> List[Document]:
+        store, side_index = self._snapshot()
+        results = self._side_search(store, side_index, query, k, kwargs) if side_index is not None else None
+        if results is not None:
+            return [doc for doc, _ in results]
+        return store.similarity_search(query, k=k, **kwargs)
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int,
+                                                 kwargs: Dict[str, Any]) -> List[Tuple[Document, float]]:
+        store, side_index = self._snapshot()
+        results = self._side_search(store, side_index, query, k, kwargs) if side_index is not None else None
+        if results is not None:
+            return results
+        return store.similarity_search_with_relevance_scores(query, k=k, **kwargs)
+
+    def get(self, **kwargs: Any):
+        return self.current().get(**kwargs)
+
+
+class LiveRetriever(BaseRetriever):
+    """基于 LiveVectorStore 的检索器，每次检索都使用当前发布的版本，并按章节权重重新排序。"""
+
+    store: Any
+    search_kwargs: dict = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return section_weighted_search(self.store, query, **self.search_kwargs)
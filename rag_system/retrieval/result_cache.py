@@ -0,0 +1,178 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from rag_system.config import settings
+from rag_system.ingestion.embedding_cache import normalize_query_text
+
+# similarity_search 的结果没有分数，缓存时分数为None
+ScoredDocuments = List[Tuple[Document, Optional[float]]]
+
+
+def _copy_results(results: ScoredDocuments) -> ScoredDocuments:
+    # 调用方可能原地修改文档的元数据（如补全论文信息），缓存内外各持有一份副本
+    return [(Document(page_content=doc.page_content, metadata=dict(doc.metadata)), score) for doc, score in results]
+
+
+def make_cache_key(method: str, query: str, k: int, search_kwargs: Dict[str, Any]) -> str:
+    """检索结果缓存的键：检索方法、规范化后的查询文本、k 和其余检索参数（如 filter）的哈希。"""
+    payload = json.dumps([method, normalize_query_text(query), k, search_kwargs],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RetrievalResultCache:
+    """
+    检索结果缓存：第一级为内存LRU，可选的第二级为SQLite文件（多个进程共享）。
+
+    每个条目都属于某个索引修订（见 index_versions.get_index_revision）。调用方每次查询时传入当前修订，
+    发现修订变化（重建发布了新版本，或增量更新原地修改了当前版本）时，内存缓存整体清空，
+    SQLite中其他修订的条目也被删除，因此不会返回过期的结果。两级缓存都有条目数上限和有效期。
+    """
+
+    def __init__(
+            self,
+            max_entries: int = settings.RETRIEVAL_CACHE_SIZE,
+            ttl_seconds: Optional[float] = settings.RETRIEVAL_CACHE_TTL_SECONDS,
+            sqlite_path: Optional[Path] = settings.RETRIEVAL_CACHE_SQLITE_PATH,
+            sqlite_max_entries: int = settings.RETRIEVAL_CACHE_SQLITE_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            max_entries (int): 内存中最多保存的检索结果数。
+            ttl_seconds (Optional[float]): 结果的有效期（秒），None 表示不过期。
+            sqlite_path (Optional[Path]): SQLite二级缓存的文件路径，None 表示不使用二级缓存。
+            sqlite_max_entries (int): SQLite中最多保存的检索结果数，超出后删除最久未使用的条目。
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_max_entries = sqlite_max_entries
+        self.hits = 0
+        self.sqlite_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._revision: Optional[str] = None
+        # 键 -> (写入时间, 结果)
+        self._entries: "OrderedDict[str, Tuple[float, ScoredDocuments]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        if sqlite_path is not None:
+            Path(sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(sqlite_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, revision TEXT NOT NULL, created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used)")
+            self._conn.commit()
+
+    def get(self, revision: str, key: str) -> Optional[ScoredDocuments]:
+        now = time.time()
+        with self._lock:
+            self._check_revision(revision)
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[0], now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy_results(entry[1])
+            if entry is not None:
+                del self._entries[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT created_at, payload FROM results WHERE key = ? AND revision = ?", (key, revision)
+                ).fetchone()
+                if row is not None and not self._expired(row[0], now):
+                    self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    results = [(Document(page_content=content, metadata=metadata), score)
+                               for content, metadata, score in json.loads(row[1])]
+                    self._remember(key, row[0], results)
+                    self.sqlite_hits += 1
+                    return _copy_results(results)
+            self.misses += 1
+            return None
+
+    def put(self, revision: str, key: str, results: ScoredDocuments):
+        now = time.time()
+        with self._lock:
+            self._check_revision(revision)
+            self._remember(key, now, _copy_results(results))
+            if self._conn is not None:
+                payload = json.dumps([[doc.page_content, doc.metadata, score] for doc, score in results],
+                                     ensure_ascii=False)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (key, revision, created_at, last_used, payload)"
+                    " VALUES (?, ?, ?, ?, ?)", (key, revision, now, now, payload)
+                )
+                self._evict_sqlite(now)
+                self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM results")
+                self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- 统计 ---
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.sqlite_hits + self.misses
+        return (self.hits + self.sqlite_hits) / total if total else 0.0
+
+    def format_stats(self) -> str:
+        tier = f", {self.sqlite_hits} from SQLite" if self._conn is not None else ""
+        return (
+            f"Retrieval result cache: {self.hits + self.sqlite_hits} hits{tier} / {self.misses} misses "
+            f"(hit rate {self.hit_rate:.1%}), {len(self._entries)}/{self.max_entries} entries, "
+            f"{self.invalidations} invalidations, revision {self._revision}"
+        )
+
+    # --- 内部实现 ---
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, results: ScoredDocuments):
+        self._entries[key] = (created_at, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _check_revision(self, revision: str):
+        if revision == self._revision:
+            return
+        if self._revision is not None:
+            self.invalidations += 1
+            print(f"--- 索引已更新（{self._revision} -> {revision}），检索结果缓存已清空 ---")
+        self._entries.clear()
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM results WHERE revision != ?", (revision,))
+            self._conn.commit()
+        self._revision = revision
+
+    def _evict_sqlite(self, now: float):
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if count > self.sqlite_max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                (count - self.sqlite_max_entries,)
+            )
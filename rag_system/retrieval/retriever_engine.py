@@ -1,8 +1,9 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.retrievers import BaseRetriever
 
 from rag_system.config import settings
+from rag_system.ingestion.paper_store import attach_paper_metadata
+from rag_system.resources import get_shared_vector_store
+from rag_system.retrieval.live_store import LiveRetriever
 
 
 class RetrieverEngine:
@@ -10,37 +11,32 @@ class RetrieverEngine:
     负责从持久化的向量数据库中检索相关文档。
     """
 
-    def __init__(self):
+    def __init__(self, retrieval_mode: str = settings.RETRIEVAL_MODE):
         """
         初始化检索器，加载向量数据库和嵌入模型。
+
+        :param retrieval_mode: "chroma" 使用Chroma自带的HNSW检索；"binary" 使用二值索引预筛选+精确重打分；
+            "paper" 先选出最相关的论文，再在这些论文的文本块中检索。
         """
         if not settings.VECTOR_DB_PATH.exists():
             raise FileNotFoundError(
                 f"向量数据库未找到，请先运行 build_vectordb.py。路径: {settings.VECTOR_DB_PATH}"
             )
 
-        # 1. 加载嵌入函数 (必须与构建时完全一致)
-        embedding_function = HuggingFaceEmbeddings(
-            model_name=settings.EMBEDDING_MODEL_NAME,
-            model_kwargs={'device': settings.EMBEDDING_DEVICE},
-            encode_kwargs={'normalize_embeddings': True}
-        )
-
-        # 2. 加载持久化的向量数据库
-        self.vector_store = Chroma(
-            persist_directory=str(settings.VECTOR_DB_PATH),
-            embedding_function=embedding_function
-        )
+        # 加载持久化的向量数据库（跟随 CURRENT 指针，重建发布新版本后自动切换）。
+        # 嵌入函数 (必须与构建时完全一致) 和数据库句柄从进程共享的资源注册表中获取，
+        # 同一进程中的多个检索引擎和Agent工具共用同一份模型
+        self.vector_store = get_shared_vector_store(settings.VECTOR_DB_PATH, mode=retrieval_mode)
         print("RetrieverEngine: 向量数据库加载成功。")
 
-    def as_retriever(self) -> VectorStoreRetriever:
+    def as_retriever(self) -> BaseRetriever:
         """
         将向量数据库转换为一个LangChain的Retriever对象。
 
         将使用在 settings.py 中定义的 K 值。
         """
-        return self.vector_store.as_retriever(
-            search_type="similarity",
+        return LiveRetriever(
+            store=self.vector_store,
             search_kwargs={"k": settings.RETRIEVER_K}
         )
 
@@ -53,7 +49,7 @@ if __name__ == '__main__':
         retriever = engine.as_retriever()
 
         test_query = "graphene oxide membrane"
-        results = retriever.invoke(test_query)
+        results = attach_paper_metadata(retriever.invoke(test_query))
 
         print(f"\n针对查询 '{test_query}' 的前 {len(results)} 条检索结果:")
         for i, doc in enumerate(results):
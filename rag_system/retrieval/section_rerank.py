@@ -0,0 +1,41 @@
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from rag_system.config import settings
+
+
+def section_weighted_search(
+        store: Any,
+        query: str,
+        k: int = settings.RETRIEVER_K,
+        fetch_multiplier: int = settings.SECTION_RERANK_FETCH_MULTIPLIER,
+        weights: Optional[Dict[str, float]] = None,
+        **kwargs: Any
+) -> List[Document]:
+    """
+    按文本块所在章节调整相似度后返回前 k 个结果。
+
+    先取 k × fetch_multiplier 个候选，把每个候选的相关度（0~1，越大越相关）乘以其章节权重
+    （settings.SECTION_WEIGHTS，没有 `section` 元数据的旧索引条目权重为1）后重新排序，
+    这样在相关度相近时，结果与讨论章节的文本块会排在引言、作者信息等内容之前。
+
+    Args:
+        store: Chroma 或 LiveVectorStore。
+        query (str): 查询文本。
+        k (int): 返回的结果数。
+        fetch_multiplier (int): 候选数相对 k 的倍数。
+        weights (Optional[Dict[str, float]]): 章节权重，默认使用 settings.SECTION_WEIGHTS。
+        **kwargs: 透传给向量数据库检索的其他参数（如 filter）。
+    """
+    if not settings.SECTION_RERANK_ENABLED:
+        return store.similarity_search(query, k=k, **kwargs)
+
+    weights = settings.SECTION_WEIGHTS if weights is None else weights
+    candidates = store.similarity_search_with_relevance_scores(query, k=k * fetch_multiplier, **kwargs)
+    reranked = sorted(
+        candidates,
+        key=lambda pair: max(pair[1], 0.0) * weights.get(pair[0].metadata.get("section"), 1.0),
+        reverse=True
+    )
+    return [doc for doc, _ in reranked[:k]]
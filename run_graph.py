@@ -18,17 +18,17 @@ from rag_system.executor.executor import Executor, execute_node
 from rag_system.reflector.reflector import Reflector, reflect_node
 from rag_system.decider.decider import should_continue
 
-from langchain_community.chat_models import ChatOllama
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from rag_system.config import settings
+from rag_system.resources import get_shared_llm
 
 def generate_final_answer_node(state: GraphState) -> dict:
     """
     生成最终答案节点
     """
     print("--- [节点: Final Answer Generator] ---")
-    llm = ChatOllama(model=settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
+    llm = get_shared_llm(settings.LOCAL_LLM_MODEL_NAME, temperature=0.1)
     prompt = PromptTemplate.from_template(
         "你是一个科研助理，你需要根据用户的原始问题和系统的执行历史，生成一个完整、清晰且友好的最终答案。\n\n"
         "【用户原始问题】:\n{initial_query}\n\n"
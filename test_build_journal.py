@@ -0,0 +1,95 @@
+# test_build_journal.py
+# 构建进度日志（BuildJournal）的单元测试：中断后 --resume 只跳过已持久化的批次。
+
+import pytest
+from langchain_core.documents import Document
+
+from rag_system.ingestion.build_journal import BuildJournal, batch_key
+
+FINGERPRINT = {"source": "papers.json", "model": "fake-model", "backend": "torch", "normalize": True,
+               "reduction": None, "chunk_size": 750}
+
+
+def _batch(*chunk_ids):
+    return [Document(page_content=chunk_id, metadata={"chunk_id": chunk_id}) for chunk_id in chunk_ids]
+
+
+BATCHES = [_batch("p1:0:a", "p1:700:b"), _batch("p2:0:c"), _batch("p3:0:d", "p3:700:e")]
+
+
+def test_batch_key_depends_on_chunk_ids_only():
+    assert batch_key(_batch("x", "y")) == batch_key(_batch("x", "y"))
+    assert batch_key(_batch("x", "y")) != batch_key(_batch("y", "x"))
+
+
+def test_resume_skips_recorded_batches(tmp_path):
+    path = tmp_path / "build_journal.jsonl"
+    journal = BuildJournal(path, FINGERPRINT)
+    for batch in journal.filter_batches(BATCHES[:2]):
+        journal.record(batch)
+    journal.close()  # 模拟第三个批次写入前被中断
+
+    resumed = BuildJournal(path, FINGERPRINT, resume=True)
+    remaining = list(resumed.filter_batches(BATCHES))
+    resumed.close()
+    assert remaining == [BATCHES[2]]
+    assert (resumed.skipped_batches, resumed.skipped_chunks) == (2, 3)
+
+
+def test_without_resume_the_journal_starts_over(tmp_path):
+    path = tmp_path / "build_journal.jsonl"
+    journal = BuildJournal(path, FINGERPRINT)
+    journal.record(BATCHES[0])
+    journal.close()
+
+    fresh = BuildJournal(path, FINGERPRINT)
+    assert list(fresh.filter_batches(BATCHES)) == BATCHES
+    fresh.close()
+
+
+def test_partial_last_line_is_ignored(tmp_path):
+    path = tmp_path / "build_journal.jsonl"
+    journal = BuildJournal(path, FINGERPRINT)
+    journal.record(BATCHES[0])
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"type": "batch", "key": "trunc')  # 写入最后一行时进程被杀死
+
+    resumed = BuildJournal(path, FINGERPRINT, resume=True)
+    assert resumed.completed == {batch_key(BATCHES[0])}
+    resumed.record(BATCHES[1])
+    resumed.close()
+
+    # 续写的记录另起一行，再次恢复时仍然可以读出
+    again = BuildJournal(path, FINGERPRINT, resume=True)
+    again.close()
+    assert again.completed == {batch_key(BATCHES[0]), batch_key(BATCHES[1])}
+
+
+def test_changed_embedding_fingerprint_refuses_resume(tmp_path):
+    path = tmp_path / "build_journal.jsonl"
+    journal = BuildJournal(path, FINGERPRINT)
+    journal.record(BATCHES[0])
+    journal.close()
+
+    # 文本块ID与模型无关，换模型后沿用旧批次会把两个模型的向量混在同一个索引中
+    for changed in ({"model": "other-model"}, {"backend": "onnx"}, {"normalize": False}, {"reduction": ["pca", 256]}):
+        with pytest.raises(RuntimeError, match="--resume"):
+            BuildJournal(path, dict(FINGERPRINT, **changed), resume=True)
+    # 日志保持不变，用原来的参数仍然可以恢复
+    resumed = BuildJournal(path, FINGERPRINT, resume=True)
+    resumed.close()
+    assert resumed.completed == {batch_key(BATCHES[0])}
+
+
+def test_changed_chunking_fingerprint_only_warns(tmp_path, capsys):
+    path = tmp_path / "build_journal.jsonl"
+    journal = BuildJournal(path, FINGERPRINT)
+    journal.record(BATCHES[0])
+    journal.close()
+
+    # 切分参数变化会改变文本块ID，只有内容完全相同的批次才会被跳过
+    resumed = BuildJournal(path, dict(FINGERPRINT, chunk_size=500), resume=True)
+    resumed.close()
+    assert "不一致" in capsys.readouterr().out
+    assert resumed.completed == {batch_key(BATCHES[0])}
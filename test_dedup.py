@@ -0,0 +1,135 @@
+# test_dedup.py
+# MinHash/LSH 近似重复过滤器（ChunkDeduplicator）和重复块写回（readmit_linked_duplicates）的单元测试。
+
+import json
+import random
+import string
+
+from langchain_core.documents import Document
+
+from rag_system.ingestion.dedup import DEDUP_LINKS_FILENAME, ChunkDeduplicator, readmit_linked_duplicates
+
+LICENSE = ("This article is licensed under a Creative Commons Attribution 4.0 International License, which permits "
+           "use, sharing, adaptation, distribution and reproduction in any medium or format, as long as you give "
+           "appropriate credit to the original author(s) and the source.")
+
+
+def _random_text(seed, length=600):
+    rng = random.Random(seed)
+    return "".join(rng.choice(string.ascii_lowercase + "     ") for _ in range(length))
+
+
+def _chunk(paper_key, index, text):
+    return Document(page_content=text, metadata={"paper_key": paper_key, "chunk_id": f"{paper_key}:{index}:h"})
+
+
+def _ids(chunks):
+    return [chunk.metadata["chunk_id"] for chunk in chunks]
+
+
+def test_link_mode_removes_near_duplicates_across_papers(tmp_path):
+    dedup = ChunkDeduplicator(mode="link")
+    dedup.open_links(tmp_path / DEDUP_LINKS_FILENAME)
+    first = dedup.filter_chunks([_chunk("A", 0, _random_text(1)), _chunk("A", 1, LICENSE)])
+    # 只差大小写和空白的许可声明，以及完全不同的正文
+    second = dedup.filter_chunks([_chunk("B", 0, "  " + LICENSE.upper() + "\n"), _chunk("B", 1, _random_text(2))])
+    dedup.close()
+    assert _ids(first) == ["A:0:h", "A:1:h"]
+    assert _ids(second) == ["B:1:h"]
+    assert (dedup.chunks_seen, dedup.duplicates) == (4, 1)
+
+    links = [json.loads(line) for line in open(tmp_path / DEDUP_LINKS_FILENAME, encoding="utf-8")]
+    assert len(links) == 1
+    assert links[0]["chunk_id"] == "B:0:h" and links[0]["canonical_id"] == "A:1:h"
+    assert links[0]["page_content"] == "  " + LICENSE.upper() + "\n"
+    assert links[0]["metadata"]["paper_key"] == "B"
+
+
+def test_different_texts_are_kept():
+    dedup = ChunkDeduplicator(mode="link")
+    chunks = [_chunk("A", i, _random_text(i)) for i in range(20)]
+    assert dedup.filter_chunks(chunks) == chunks
+
+
+def test_drop_mode_only_deduplicates_within_a_paper():
+    dedup = ChunkDeduplicator(mode="drop")
+    kept_a = dedup.filter_chunks([_chunk("A", 0, LICENSE), _chunk("A", 1, LICENSE + " ")])
+    kept_b = dedup.filter_chunks([_chunk("B", 0, LICENSE)])
+    assert _ids(kept_a) == ["A:0:h"]
+    assert _ids(kept_b) == ["B:0:h"]
+    # 每篇论文开始时清空状态，内存不随语料增长
+    assert len(dedup._signatures) == 1
+
+
+def test_results_are_deterministic():
+    chunks = [_chunk(f"P{i % 3}", i, LICENSE if i % 4 == 0 else _random_text(i)) for i in range(12)]
+    runs = [_ids(ChunkDeduplicator(mode="link").filter_chunks(list(chunks))) for _ in range(2)]
+    assert runs[0] == runs[1]
+    assert runs[0].count("P0:0:h") == 1 and "P1:4:h" not in runs[0]
+
+
+def test_max_entries_bounds_state_and_keeps_recently_matched():
+    dedup = ChunkDeduplicator(mode="link", max_entries=3)
+    dedup.filter_chunks([_chunk("A", 0, LICENSE)])
+    for i in range(1, 6):
+        # 每篇论文都带有许可声明，规范块因为一直被匹配而不会被淘汰
+        kept = dedup.filter_chunks([_chunk(f"P{i}", 0, _random_text(i)), _chunk(f"P{i}", 1, LICENSE)])
+        assert _ids(kept) == [f"P{i}:0:h"]
+        assert len(dedup._signatures) <= 3
+    assert "A:0:h" in dedup._signatures
+    assert dedup.evicted == 3
+    assert sum(len(bucket) for bucket in dedup._buckets[0].values()) == len(dedup._signatures)
+
+
+class FakeCollection:
+    """只实现 readmit_linked_duplicates 用到的 get / upsert。"""
+
+    def __init__(self, vectors):
+        self.vectors = dict(vectors)
+        self.documents = {}
+
+    def get(self, ids, include):
+        found = [chunk_id for chunk_id in ids if chunk_id in self.vectors]
+        return {"ids": found, "embeddings": [self.vectors[chunk_id] for chunk_id in found]}
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        for chunk_id, vector, metadata, document in zip(ids, embeddings, metadatas, documents):
+            self.vectors[chunk_id] = vector
+            self.documents[chunk_id] = (document, metadata)
+
+
+class FakeStore:
+    def __init__(self, vectors):
+        self._collection = FakeCollection(vectors)
+
+
+def _write_links(index_path, links):
+    with open(index_path / DEDUP_LINKS_FILENAME, "w", encoding="utf-8") as f:
+        for link in links:
+            f.write(json.dumps(link) + "\n")
+
+
+def _link(chunk_id, canonical_id, paper_key):
+    return {"chunk_id": chunk_id, "canonical_id": canonical_id, "paper_key": paper_key, "similarity": 0.9,
+            "page_content": f"text of {chunk_id}", "metadata": {"paper_key": paper_key, "chunk_id": chunk_id}}
+
+
+def test_readmit_linked_duplicates_when_canonical_paper_is_removed(tmp_path):
+    db = FakeStore({"A:1:h": [1.0, 0.0], "C:0:h": [0.0, 1.0]})
+    _write_links(tmp_path, [
+        _link("B:0:h", "A:1:h", "B"),
+        _link("D:0:h", "A:1:h", "D"),
+        _link("A:5:h", "A:1:h", "A"),  # 与被删除的论文属于同一篇
+        _link("E:0:h", "C:0:h", "E"),  # 规范块没有被删除
+    ])
+
+    assert readmit_linked_duplicates(db, tmp_path, ["A:1:h"], {"A"}) == ["B:0:h"]
+    assert db._collection.vectors["B:0:h"] == [1.0, 0.0]
+    assert db._collection.documents["B:0:h"] == ("text of B:0:h", {"paper_key": "B", "chunk_id": "B:0:h"})
+
+    links = [json.loads(line) for line in open(tmp_path / DEDUP_LINKS_FILENAME, encoding="utf-8")]
+    assert [(link["chunk_id"], link["canonical_id"]) for link in links] == [("D:0:h", "B:0:h"), ("E:0:h", "C:0:h")]
+
+
+def test_readmit_without_links_file_is_a_no_op(tmp_path):
+    assert readmit_linked_duplicates(FakeStore({}), tmp_path, ["A:1:h"], {"A"}) == []
@@ -0,0 +1,53 @@
+# test_document_loader.py
+# 流式JSON数组解析器 iter_json_records 的单元测试：用各种读缓冲区大小，让记录在任意位置跨越缓冲区边界。
+
+import json
+
+import pytest
+
+from rag_system.ingestion.document_loader import iter_json_records
+
+CASES = [
+    [12345, 678],
+    [-1.5e10, 0, 3.25, 100000],
+    [True, False, None, "null", "a,b]"],
+    [{"doi": "10.1/x", "page_content": "膜分离性能", "n": 42}, {"nested": [1, [2, 3], {"k": "v"}]}],
+    [],
+    [{"text": "x" * 50}, 987654321],
+]
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "records.json"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("records", CASES)
+@pytest.mark.parametrize("indent", [None, 2])
+def test_records_split_at_every_boundary(tmp_path, records, indent):
+    path = _write(tmp_path, json.dumps(records, ensure_ascii=False, indent=indent))
+    for read_size in range(1, 40):
+        assert list(iter_json_records(path, read_size=read_size)) == records, read_size
+
+
+def test_number_ending_at_buffer_end_is_not_truncated(tmp_path):
+    path = _write(tmp_path, "[12345, 678]")
+    assert list(iter_json_records(path, read_size=4)) == [12345, 678]
+
+
+def test_trailing_whitespace_after_array(tmp_path):
+    path = _write(tmp_path, '[1, 2]\n\n   \n')
+    assert list(iter_json_records(path, read_size=3)) == [1, 2]
+
+
+def test_top_level_must_be_array(tmp_path):
+    path = _write(tmp_path, '{"a": 1}')
+    with pytest.raises(ValueError):
+        list(iter_json_records(path))
+
+
+def test_unterminated_array_raises(tmp_path):
+    path = _write(tmp_path, '[1, {"a": 2}')
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_records(path, read_size=4))
@@ -0,0 +1,85 @@
+# test_embedding_batcher.py
+# 按token长度分桶的批量嵌入器（BucketedEmbeddings）的单元测试。
+# 用一个按空格分词的假 SentenceTransformer 代替真实模型，向量的第一维记录文本的token数。
+
+import random
+
+import numpy as np
+
+from rag_system.ingestion.embedding_batcher import BucketedEmbeddings
+
+
+class FakeTokenizer:
+    def __call__(self, texts, truncation=False):
+        # 两个特殊token（[CLS] / [SEP]）加上按空格切分的词
+        return {"input_ids": [[0] * (len(text.split()) + 2) for text in texts]}
+
+
+class FakeSentenceTransformer:
+    def __init__(self, max_seq_length=32):
+        self.tokenizer = FakeTokenizer()
+        self.max_seq_length = max_seq_length
+        self.batch_sizes = []
+
+    def encode(self, texts, batch_size, show_progress_bar, **kwargs):
+        assert len(texts) == batch_size
+        self.batch_sizes.append(batch_size)
+        return np.array([[float(len(text.split())), 1.0] for text in texts])
+
+
+class FakeHuggingFaceEmbeddings:
+    def __init__(self, client):
+        self._client = client
+        self.encode_kwargs = {"normalize_embeddings": True, "batch_size": 8}
+
+    def embed_query(self, text):
+        return [0.0, 0.0]
+
+
+def _batcher(token_budget=64, max_batch_size=4, max_seq_length=32):
+    client = FakeSentenceTransformer(max_seq_length)
+    return BucketedEmbeddings(FakeHuggingFaceEmbeddings(client), token_budget=token_budget,
+                              max_batch_size=max_batch_size), client
+
+
+def test_plan_batches_respects_budget_and_batch_size():
+    batcher, _ = _batcher(token_budget=64, max_batch_size=4)
+    rng = random.Random(0)
+    lengths = [rng.randint(3, 32) for _ in range(200)]
+    batches = batcher.plan_batches(lengths)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 4
+        # 单个文本本身超出预算时只能单独成批
+        assert len(batch) == 1 or len(batch) * max(lengths[i] for i in batch) <= 64
+
+
+def test_plan_batches_groups_similar_lengths():
+    batcher, _ = _batcher(token_budget=1000, max_batch_size=2)
+    batches = batcher.plan_batches([30, 3, 29, 4])
+    assert batches == [[1, 3], [2, 0]]
+
+
+def test_embed_documents_returns_vectors_in_input_order():
+    batcher, client = _batcher(token_budget=40, max_batch_size=3)
+    texts = [" ".join(["w"] * n) for n in (10, 1, 7, 1, 12, 3)]
+    vectors = batcher.embed_documents(texts)
+    assert [vector[0] for vector in vectors] == [10.0, 1.0, 7.0, 1.0, 12.0, 3.0]
+    assert sum(client.batch_sizes) == len(texts)
+    assert batcher.chunks_embedded == len(texts)
+    assert batcher.padded_tokens >= batcher.real_tokens
+    # 调用方传入的 batch_size 被分桶后的批大小取代
+    assert "batch_size" not in batcher.encode_kwargs
+
+
+def test_long_texts_are_counted_as_truncated():
+    batcher, _ = _batcher(max_seq_length=8)
+    lengths = batcher.count_tokens(["a b c", " ".join(["w"] * 20)])
+    assert lengths == [5, 8]
+    assert batcher.truncated == 1
+
+
+def test_empty_input():
+    batcher, client = _batcher()
+    assert batcher.embed_documents([]) == []
+    assert client.batch_sizes == []
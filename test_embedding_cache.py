@@ -0,0 +1,118 @@
+# test_embedding_cache.py
+# 嵌入缓存（CachedEmbeddings）和查询向量缓存（QueryEmbeddingCache）的单元测试，使用一个按文本长度生成向量的假模型，
+# 不加载真实模型。
+
+from rag_system.ingestion.embedding import close_embedding_function
+from rag_system.ingestion.embedding_cache import CachedEmbeddings, QueryEmbeddingCache, hash_text, normalize_query_text
+
+
+class FakeEmbeddings:
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] * self.dim for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text))] * self.dim
+
+
+def _cache(tmp_path, underlying=None, **kwargs):
+    return CachedEmbeddings(underlying or FakeEmbeddings(), "fake-model", True,
+                            cache_path=tmp_path / "cache.sqlite3", **kwargs)
+
+
+def test_repeated_texts_are_embedded_once(tmp_path):
+    model = FakeEmbeddings()
+    cache = _cache(tmp_path, model)
+    assert cache.embed_documents(["a", "bb", "a"]) == [[1.0] * 4, [2.0] * 4, [1.0] * 4]
+    assert cache.embed_documents(["bb", "ccc"]) == [[2.0] * 4, [3.0] * 4]
+    assert model.calls == [["a", "bb"], ["ccc"]]
+    # 批次内重复的文本也计为未命中，但只嵌入一次
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_total_bytes_does_not_drift_when_rows_are_replaced(tmp_path):
+    # 同一个键被重复写入（例如另一个进程在查询之后、写入之前写入了它）时，被替换的条目不应重复计入
+    cache = _cache(tmp_path)
+    cache._store({"a": [1.0] * 4, "bb": [2.0] * 4})
+    cache._store({"a": [1.0] * 4, "ccc": [3.0] * 4})
+    actual = cache._conn.execute("SELECT SUM(nbytes) FROM embeddings").fetchone()[0]
+    assert actual == 3 * 16
+    assert cache._total_bytes == actual
+
+
+def test_lru_eviction_keeps_recent_entries(tmp_path, monkeypatch):
+    # 每个向量16字节，上限40字节：第三个条目写入后超出上限，淘汰到36字节以下，即删除最久未使用的一个
+    clock = iter(range(1, 100))
+    monkeypatch.setattr("rag_system.ingestion.embedding_cache.time.time", lambda: float(next(clock)))
+    cache = _cache(tmp_path, max_bytes=40)
+    cache.embed_documents(["a"])
+    cache.embed_documents(["bb"])
+    cache.embed_documents(["a"])  # 刷新 "a" 的访问时间，"bb" 成为最久未使用的条目
+    cache.embed_documents(["ccc"])
+    assert cache.evictions == 1
+    remaining = {row[0] for row in cache._conn.execute("SELECT text_hash FROM embeddings")}
+    assert len(remaining) == 2
+    assert cache._lookup({hash_text("bb")}) == {}
+    assert cache._total_bytes == 32
+
+
+class FakePool(FakeEmbeddings):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_close_embedding_function_reaches_the_wrapped_pool(tmp_path):
+    # 多进程嵌入被缓存包装在内层，关闭时需要沿 underlying 找到它
+    pool = FakePool()
+    close_embedding_function(_cache(tmp_path, pool))
+    assert pool.closed
+
+
+def test_query_keys_are_normalized():
+    assert normalize_query_text("  PVDF\u3000膜的  孔隙率\n") == "PVDF 膜的 孔隙率"
+    # 全角字母和数字按 NFKC 统一为半角
+    assert normalize_query_text("ＰＶＤＦ　２０２０") == "PVDF 2020"
+
+
+def test_query_cache_hits_on_normalized_text():
+    model = FakeEmbeddings()
+    cache = QueryEmbeddingCache(model, max_entries=8)
+    first = cache.embed_query("pore  size of PVDF ")
+    assert cache.embed_query("pore size of PVDF") == first
+    assert cache.embed_query("\tpore size\nof PVDF") == first
+    # 模型收到的是规范化后的文本，只推理一次
+    assert model.calls == [["pore size of PVDF"]]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_query_cache_returns_copies():
+    cache = QueryEmbeddingCache(FakeEmbeddings(), max_entries=8)
+    cache.embed_query("abc").append(99.0)
+    assert cache.embed_query("abc") == [3.0] * 4
+
+
+def test_query_cache_evicts_least_recently_used():
+    model = FakeEmbeddings()
+    cache = QueryEmbeddingCache(model, max_entries=2)
+    cache.embed_query("a")
+    cache.embed_query("bb")
+    cache.embed_query("a")  # "a" 成为最近使用的条目
+    cache.embed_query("ccc")  # 淘汰 "bb"
+    assert list(cache._vectors) == ["a", "ccc"]
+    assert cache.evictions == 1
+    cache.embed_query("bb")
+    assert model.calls[-1] == ["bb"] and cache.misses == 4
+
+
+def test_query_cache_passes_documents_through():
+    model = FakeEmbeddings()
+    cache = QueryEmbeddingCache(model, max_entries=2)
+    assert cache.embed_documents(["a", "a"]) == [[1.0] * 4, [1.0] * 4]
+    assert model.calls == [["a", "a"]] and len(cache._vectors) == 0
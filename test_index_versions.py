@@ -0,0 +1,72 @@
+# test_index_versions.py
+# 版本化向量数据库目录的单元测试：发布、保留的版本数、旧版布局的清理和索引修订号。
+
+from rag_system.ingestion import index_versions
+from rag_system.ingestion.index_versions import (
+    bump_index_revision,
+    create_staging_dir,
+    get_active_version,
+    get_index_revision,
+    prune_versions,
+    publish_version,
+    resolve_active_path
+)
+
+SEGMENT_DIR = "3f1c2a9e-8b7d-4e6f-9a01-23456789abcd"
+
+
+def _make_legacy_layout(db_path):
+    db_path.mkdir(parents=True)
+    (db_path / "chroma.sqlite3").write_bytes(b"sqlite")
+    (db_path / SEGMENT_DIR).mkdir()
+    (db_path / SEGMENT_DIR / "data_level0.bin").write_bytes(b"hnsw")
+    # 用户自己放在目录中的文件
+    (db_path / "notes.txt").write_text("keep me", encoding="utf-8")
+    (db_path / "backup").mkdir()
+    (db_path / "backup" / "chroma.sqlite3").write_bytes(b"old")
+
+
+def test_publish_switches_current_and_removes_only_chroma_artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_versions.settings, "VECTOR_DB_KEEP_VERSIONS", 2)
+    db_path = tmp_path / "chroma_db"
+    _make_legacy_layout(db_path)
+    assert resolve_active_path(db_path) == db_path
+
+    staging = create_staging_dir(db_path)
+    version = publish_version(db_path, staging)
+    assert get_active_version(db_path) == version
+    assert resolve_active_path(db_path) == db_path / "versions" / version
+    assert not (db_path / "chroma.sqlite3").exists()
+    assert not (db_path / SEGMENT_DIR).exists()
+    assert (db_path / "notes.txt").read_text(encoding="utf-8") == "keep me"
+    assert (db_path / "backup" / "chroma.sqlite3").exists()
+
+
+def test_prune_keeps_newest_versions_and_staging(tmp_path):
+    db_path = tmp_path / "chroma_db"
+    versions = db_path / "versions"
+    versions.mkdir(parents=True)
+    for name in ("v20250101-000000", "v20250102-000000", "v20250103-000000", "v20250101-120000.staging",
+                 "v20250104-000000.staging"):
+        (versions / name).mkdir()
+    (db_path / "CURRENT").write_text('{"version": "v20250103-000000"}', encoding="utf-8")
+
+    prune_versions(db_path, keep=2)
+    # 较早的暂存目录来自失败或中断的构建，只保留最新的一个供 --resume 使用
+    assert sorted(p.name for p in versions.iterdir()) == [
+        "v20250102-000000", "v20250103-000000", "v20250104-000000.staging"]
+
+
+
+
+def test_index_revision_changes_on_bump_and_publish(tmp_path):
+    db_path = tmp_path / "chroma_db"
+    db_path.mkdir()
+    assert get_index_revision(db_path) == "legacy#0"
+    bump_index_revision(db_path)
+    assert get_index_revision(db_path) == "legacy#1"
+
+    version = publish_version(db_path, create_staging_dir(db_path))
+    assert get_index_revision(db_path) == f"{version}#0"
+    assert bump_index_revision(resolve_active_path(db_path)) == 1
+    assert get_index_revision(db_path) == f"{version}#1"
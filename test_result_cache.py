@@ -0,0 +1,83 @@
+# test_result_cache.py
+# 检索结果缓存（RetrievalResultCache）的单元测试：索引修订变化时失效、两级缓存、副本、有效期和缓存键。
+
+from langchain_core.documents import Document
+
+from rag_system.retrieval import result_cache
+from rag_system.retrieval.result_cache import RetrievalResultCache, make_cache_key
+
+RESULTS = [(Document(page_content="PVDF membranes", metadata={"paper_key": "10.1/a"}), 0.9)]
+
+
+def _cache(tmp_path=None, **kwargs):
+    kwargs.setdefault("ttl_seconds", None)
+    return RetrievalResultCache(sqlite_path=tmp_path / "results.sqlite3" if tmp_path else None, **kwargs)
+
+
+def test_cache_key_normalizes_query_and_includes_parameters():
+    key = make_cache_key("similarity", "pore  size ", 5, {"filter": {"year": 2020}})
+    assert key == make_cache_key("similarity", "pore size", 5, {"filter": {"year": 2020}})
+    assert key != make_cache_key("similarity", "pore size", 10, {"filter": {"year": 2020}})
+    assert key != make_cache_key("similarity", "pore size", 5, {"filter": {"year": 2021}})
+    assert key != make_cache_key("relevance", "pore size", 5, {"filter": {"year": 2020}})
+
+
+def test_new_revision_invalidates_memory_tier():
+    cache = _cache()
+    cache.put("v1#0", "k", RESULTS)
+    assert cache.get("v1#0", "k")[0][0].page_content == "PVDF membranes"
+    # 增量更新把修订号加一，旧结果不再返回
+    assert cache.get("v1#1", "k") is None
+    assert cache.invalidations == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_results_are_copies():
+    cache = _cache()
+    cache.put("v1#0", "k", RESULTS)
+    cache.get("v1#0", "k")[0][0].metadata["title"] = "changed"
+    assert cache.get("v1#0", "k")[0][0].metadata == {"paper_key": "10.1/a"}
+    assert RESULTS[0][0].metadata == {"paper_key": "10.1/a"}
+
+
+def test_sqlite_tier_is_shared_and_invalidated_by_revision(tmp_path):
+    writer = _cache(tmp_path)
+    writer.put("v1#0", "k", RESULTS)
+    writer.close()
+
+    # 另一个进程的缓存从SQLite中读到同一修订的结果
+    reader = _cache(tmp_path)
+    results = reader.get("v1#0", "k")
+    assert [(doc.page_content, doc.metadata, score) for doc, score in results] == [
+        ("PVDF membranes", {"paper_key": "10.1/a"}, 0.9)]
+    assert reader.sqlite_hits == 1
+    assert reader.get("v1#0", "k") is not None and reader.hits == 1
+    reader.close()
+
+    # 读到新的修订时，SQLite中其他修订的条目被删除
+    updated = _cache(tmp_path)
+    assert updated.get("v2#0", "k") is None
+    updated.close()
+    again = _cache(tmp_path)
+    assert again.get("v1#0", "k") is None
+    again.close()
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: clock[0])
+    cache = _cache(tmp_path, ttl_seconds=60)
+    cache.put("v1#0", "k", RESULTS)
+    clock[0] += 30
+    assert cache.get("v1#0", "k") is not None
+    clock[0] += 31
+    assert cache.get("v1#0", "k") is None
+    cache.close()
+
+
+def test_memory_tier_is_bounded():
+    cache = _cache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put("v1#0", key, RESULTS)
+    assert cache.get("v1#0", "a") is None
+    assert cache.get("v1#0", "c") is not None
@@ -0,0 +1,26 @@
+# test_retraction.py
+# 压缩向量数据库时索引大小的统计：旧版布局中只计入当前索引自己的文件，不计入其他版本、暂存目录和用户文件。
+
+from rag_system.ingestion.retraction import _index_size
+
+
+def test_index_size_of_legacy_layout_counts_only_index_files(tmp_path):
+    (tmp_path / "chroma.sqlite3").write_bytes(b"x" * 100)
+    segment = tmp_path / "3f1c2a9e-8b7d-4e6f-9a01-23456789abcd"
+    segment.mkdir()
+    (segment / "data_level0.bin").write_bytes(b"x" * 40)
+    (tmp_path / "binary_index.npz").write_bytes(b"x" * 7)
+    (tmp_path / "REVISION").write_bytes(b"3")
+    # 同一目录中的其他版本、暂存目录和用户文件
+    for name in ("v20250101-000000", "v20250102-000000.staging"):
+        (tmp_path / "versions" / name).mkdir(parents=True)
+        (tmp_path / "versions" / name / "chroma.sqlite3").write_bytes(b"x" * 1000)
+    (tmp_path / "notes.txt").write_bytes(b"x" * 500)
+
+    assert _index_size(tmp_path) == 100 + 40 + 7 + 1
+
+
+def test_index_size_of_version_dir(tmp_path):
+    (tmp_path / "chroma.sqlite3").write_bytes(b"x" * 10)
+    (tmp_path / "paper_index.npz").write_bytes(b"x" * 5)
+    assert _index_size(tmp_path) == 15
@@ -0,0 +1,69 @@
+# test_shards.py
+# 按年份分片的单元测试：年份过滤条件的构造与解析（year_filter / year_bounds）、分片划分（shard_for_year）和分片选择。
+
+import pytest
+
+from rag_system.ingestion.shards import UNKNOWN_YEAR_SHARD, ShardedChroma, shard_for_year, year_bounds, year_filter
+
+
+def test_year_filter():
+    assert year_filter() is None
+    assert year_filter(min_year=2020) == {"year": {"$gte": 2020}}
+    assert year_filter(max_year="2021") == {"year": {"$lte": 2021}}
+    assert year_filter(2018, 2020) == {"$and": [{"year": {"$gte": 2018}}, {"year": {"$lte": 2020}}]}
+
+
+@pytest.mark.parametrize("where, expected", [
+    (None, (None, None)),
+    ({}, (None, None)),
+    ({"year": 2020}, (2020, 2020)),
+    ({"year": {"$eq": 2020}}, (2020, 2020)),
+    ({"year": {"$gt": 2019}}, (2020, None)),
+    ({"year": {"$gte": 2019, "$lt": 2022}}, (2019, 2021)),
+    ({"year": {"$in": [2021, 2017, 2019]}}, (2017, 2021)),
+    ({"year": {"$in": []}}, (None, None)),
+    ({"$and": [{"year": {"$gte": 2015}}, {"year": {"$gte": 2018}}, {"year": {"$lte": 2022}}]}, (2018, 2022)),
+    # 与其他字段组合时只取年份部分；$or 无法收窄范围
+    ({"$and": [{"section": "abstract"}, {"year": {"$lte": 2010}}]}, (None, 2010)),
+    ({"$or": [{"year": 2019}, {"year": 2021}]}, (None, None)),
+    ({"section": "abstract"}, (None, None)),
+])
+def test_year_bounds(where, expected):
+    assert year_bounds(where) == expected
+
+
+def test_year_bounds_round_trips_year_filter():
+    assert year_bounds(year_filter(2016, 2019)) == (2016, 2019)
+    assert year_bounds(year_filter(max_year=2000)) == (None, 2000)
+
+
+def test_shard_for_year():
+    assert shard_for_year(2023, 1) == {"collection": "years-2023", "min_year": 2023, "max_year": 2023}
+    assert shard_for_year(2023, 5) == {"collection": "years-2020-2024", "min_year": 2020, "max_year": 2024}
+    assert shard_for_year(2020, 5) == shard_for_year(2024, 5)
+    assert shard_for_year(2025, 5)["collection"] == "years-2025-2029"
+    assert shard_for_year(0, 5) == {"collection": UNKNOWN_YEAR_SHARD, "min_year": 0, "max_year": 0}
+
+
+def test_shards_selects_only_overlapping_ranges(tmp_path, monkeypatch):
+    store = ShardedChroma(tmp_path, embedding_function=None, span=5)
+    monkeypatch.setattr(store, "_open", lambda name: name)
+    for year in (2012, 2003, 0, 2021, 2014):
+        store.shard_for_metadata({"year": year})
+
+    # 清单按年份升序登记，同一范围只登记一次
+    assert [entry["collection"] for entry in store._manifest["shards"]] == [
+        UNKNOWN_YEAR_SHARD, "years-2000-2004", "years-2010-2014", "years-2020-2024"]
+    assert store.shards() == [UNKNOWN_YEAR_SHARD, "years-2000-2004", "years-2010-2014", "years-2020-2024"]
+    assert store.shards(year_bounds(year_filter(2011, 2013))) == ["years-2010-2014"]
+    assert store.shards((2005, None)) == ["years-2010-2014", "years-2020-2024"]
+    assert store.shards((2015, 2019)) == []
+
+    # 重新打开时从清单中读出 span 和分片
+    reopened = ShardedChroma(tmp_path, embedding_function=None)
+    assert reopened.span == 5 and reopened._manifest == store._manifest
+
+
+def test_new_sharded_index_requires_span(tmp_path):
+    with pytest.raises(ValueError):
+        ShardedChroma(tmp_path, embedding_function=None)
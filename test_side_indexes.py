@@ -0,0 +1,112 @@
+# test_side_indexes.py
+# 二值索引和论文级索引增量更新的单元测试：结果应与对更新后的集合完整构建一致。
+
+import numpy as np
+
+from rag_system.ingestion.binary_index import BinaryIndex, build_binary_index, update_binary_index
+from rag_system.ingestion.paper_index import PaperIndex, build_paper_index, update_paper_index
+
+
+class FakeCollection:
+    """只实现侧索引用到的 get：分页读取全部条目、按ID读取，以及按 paper_key / doi 过滤。"""
+
+    def __init__(self):
+        self.rows = {}  # ID -> (向量, 元数据)
+
+    def get(self, ids=None, where=None, include=(), limit=None, offset=0):
+        if ids is not None:
+            selected = [chunk_id for chunk_id in ids if chunk_id in self.rows]
+        elif where is not None:
+            keys = set(where["$or"][0]["paper_key"]["$in"])
+            selected = [chunk_id for chunk_id, (_, metadata) in self.rows.items()
+                        if metadata.get("paper_key") in keys or metadata.get("doi") in keys]
+        else:
+            selected = list(self.rows)[offset:None if limit is None else offset + limit]
+        return {"ids": selected,
+                "embeddings": [self.rows[chunk_id][0] for chunk_id in selected],
+                "metadatas": [self.rows[chunk_id][1] for chunk_id in selected]}
+
+
+class FakeStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+
+    def add(self, paper_key, index, vector, section="body", year=2020):
+        chunk_id = f"{paper_key}:{index}:h"
+        self._collection.rows[chunk_id] = (list(vector), {"paper_key": paper_key, "section": section, "year": year})
+        return chunk_id
+
+    def delete(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            del self._collection.rows[chunk_id]
+
+
+def _vector(seed):
+    return np.random.default_rng(seed).standard_normal(16).astype(np.float32)
+
+
+def _binary_rows(index):
+    return sorted(zip(index.ids.tolist(), map(bytes, index.codes)))
+
+
+def _paper_rows(index):
+    return {key.decode("utf-8"): (vector, int(year)) for key, vector, year in zip(index.keys, index.vectors, index.years)}
+
+
+def test_binary_index_update_matches_full_build(tmp_path):
+    db = FakeStore()
+    old_ids = [db.add("A", i, _vector(i)) for i in range(3)] + [db.add("B", 0, _vector(10))]
+    build_binary_index(db, tmp_path)
+
+    # 新增一篇论文，删除一个文本块，并改写一个文本块的向量
+    added = [db.add("C", i, _vector(20 + i)) for i in range(2)]
+    db.delete([old_ids[1]])
+    rewritten = db.add("B", 0, _vector(30))
+    update_binary_index(db, tmp_path, added + [rewritten], [old_ids[1]])
+    updated = BinaryIndex.load(tmp_path)
+
+    full_path = tmp_path / "full"
+    full_path.mkdir()
+    build_binary_index(db, full_path)
+    assert _binary_rows(updated) == _binary_rows(BinaryIndex.load(full_path))
+
+
+def test_binary_index_update_without_file_builds_it(tmp_path):
+    db = FakeStore()
+    chunk_id = db.add("A", 0, _vector(1))
+    update_binary_index(db, tmp_path, [chunk_id], [])
+    assert BinaryIndex.load(tmp_path).ids.tolist() == [chunk_id.encode("utf-8")]
+
+
+def test_paper_index_update_refreshes_only_touched_papers(tmp_path):
+    db = FakeStore()
+    db.add("A", 0, _vector(1), section="abstract", year=2019)
+    db.add("A", 1, _vector(2))
+    b_ids = [db.add("B", i, _vector(10 + i)) for i in range(2)]
+    db.add("C", 0, _vector(20), year=2021)
+    build_paper_index(db, tmp_path)
+
+    # A 新增摘要文本块，B 被整篇删除，D 是新论文；C 没有变化
+    db.add("A", 2, _vector(3), section="abstract", year=2019)
+    db.delete(b_ids)
+    db.add("D", 0, _vector(30), year=2022)
+    update_paper_index(db, tmp_path, ["A", "B", "D"])
+    updated = _paper_rows(PaperIndex.load(tmp_path))
+
+    full_path = tmp_path / "full"
+    full_path.mkdir()
+    build_paper_index(db, full_path)
+    expected = _paper_rows(PaperIndex.load(full_path))
+    assert sorted(updated) == sorted(expected) == ["A", "C", "D"]
+    for key, (vector, year) in expected.items():
+        np.testing.assert_allclose(updated[key][0], vector, rtol=1e-6)
+        assert updated[key][1] == year
+
+
+def test_paper_index_update_can_empty_the_index(tmp_path):
+    db = FakeStore()
+    chunk_id = db.add("A", 0, _vector(1))
+    build_paper_index(db, tmp_path)
+    db.delete([chunk_id])
+    update_paper_index(db, tmp_path, ["A"])
+    assert len(PaperIndex.load(tmp_path).keys) == 0
@@ -0,0 +1,68 @@
+# test_text_chunker.py
+# 章节识别（detect_sections）和内容寻址文本块ID的单元测试。
+
+from rag_system.ingestion.text_chunker import detect_sections, get_paper_key, make_chunk_id, paper_key_from_chunk_id
+
+FILLER = "The membrane flux was measured at several pressures and compared with the model. " * 6
+
+
+def _paper(body):
+    return "Title: PVDF membranes\nAuthors: A. Author\n\nAbstract:\nWe study PVDF membranes." \
+           "\n\nMain Content:\n" + body
+
+
+def _labels(text):
+    return [label for label, _, _ in detect_sections(text)]
+
+
+def test_sections_cover_the_whole_text_in_order():
+    text = _paper(
+        "Keywords: PVDF. 1. Introduction " + FILLER + "2. Materials and methods " + FILLER +
+        "3. Results and discussion " + FILLER + "4. Conclusions " + FILLER +
+        "Acknowledgements We thank the lab. References [1] A. Author, J. Membr. Sci. 2020."
+    )
+    sections = detect_sections(text)
+    assert [label for label, _, _ in sections] == [
+        "header", "abstract", "front_matter", "introduction", "methods", "results", "conclusions",
+        "back_matter", "references"]
+    assert sections[0][1] == 0 and sections[-1][2] == len(text)
+    for (_, _, end), (_, start, _) in zip(sections, sections[1:]):
+        assert end == start
+    methods = next((start, end) for label, start, end in sections if label == "methods")
+    assert text[methods[0]:].startswith("2. Materials and methods")
+
+
+def test_figure_captions_and_out_of_order_numbers_are_not_headings():
+    text = _paper(
+        "1. Introduction " + FILLER + "as shown in Figure 3. Results of the test " + FILLER +
+        "7. Conclusions are drawn later " + FILLER + "2. Experimental " + FILLER
+    )
+    # 正文直接以第一个标题开始，空的 front_matter 不出现在结果中
+    assert _labels(text) == ["header", "abstract", "introduction", "methods"]
+
+
+def test_text_without_headings_is_body():
+    text = _paper(FILLER)
+    assert _labels(text) == ["header", "abstract", "body"]
+    assert detect_sections(FILLER) == [("body", 0, len(FILLER))]
+
+
+def test_back_matter_is_only_detected_in_the_second_half():
+    # 正文开头提到的 "Funding:" 不会把整篇论文标记为附属部分
+    text = _paper("Funding: none declared here. " + FILLER * 3 + "Funding: National Science Foundation.")
+    labels = _labels(text)
+    assert labels == ["header", "abstract", "body", "back_matter"]
+
+
+def test_chunk_ids_are_content_addressed():
+    chunk_id = make_chunk_id("10.1016/j.memsci.2020.1:2", 750, "some text")
+    assert chunk_id == make_chunk_id("10.1016/j.memsci.2020.1:2", 750, "some text")
+    assert chunk_id != make_chunk_id("10.1016/j.memsci.2020.1:2", 750, "other text")
+    # DOI 本身可能包含冒号
+    assert paper_key_from_chunk_id(chunk_id) == "10.1016/j.memsci.2020.1:2"
+
+
+def test_paper_key_falls_back_from_doi_to_path():
+    assert get_paper_key({"paper_key": "k", "doi": "d"}) == "k"
+    assert get_paper_key({"doi": "N/A", "local_path": "/papers/a.pdf", "filename": "a.pdf"}) == "/papers/a.pdf"
+    assert get_paper_key({"doi": "N/A"}) == "unknown"
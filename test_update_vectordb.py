@@ -0,0 +1,33 @@
+# test_update_vectordb.py
+# 增量更新识别已入库论文的单元测试：内容寻址ID直接取论文标识，旧版本构建的随机ID按元数据识别。
+
+from rag_system.ingestion.text_chunker import is_content_addressed_id, make_chunk_id
+from rag_system.ingestion.update_vectordb import get_existing_paper_keys
+
+
+class FakeStore:
+    def __init__(self, chunks):
+        self.chunks = chunks  # ID -> 元数据
+
+    def get(self, ids=None, include=()):
+        ids = list(self.chunks) if ids is None else [chunk_id for chunk_id in ids if chunk_id in self.chunks]
+        result = {"ids": ids}
+        if "metadatas" in include:
+            result["metadatas"] = [self.chunks[chunk_id] for chunk_id in ids]
+        return result
+
+
+def test_is_content_addressed_id():
+    assert is_content_addressed_id(make_chunk_id("10.1000/x:y", 0, "text"))
+    assert is_content_addressed_id(make_chunk_id("/papers/a.pdf", -1, "text"))
+    assert not is_content_addressed_id("3f1c2a9e-8b7d-4e6f-9a01-23456789abcd")
+
+
+def test_existing_paper_keys_from_new_and_legacy_ids():
+    db = FakeStore({
+        make_chunk_id("10.1000/new", 0, "a"): {"paper_key": "10.1000/new"},
+        make_chunk_id("10.1000/new", 700, "b"): {"paper_key": "10.1000/new"},
+        "3f1c2a9e-8b7d-4e6f-9a01-23456789abcd": {"doi": "10.1000/legacy", "local_path": "/papers/legacy.pdf"},
+        "0b5e7f7c-1d2e-4f3a-8b9c-0d1e2f3a4b5c": {"doi": "N/A", "local_path": "/papers/no-doi.pdf"},
+    })
+    assert get_existing_paper_keys(db) == {"10.1000/new", "10.1000/legacy", "/papers/no-doi.pdf"}
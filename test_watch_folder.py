@@ -0,0 +1,195 @@
+# test_watch_folder.py
+# 投递目录注入的单元测试：注入的论文记入注入日志，之后的 --sync 不会删除它们；旧版本构建的文本块按 doi 识别并被替换；
+# 注入、增量更新和同步写入论文侧表时与完整构建一样使用SQLite中的权威标题。
+# 向量数据库和嵌入模型用内存中的假对象代替。
+
+import json
+import os
+import sqlite3
+from functools import partial
+
+import pytest
+from langchain_core.documents import Document
+
+from rag_system.ingestion import build_vectordb, update_vectordb, watch_folder
+from rag_system.ingestion.build_vectordb import iter_chunk_batches
+from rag_system.ingestion.paper_store import PaperStore
+from rag_system.ingestion.watch_log import append_watch_records, iter_source_records
+
+BODY = "Polyvinylidene fluoride membranes were cast from solution and tested for water flux. " * 12
+
+
+def _paper(doi, body=BODY):
+    return {"doi": doi, "retrieved_title": f"Paper {doi}", "retrieved_year": 2021,
+            "llm_ready_fulltext_cleaned": f"Title: Paper {doi}\n\nMain Content:\n{body}"}
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+def _matches(metadata, where):
+    if "$or" in where:
+        return any(_matches(metadata, condition) for condition in where["$or"])
+    (field, condition), = where.items()
+    return metadata.get(field) in condition["$in"]
+
+
+class FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def count(self):
+        return len(self.rows)
+
+
+class FakeStore:
+    """只实现注入和同步用到的 get / add_documents / delete。"""
+
+    def __init__(self):
+        self.rows = {}  # ID -> 元数据
+        self._collection = FakeCollection(self.rows)
+
+    def get(self, ids=None, where=None, include=()):
+        selected = [chunk_id for chunk_id, metadata in self.rows.items()
+                    if (ids is None or chunk_id in ids) and (where is None or _matches(metadata, where))]
+        return {"ids": selected, "metadatas": [self.rows[chunk_id] for chunk_id in selected]}
+
+    def add_documents(self, documents, ids):
+        for chunk_id, document in zip(ids, documents):
+            self.rows[chunk_id] = document.metadata
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.rows.pop(chunk_id, None)
+
+    def persist(self):
+        pass
+
+    def paper_keys(self):
+        return {metadata.get("paper_key", metadata.get("doi")) for metadata in self.rows.values()}
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    store = FakeStore()
+    db_path = tmp_path / "chroma_db"
+    db_path.mkdir()
+    for module in (watch_folder, update_vectordb):
+        monkeypatch.setattr(module, "get_embedding_function", FakeEmbeddings)
+        monkeypatch.setattr(module, "open_vector_store", lambda path, embeddings: store)
+        monkeypatch.setattr(module, "PaperStore", partial(PaperStore, tmp_path / "papers.sqlite3"))
+    monkeypatch.setattr(update_vectordb, "iter_chunk_batches", partial(iter_chunk_batches, workers=1))
+    settings = update_vectordb.settings
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", False)
+    monkeypatch.setattr(settings, "SQLITE_DB_PATH", tmp_path / "no-tombstones.sqlite3")
+    monkeypatch.setattr(settings, "SOURCE_DATA_PATH", tmp_path / "processed_papers.json")
+    monkeypatch.setattr(settings, "VECTOR_DB_PATH", db_path)
+    monkeypatch.setattr(settings, "WATCH_LOG_PATH", tmp_path / "watch_ingested.jsonl")
+    settings.SOURCE_DATA_PATH.write_text(json.dumps([_paper("10.1/source")]), encoding="utf-8")
+
+    ingestor = watch_folder.WatchFolderIngestor(drop_dir=tmp_path / "incoming", db_path=db_path,
+                                                status_path=tmp_path / "status.json",
+                                                log_path=settings.WATCH_LOG_PATH)
+    yield store, ingestor, tmp_path
+    ingestor.close()
+
+
+def _deliver(ingestor, tmp_path, name, records):
+    path = tmp_path / "incoming" / name
+    path.write_text(json.dumps(records), encoding="utf-8")
+    ingestor.ingest([(path, os.path.getmtime(path))])
+
+
+def test_sync_keeps_papers_delivered_through_the_watch_folder(env):
+    store, ingestor, tmp_path = env
+    update_vectordb.sync_database()
+    assert store.paper_keys() == {"10.1/source"}
+
+    _deliver(ingestor, tmp_path, "new.json", [_paper("10.1/watched")])
+    watched_ids = {chunk_id for chunk_id in store.rows if chunk_id.startswith("10.1/watched:")}
+    assert watched_ids and store.paper_keys() == {"10.1/source", "10.1/watched"}
+
+    update_vectordb.sync_database()
+    assert store.paper_keys() == {"10.1/source", "10.1/watched"}
+    # 同步认为注入的文本块已是最新，不会重新嵌入
+    assert {chunk_id for chunk_id in store.rows if chunk_id.startswith("10.1/watched:")} == watched_ids
+
+
+def test_watch_replaces_legacy_chunks_of_the_same_paper(env):
+    store, ingestor, tmp_path = env
+    store.rows["3f1c2a9e-8b7d-4e6f-9a01-23456789abcd"] = {"doi": "10.1/legacy", "local_path": "/papers/l.pdf"}
+    store.rows["0b5e7f7c-1d2e-4f3a-8b9c-0d1e2f3a4b5c"] = {"doi": "N/A", "local_path": "/papers/no-doi.pdf"}
+
+    no_doi = dict(_paper("N/A"), local_path="/papers/no-doi.pdf")
+    _deliver(ingestor, tmp_path, "legacy.json", [_paper("10.1/legacy"), no_doi])
+    assert "3f1c2a9e-8b7d-4e6f-9a01-23456789abcd" not in store.rows
+    assert "0b5e7f7c-1d2e-4f3a-8b9c-0d1e2f3a4b5c" not in store.rows
+    assert store.paper_keys() == {"10.1/legacy", "/papers/no-doi.pdf"}
+
+
+def _bodies(source_path, log_path):
+    records = iter_source_records(source_path, log_path)
+    return [record["llm_ready_fulltext_cleaned"].split("\n")[-1] for record in records]
+
+
+def test_source_records_merge_the_watch_log(tmp_path):
+    source_path = tmp_path / "processed_papers.json"
+    log_path = tmp_path / "watch_ingested.jsonl"
+    source_path.write_text(json.dumps([_paper("a", "old a"), _paper("b", "old b")]), encoding="utf-8")
+    os.utime(source_path, (1000, 1000))
+    append_watch_records([_paper("a", "new a"), _paper("c", "first c")], log_path)
+    append_watch_records([_paper("c", "second c")], log_path)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write('{"paper_key": "d", "ingested')  # 追加时被中断的最后一行
+
+    # 比源文件新的投递覆盖源文件中的同一篇论文；同一篇论文只取最后一次投递
+    assert _bodies(source_path, log_path) == ["old b", "new a", "second c"]
+
+    # 源文件重新生成之后，更早的投递只在源文件中没有这篇论文时才使用
+    os.utime(source_path, None)
+    assert _bodies(source_path, log_path) == ["old a", "old b", "second c"]
+
+
+def test_watch_log_is_optional(tmp_path):
+    source_path = tmp_path / "processed_papers.json"
+    source_path.write_text(json.dumps([_paper("a")]), encoding="utf-8")
+    assert [record["doi"] for record in iter_source_records(source_path, tmp_path / "missing.jsonl")] == ["a"]
+
+
+def test_sync_update_and_watch_keep_authoritative_titles(env, monkeypatch):
+    store, ingestor, tmp_path = env
+    settings = update_vectordb.settings
+    # Papers 表中的权威标题；没有墓碑表时撤回记录为空
+    monkeypatch.setattr(settings, "SQLITE_DB_PATH", tmp_path / "literature_materials.db")
+    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
+    conn.execute("CREATE TABLE Papers (doi TEXT PRIMARY KEY, title TEXT)")
+    conn.executemany("INSERT INTO Papers VALUES (?, ?)", [("10.1/source", "Curated source title"),
+                                                          ("10.1/watched", "Curated watched title")])
+    conn.commit()
+    conn.close()
+    for module in (build_vectordb, update_vectordb, watch_folder):
+        monkeypatch.setattr(module, "get_retracted_keys", set)
+
+    def titles():
+        papers = PaperStore(tmp_path / "papers.sqlite3")
+        try:
+            return {key: paper["title"] for key, paper in papers.get_papers(["10.1/source", "10.1/watched"]).items()}
+        finally:
+            papers.close()
+
+    update_vectordb.update_database()
+    assert titles() == {"10.1/source": "Curated source title"}
+    _deliver(ingestor, tmp_path, "new.json", [_paper("10.1/watched")])
+    ingestor.paper_store.flush()
+    update_vectordb.sync_database()
+    # 同步重新写入两篇论文的侧表行，标题仍是权威标题而不是JSON中的 "Paper <doi>"
+    assert titles() == {"10.1/source": "Curated source title", "10.1/watched": "Curated watched title"}
+
+    monkeypatch.setattr(settings, "TITLE_JOIN_ENABLED", False)
+    update_vectordb.sync_database()
+    assert titles()["10.1/source"] == "Paper 10.1/source"